@@ -121,6 +121,9 @@ export function AnalyticsDashboard() {
     )
   }
 
+  // Items without a backtested model come back with confidence null and are left out of the average.
+  const scoredForecasts = forecasts.filter((f) => f.confidence != null)
+
   const COLORS = ['#164e63', '#a16207', '#dc2626', '#059669', '#7c3aed', '#ea580c']
 
   if (!analytics) {
@@ -172,14 +175,13 @@ export function AnalyticsDashboard() {
           </CardHeader>
           <CardContent>
             <div className="xl:text-4xl text-xl font-bold text-sky-400">
-              {forecasts.length > 0
-                ? (
-                    (forecasts.reduce((sum, f) => sum + f.confidence, 0) /
-                      forecasts.length) *
+              {scoredForecasts.length > 0
+                ? `${(
+                    (scoredForecasts.reduce((sum, f) => sum + (f.confidence ?? 0), 0) /
+                      scoredForecasts.length) *
                     100
-                  ).toFixed(0)
-                : '0'}
-              %
+                  ).toFixed(0)}%`
+                : 'n/a'}
             </div>
             <p className="text-xs text-foreground">AI prediction accuracy</p>
           </CardContent>
@@ -8,9 +8,9 @@ import { Wifi, WifiOff, RefreshCw, Clock, AlertCircle, CheckCircle2 } from "luci
 import { formatLastSync } from "@/lib/offline-storage"
 
 export function OfflineIndicator() {
-  const { online, syncing, lastSync, pendingChanges, syncPendingChanges } = useOffline()
+  const { online, syncing, lastSync, pendingChanges, rejectedChanges, syncPendingChanges, discardRejectedChange } = useOffline()
 
-  if (online && pendingChanges === 0) {
+  if (online && pendingChanges === 0 && rejectedChanges.length === 0) {
     return (
       <div className="fixed bottom-4 right-4 z-50">
         <Badge variant="secondary" className="bg-primary/30 text-primary border-primary/50 font-semibold">
@@ -42,6 +42,25 @@ export function OfflineIndicator() {
             </div>
           )}
 
+          {rejectedChanges.length > 0 && (
+            <div className="mb-3 p-2 bg-destructive/10 rounded-lg border border-destructive/30 space-y-2">
+              <div className="flex items-center gap-2">
+                <AlertCircle className="h-4 w-4 text-destructive" />
+                <span className="text-sm font-medium text-foreground">{rejectedChanges.length} changes rejected</span>
+              </div>
+              {rejectedChanges.map((change) => (
+                <div key={change.id} className="flex items-start justify-between gap-2 text-xs text-foreground">
+                  <span>
+                    {change.action}: {change.error}
+                  </span>
+                  <Button variant="ghost" size="sm" className="h-6 px-2 text-xs" onClick={() => discardRejectedChange(change.id)}>
+                    Discard
+                  </Button>
+                </div>
+              ))}
+            </div>
+          )}
+
           <div className="flex items-center justify-between text-xs text-foreground mb-3">
             <div className="flex items-center gap-1">
               <Clock className="h-3 w-3" />
@@ -206,7 +206,7 @@ export function AdminDashboard() {
             <ResponsiveContainer width="100%" height={300}>
               <LineChart
                 data={monthlySpend.map((spend: any, index: number) => ({
-                  month: index + 1,
+                  month: analytics?.monthlySpendMonths?.[index] ?? index + 1,
                   spend
                 }))}
               >
@@ -1,13 +1,21 @@
 "use client"
 
 import { useState, useEffect } from "react"
-import { offlineStorage, isOnline, getLastSyncTime, setLastSyncTime } from "@/lib/offline-storage"
+import { offlineStorage, isOnline, getLastSyncTime, setLastSyncTime, getDeviceId } from "@/lib/offline-storage"
+
+export interface RejectedChange {
+  id: number
+  action: string
+  data: any
+  error: string
+}
 
 export function useOffline() {
   const [online, setOnline] = useState(isOnline())
   const [syncing, setSyncing] = useState(false)
   const [lastSync, setLastSync] = useState(getLastSyncTime())
   const [pendingChanges, setPendingChanges] = useState(0)
+  const [rejectedChanges, setRejectedChanges] = useState<RejectedChange[]>([])
 
   useEffect(() => {
     const handleOnline = () => {
@@ -45,17 +53,46 @@ export function useOffline() {
     try {
       const queue = await offlineStorage.getSyncQueue()
 
-      // Simulate API sync (in real app, this would sync with backend)
-      for (const item of queue) {
-        console.log("Syncing offline change:", item.action, item.data)
-        // await syncToServer(item.action, item.data)
+      if (queue.length > 0) {
+        // One round trip for the whole queue; the server dedupes by deviceId + clientId.
+        const response = await fetch("http://localhost:8000/api/sync", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({
+            deviceId: getDeviceId(),
+            mutations: queue.map((item) => ({
+              clientId: String(item.id),
+              action: item.action,
+              data: item.data,
+              timestamp: item.timestamp,
+            })),
+          }),
+        })
+        if (!response.ok) throw new Error(`Sync failed with status ${response.status}`)
+        const result = await response.json()
+
+        // Only drop what the server took; rejected mutations stay queued so they can be fixed and resent.
+        const byClientId = new Map(queue.map((item) => [String(item.id), item]))
+        const done: number[] = []
+        const rejected: RejectedChange[] = []
+        for (const r of result.results || []) {
+          const item = byClientId.get(r.clientId)
+          if (!item) continue
+          if (r.status === "applied" || r.status === "duplicate") {
+            done.push(item.id)
+          } else if (r.status === "error") {
+            console.error("Offline change rejected:", r.clientId, r.error)
+            rejected.push({ id: item.id, action: item.action, data: item.data, error: r.error || "Rejected by server" })
+          }
+        }
+        await offlineStorage.removeFromSyncQueue(done)
+        setRejectedChanges(rejected)
       }
 
-      await offlineStorage.clearSyncQueue()
       const now = Date.now()
       setLastSyncTime(now)
       setLastSync(now)
-      setPendingChanges(0)
+      await checkPendingChanges()
 
       console.log("Offline sync completed successfully")
     } catch (error) {
@@ -65,6 +102,16 @@ export function useOffline() {
     }
   }
 
+  const discardRejectedChange = async (id: number) => {
+    try {
+      await offlineStorage.removeFromSyncQueue([id])
+      setRejectedChanges((changes) => changes.filter((change) => change.id !== id))
+      await checkPendingChanges()
+    } catch (error) {
+      console.error("Failed to discard offline change:", error)
+    }
+  }
+
   const saveOfflineChange = async (action: string, data: any) => {
     try {
       await offlineStorage.addToSyncQueue(action, data)
@@ -80,7 +127,9 @@ export function useOffline() {
     syncing,
     lastSync,
     pendingChanges,
+    rejectedChanges,
     syncPendingChanges,
+    discardRejectedChange,
     saveOfflineChange,
     checkPendingChanges,
   }
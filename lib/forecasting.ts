@@ -16,13 +16,14 @@ export interface ForecastData {
   daysUntilStockout: number;
   recommendedReorderPoint: number;
   recommendedOrderQuantity: number;
-  confidence: number;
+  confidence: number | null;
   riskLevel: "low" | "medium" | "high";
 }
 
 export interface AnalyticsData {
   totalSpend: number;
   monthlySpend: number[];
+  monthlySpendMonths?: string[];
   topExpensiveItems: Array<{
     name: string;
     totalCost: number;
@@ -100,6 +100,19 @@ class OfflineStorage {
     })
   }
 
+  async removeFromSyncQueue(ids: number[]): Promise<void> {
+    if (!this.db) await this.init()
+
+    return new Promise((resolve, reject) => {
+      const transaction = this.db!.transaction(["syncQueue"], "readwrite")
+      const store = transaction.objectStore("syncQueue")
+      for (const id of ids) store.delete(id)
+
+      transaction.oncomplete = () => resolve()
+      transaction.onerror = () => reject(transaction.error)
+    })
+  }
+
   async clearSyncQueue(): Promise<void> {
     if (!this.db) await this.init()
 
@@ -138,3 +151,12 @@ export const formatLastSync = (timestamp: number): string => {
   if (hours < 24) return `${hours} hours ago`
   return `${days} days ago`
 }
+
+export const getDeviceId = (): string => {
+  let id = localStorage.getItem("deviceId")
+  if (!id) {
+    id = crypto.randomUUID()
+    localStorage.setItem("deviceId", id)
+  }
+  return id
+}
@@ -0,0 +1,72 @@
+"""Compare TTS reply payload size and encode cost across output formats and bitrates.
+
+Run from ``server/``::
+
+    python -m benchmarks.audio_encoding            # synthetic 16 kHz speech-like signal
+    python -m benchmarks.audio_encoding --tts      # real VITS output for a typical reply
+"""
+from __future__ import annotations
+import argparse
+import base64
+import time
+
+import numpy as np
+
+from components.tts import encode_audio
+
+REPLY = "Done. I deducted 3 units of Syringe 5ml. 117 left."
+CASES = [("wav", None), ("mp3", "24k"), ("mp3", "32k"), ("mp3", "64k"), ("opus", "16k"), ("opus", "24k"), ("opus", "32k")]
+
+
+def _synthetic(seconds: float, sample_rate: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    f0 = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    voiced = np.sin(2 * np.pi * np.cumsum(f0) / sample_rate) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2)
+    audio = 0.4 * voiced + 0.01 * rng.standard_normal(t.size)
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+
+def _tts_samples(language: str):
+    import torch
+    from components.tts import tts
+    _model_id, model, tokenizer = tts._load_model(language)
+    inputs = tokenizer(REPLY, return_tensors="pt")
+    with torch.no_grad():
+        wave = model(**inputs).waveform.squeeze().numpy()
+    return (wave * 32767).astype(np.int16), model.config.sampling_rate
+
+
+def main(use_tts: bool, seconds: float, repeat: int, language: str, seed: int):
+    if use_tts:
+        samples, rate = _tts_samples(language)
+    else:
+        rate = 16000
+        samples = _synthetic(seconds, rate, seed)
+    print(f"{samples.size / rate:.2f}s of audio at {rate} Hz")
+    print(f"{'format':<8} {'bitrate':<8} {'bytes':>9} {'base64':>9} {'vs wav':>8} {'encode ms':>10}")
+    wav_size = None
+    for fmt, bitrate in CASES:
+        try:
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                data = encode_audio(samples, rate, fmt, bitrate)
+            ms = (time.perf_counter() - t0) * 1000.0 / repeat
+        except Exception as e:
+            print(f"{fmt:<8} {bitrate or '-':<8} failed: {e}")
+            continue
+        if wav_size is None:
+            wav_size = len(data)
+        b64 = len(base64.b64encode(data))
+        print(f"{fmt:<8} {bitrate or '-':<8} {len(data):>9} {b64:>9} {len(data) / wav_size:>8.2%} {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--tts", action="store_true", help="Encode real VITS output instead of a synthetic signal")
+    p.add_argument("--language", default="en")
+    p.add_argument("--seconds", type=float, default=3.0)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--seed", type=int, default=42)
+    args = p.parse_args()
+    main(args.tts, args.seconds, args.repeat, args.language, args.seed)
@@ -0,0 +1,31 @@
+"""Fail when a hot query's winning plan is a collection scan.
+
+Needs a real MongoDB (mongomock does not implement ``explain``). Indexes are
+created first, so this also checks that ``INDEXES`` covers ``HOT_QUERIES``::
+
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.explain_check
+"""
+from __future__ import annotations
+import sys
+
+from dotenv import load_dotenv
+
+
+def main() -> int:
+    load_dotenv()
+    from components.db import db
+    db.ensure_indexes()
+    failures = []
+    for name, stages in db.explain_hot_queries().items():
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        print(f"{name:<28} {status:<9} {' <- '.join(s for s in stages if s)}")
+        if status != "ok":
+            failures.append(name)
+    if failures:
+        print(f"{len(failures)} hot quer{'y' if len(failures) == 1 else 'ies'} scan the whole collection: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
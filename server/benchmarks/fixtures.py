@@ -0,0 +1,48 @@
+from __future__ import annotations
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+from models import InventoryItem
+
+CATEGORIES = ["PPE", "Consumables", "Medicines", "Surgical", "Diagnostics", "Wound Care"]
+NOUNS = ["Mask", "Glove", "Syringe", "Bandage", "Gauze", "Catheter", "Swab", "Needle", "Paracetamol", "Ibuprofen"]
+
+
+def make_items(n: int, seed: int = 42) -> List[InventoryItem]:
+    rng = random.Random(seed)
+    items = []
+    for i in range(n):
+        noun = NOUNS[i % len(NOUNS)]
+        min_stock = rng.randint(10, 200)
+        items.append(InventoryItem(
+            id=f"item-{i:06d}",
+            name=f"{noun} {i}",
+            currentStock=rng.randint(0, 2000),
+            unit="units",
+            minStock=min_stock,
+            maxStock=min_stock * 20,
+            category=rng.choice(CATEGORIES),
+            price=round(rng.uniform(0.1, 50.0), 2),
+            lastUpdated=datetime(2024, 1, 1),
+        ))
+    return items
+
+
+def make_usage_logs(items: List[InventoryItem], days: int = 30, events_per_item: int = 20, seed: int = 42) -> List[dict]:
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    logs = []
+    seq = 0
+    for it in items:
+        for _ in range(events_per_item):
+            logs.append({
+                "id": f"log-{seq:08d}",
+                "itemId": it.id,
+                "quantity": rng.randint(1, 12),
+                "user": "bench",
+                "timestamp": now - timedelta(days=rng.randint(0, days - 1), minutes=rng.randint(0, 1439)),
+                "notes": None,
+            })
+            seq += 1
+    return logs
@@ -0,0 +1,52 @@
+"""Time the rolling-origin forecast backtest across catalog sizes and worker counts.
+
+Run from ``server/``::
+
+    python -m benchmarks.forecast_backtest
+    python -m benchmarks.forecast_backtest --items 10000 --workers 1 4 8
+
+``--workers 0`` uses the production default (``FORECAST_WORKERS``, else the CPU count).
+"""
+from __future__ import annotations
+import argparse
+import time
+
+import numpy as np
+
+from components import backtesting
+
+
+def synthetic_history(n: int, days: int, seed: int) -> np.ndarray:
+    """A mix of steady, trending and intermittent (mostly zero) daily usage."""
+    rng = np.random.default_rng(seed)
+    rates = rng.gamma(0.8, 4.0, size=n).astype(np.float32)
+    trend = 1.0 + rng.normal(0, 0.004, size=n)[:, None] * np.arange(days)[None, :]
+    history = rng.poisson(np.maximum(0.0, rates[:, None] * trend))
+    intermittent = rng.random(n) < 0.3
+    history[intermittent] *= rng.random((int(intermittent.sum()), days)) < 0.15
+    return history.astype(np.float32)
+
+
+def main(item_counts, days: int, horizon: int, origins: int, worker_counts, seed: int):
+    print(f"{'items':>7} {'workers':>8} {'seconds':>9} {'items/s':>9}  best models")
+    for n in item_counts:
+        history = synthetic_history(n, days, seed)
+        for workers in worker_counts:
+            t0 = time.perf_counter()
+            result = backtesting.backtest(history, horizon=horizon, origins=origins, workers=workers or None)
+            elapsed = time.perf_counter() - t0
+            counts = {m: result["model"].count(m) for m in result["models"]}
+            label = f"{backtesting.resolve_workers(workers or None)}{'*' if not workers else ''}"
+            print(f"{n:>7} {label:>8} {elapsed:>9.2f} {n / elapsed:>9.0f}  {counts}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--items", type=int, nargs="+", default=[1000, 10000])
+    p.add_argument("--days", type=int, default=120)
+    p.add_argument("--horizon", type=int, default=7)
+    p.add_argument("--origins", type=int, default=4)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 0], help="0 = default worker count (marked *)")
+    p.add_argument("--seed", type=int, default=42)
+    args = p.parse_args()
+    main(args.items, args.days, args.horizon, args.origins, args.workers, args.seed)
@@ -0,0 +1,69 @@
+"""Throughput of MT5 command structuring at 1/8/32 concurrent callers, with and without coalescing.
+
+Each caller is a thread calling ``LocalLLM.structure_command`` in a loop, the
+way ``/process-text`` requests do once structuring runs in the threadpool.
+Run from ``server/``::
+
+    python -m benchmarks.llm_batching
+    python -m benchmarks.llm_batching --concurrency 1 8 32 --requests 64 --wait-ms 5
+"""
+from __future__ import annotations
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from components.batching import Coalescer
+from components.llm import LocalLLM
+
+COMMANDS = [
+    "I used 3 syringes", "Add 20 masks", "How many gloves do we have?", "Am folosit 2 seringi",
+    "we took 12 gauze pads", "Adaugă 10 seringi", "Câte bandaje avem?", "restock forty two catheters",
+]
+
+
+def run(llm: LocalLLM, concurrency: int, total: int) -> Dict[str, float]:
+    latencies: List[float] = []
+
+    def call(i: int):
+        t0 = time.perf_counter()
+        llm.structure_command(COMMANDS[i % len(COMMANDS)])
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+def main(concurrency: List[int], total: int, max_batch: int, wait_ms: float):
+    llm = LocalLLM()
+    llm._load_model()
+    llm.structure_command(COMMANDS[0])
+    modes = {
+        "serial": Coalescer(llm._structure_batch, max_batch=1, name="llm"),
+        "batched": Coalescer(llm._structure_batch, max_batch=max_batch, max_wait_ms=wait_ms, name="llm"),
+    }
+    print(f"{'mode':<8} {'callers':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9}")
+    for c in concurrency:
+        for mode, batcher in modes.items():
+            llm.batcher = batcher
+            r = run(llm, c, max(total, c))
+            print(f"{mode:<8} {c:>8} {r['rps']:>8.2f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    p.add_argument("--requests", type=int, default=64)
+    p.add_argument("--max-batch", type=int, default=32)
+    p.add_argument("--wait-ms", type=float, default=5.0)
+    args = p.parse_args()
+    main(args.concurrency, args.requests, args.max_batch, args.wait_ms)
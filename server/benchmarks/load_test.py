@@ -0,0 +1,135 @@
+"""Drive the real API endpoints at a fixed concurrency and report throughput and latency percentiles.
+
+Against a running server::
+
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 16 --requests 500
+
+In-process against mongomock seeded by ``populate_db.generate``::
+
+    python -m benchmarks.load_test --mock --items 2000 --concurrency 16
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+import httpx
+
+SCENARIOS = {
+    "inventory": ("GET", "/api/inventory", None),
+    "usage-logs": ("GET", "/api/usage-logs", None),
+    "analytics": ("GET", "/api/analytics-data", None),
+    "orders-bootstrap": ("GET", "/api/orders-bootstrap", None),
+    "usage": ("POST", "/api/usage", "usage"),
+    "process-text": ("POST", "/api/process-text", "text"),
+    "sync": ("POST", "/api/sync", "sync"),
+}
+
+TEXT_COMMANDS = ["I used 3 syringes", "Add 20 masks", "How many gloves do we have?", "Am folosit 2 seringi"]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _body(kind, rng: random.Random, item_ids: List[str]):
+    if kind == "usage":
+        return {"itemId": rng.choice(item_ids) if item_ids else "item-0000000", "quantity": rng.randint(1, 5), "user": "loadtest"}
+    if kind == "text":
+        return {"text": rng.choice(TEXT_COMMANDS), "language": "en"}
+    if kind == "sync":
+        device = f"loadtest-{rng.getrandbits(48):012x}"
+        return {"deviceId": device, "mutations": [
+            {"clientId": str(i), "action": "logUsage", "data": {"itemId": rng.choice(item_ids) if item_ids else "item-0000000", "quantity": rng.randint(1, 5), "user": "loadtest"}}
+            for i in range(100)
+        ]}
+    return None
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, total: int, concurrency: int, item_ids: List[str], seed: int = 42) -> Dict[str, float]:
+    method, path, kind = SCENARIOS[name]
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            body = _body(kind, rng, item_ids)
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, path, json=body, headers={"Accept-Encoding": "gzip"})
+                if resp.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def _mock_app(items: int, suppliers: int, months: int, seed: int):
+    import populate_db
+    import components.db as dbmod
+    mock_db = populate_db.connect(mock=True)
+    counts = populate_db.generate(mock_db, items, suppliers, months, seed=seed)
+    print("Seeded mock database:", counts)
+    dbmod.db._client = mock_db.client
+    dbmod.db._db = mock_db
+    from main import app
+    return app
+
+
+async def main(args):
+    if args.mock:
+        app = _mock_app(args.items, args.suppliers, args.months, args.seed)
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    async with client:
+        item_ids: List[str] = []
+        try:
+            resp = await client.get("/api/inventory")
+            item_ids = [it["id"] for it in resp.json().get("items", [])]
+        except Exception as e:
+            print(f"Could not prefetch inventory ids: {e}")
+        print(f"{'scenario':<18} {'reqs':>6} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name in args.scenarios:
+            r = await run_scenario(client, name, args.requests, args.concurrency, item_ids, args.seed)
+            print(f"{name:<18} {r['requests']:>6} {r['errors']:>5} {r['rps']:>9.1f} {r['p50']:>9.1f} {r['p95']:>9.1f} {r['p99']:>9.1f}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--url", default="http://localhost:8000")
+    p.add_argument("--mock", action="store_true", help="Run the app in-process against a seeded mongomock database")
+    p.add_argument("--items", type=int, default=1000)
+    p.add_argument("--suppliers", type=int, default=20)
+    p.add_argument("--months", type=int, default=3)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    p.add_argument("--timeout", type=float, default=120.0)
+    p.add_argument("--scenarios", nargs="+", default=["inventory", "usage-logs", "analytics", "orders-bootstrap", "usage", "process-text"], choices=list(SCENARIOS))
+    asyncio.run(main(p.parse_args()))
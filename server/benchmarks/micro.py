@@ -0,0 +1,318 @@
+"""Micro-benchmarks for the hot Python paths in ``server/components``.
+
+Every case uses fixed seeds and in-memory fixtures (mongomock for the
+``Database`` cases), so timings are comparable between runs. Results can be
+saved as a baseline and later runs compared against it::
+
+    python -m benchmarks.micro --save            # write benchmarks/baselines.json
+    python -m benchmarks.micro --compare         # exit 1 on regressions
+    python -m benchmarks.micro -k forecast       # only cases whose name contains "forecast"
+
+``benchmarks/baselines.json`` is committed, so ``--compare`` works on a fresh
+checkout. Timings depend on the machine: before gating on it elsewhere,
+or after a change that is meant to move a number, refresh it with
+``--save`` on the reference machine (``-k`` refreshes only matching cases,
+since ``--save`` merges into the file) and commit the result. Cases whose
+dependencies are missing (torch models, for instance) are skipped and have
+no baseline entry; they run without a comparison.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.fixtures import make_items, make_usage_logs, NOUNS
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+CASES: List[Tuple[str, Callable[[], Callable[[], object]]]] = []
+
+
+def case(name: str):
+    """Register a benchmark. The decorated function does the setup and returns the callable to time."""
+    def deco(fn):
+        CASES.append((name, fn))
+        return fn
+    return deco
+
+
+def _mock_database(n_items: int, seed: int = 42):
+    import mongomock
+    from components.db import Database
+    database = Database()
+    database._db = mongomock.MongoClient()["healthcare"]
+    database.inventory.insert_many([it.model_dump() for it in make_items(n_items, seed=seed)])
+    return database
+
+
+def _forecast_case(n_items: int, events_per_item: int):
+    def setup():
+        from components import forecasting
+        items = make_items(n_items)
+        logs = make_usage_logs(items, events_per_item=events_per_item)
+        return lambda: forecasting.compute_forecasts_and_analytics(items, logs)
+    return setup
+
+
+for _n, _e in ((100, 20), (1000, 20), (5000, 10)):
+    case(f"forecast.compute[{_n}x{_e}]")(_forecast_case(_n, _e))
+
+
+@case("forecast.compute.year_window[5000x365]")
+def _forecast_year():
+    from components import forecasting
+    items = make_items(5000)
+    logs = make_usage_logs(items, days=365, events_per_item=20)
+    return lambda: forecasting.compute_forecasts_and_analytics(items, logs, window=365, horizon=30)
+
+
+@case("forecast.build_daily_usage_series[1000x30]")
+def _daily_series():
+    from components import forecasting
+    logs = make_usage_logs(make_items(1000), events_per_item=30)
+    return lambda: forecasting._build_daily_usage_series(logs, days=30)
+
+
+@case("db.find_best_match_by_name[2000]")
+def _best_match():
+    database = _mock_database(2000)
+    rng = random.Random(42)
+    queries = [f"{rng.choice(NOUNS).lower()}s" for _ in range(8)]
+    return lambda: [database.find_best_match_by_name(q) for q in queries]
+
+
+def _mock_usage_database(n_items: int, events_per_item: int):
+    from components.db import ROLLUP_PERIODS, period_start
+    database = _mock_database(n_items)
+    logs = make_usage_logs(make_items(n_items), events_per_item=events_per_item)
+    database.usage_logs.insert_many(logs)
+    # The rollup rows rebuild_rollups would write, inserted directly: mongomock's upserts are
+    # linear scans, which makes rebuild_rollups quadratic here and swamps the setup.
+    totals = {}
+    for log in logs:
+        for period in ROLLUP_PERIODS:
+            acc = totals.setdefault((period, log["itemId"], period_start(log["timestamp"], period)), [0, 0])
+            acc[0] += int(log["quantity"])
+            acc[1] += 1
+    database.usage_rollups.insert_many([
+        {"_id": f"{period}:{item_id}:{start.date().isoformat()}", "period": period, "itemId": item_id, "start": start, "quantity": q, "count": c}
+        for (period, item_id, start), (q, c) in totals.items()
+    ])
+    return database
+
+
+@case("db.analytics_usage.raw_logs[1000x30]")
+def _analytics_raw():
+    database = _mock_usage_database(1000, 30)
+    return database.get_usage_log_docs
+
+
+@case("db.analytics_usage.daily_rollups[1000x30]")
+def _analytics_rollups():
+    database = _mock_usage_database(1000, 30)
+    return lambda: list(database.get_daily_usage(30))
+
+
+def _log_usage_case(write_behind: bool, events: int = 200):
+    def setup():
+        import tempfile
+        database = _mock_database(200)
+        ids = [it.id for it in make_items(200)]
+        if write_behind:
+            database.enable_write_behind(journal_dir=tempfile.mkdtemp(), max_events=events, max_delay_ms=60000)
+
+        def run():
+            for i in range(events):
+                database.log_usage(ids[i % len(ids)], 1, "bench", stock_delta=-1)
+            if database.write_behind:
+                database.write_behind.flush()
+        return run
+    return setup
+
+
+case("db.log_usage.direct[200 events]")(_log_usage_case(False))
+case("db.log_usage.write_behind[200 events]")(_log_usage_case(True))
+
+
+@case("ids.new_id[10000]")
+def _new_ids():
+    from components.ids import new_id
+    return lambda: [new_id() for _ in range(10000)]
+
+
+@case("invoice.parse_invoice[500 lines]")
+def _parse_invoice():
+    from components.invoice_processor import parse_invoice
+    rng = random.Random(42)
+    lines = [f"{rng.choice(NOUNS)} {rng.randint(1, 99)}mg  {rng.randint(1, 50)}  {rng.uniform(1, 500):.2f}" for _ in range(500)]
+    lines += ["Subtotal 1234.00", "TVA 19% 234.46", "Total 1468.46"]
+    text = "\n".join(lines)
+    return lambda: parse_invoice(text)
+
+
+@case("llm.fallback_structure[8 commands]")
+def _fallback_structure():
+    from components.llm import LocalLLM
+    llm = LocalLLM()
+    commands = [
+        "I used three syringes", "add twenty five masks", "how many gloves do we have?",
+        "am folosit doua seringi", "Adaugă 10 seringi", "Câte bandaje avem?",
+        "we took 12 gauze pads", "restock forty two catheters",
+    ]
+    return lambda: [llm._fallback_structure(c) for c in commands]
+
+
+def _llm_encode_case(prefix_states: bool):
+    def setup():
+        import torch
+        from components.llm import LocalLLM
+        llm = LocalLLM()
+        llm.cache_prefix_states = prefix_states
+        llm._load_model()
+
+        def run():
+            with torch.no_grad():
+                return llm._encode_commands(["i used three syringes"])
+        return run
+    return setup
+
+
+case("llm.encode_command[token prefix cache]")(_llm_encode_case(False))
+case("llm.encode_command[encoder state cache]")(_llm_encode_case(True))
+
+
+def _synthetic_speech(seconds: float, seed: int = 42):
+    """Low-level noise with harmonic bursts standing in for words."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    sr = 16000
+    audio = (rng.standard_normal(int(sr * seconds)) * 0.002).astype(np.float32)
+    t = np.arange(int(sr * 0.4)) / sr
+    word = (0.3 * np.sin(2 * np.pi * 180 * t) + 0.15 * np.sin(2 * np.pi * 360 * t)).astype(np.float32)
+    for start in np.arange(1.0, seconds - 1.0, 0.9):
+        i = int(start * sr)
+        audio[i:i + word.size] += word
+    return audio
+
+
+@case("stt.vad.detect_speech[10s]")
+def _vad():
+    from components import vad
+    audio = _synthetic_speech(10.0)
+    return lambda: vad.detect_speech(audio)
+
+
+@case("stt.transcribe.silence_rejected[5s]")
+def _transcribe_silence():
+    import base64
+    import io
+    import wave
+    from components.stt import SpeechToText
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b"\x00\x00" * 16000 * 5)
+    payload = base64.b64encode(buf.getvalue()).decode("ascii")
+    stt = SpeechToText()
+    return lambda: stt.transcribe(payload)
+
+
+@case("routes.serialize_inventory.models[2000]")
+def _serialize_models():
+    from models import InventoryItem
+    docs = [it.model_dump() for it in make_items(2000)]
+    return lambda: [InventoryItem(**d).model_dump() for d in docs]
+
+
+@case("routes.serialize_inventory.docs[2000]")
+def _serialize_docs():
+    database = _mock_database(2000)
+    return database.get_inventory_docs
+
+
+def run_case(fn: Callable[[], object], rounds: int, min_time: float) -> Dict[str, float]:
+    fn()
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < rounds or (time.perf_counter() - started) < min_time:
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000.0)
+        if len(timings) >= rounds * 20:
+            break
+    timings.sort()
+    return {
+        "rounds": len(timings),
+        "median_ms": statistics.median(timings),
+        "min_ms": timings[0],
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser()
+    p.add_argument("-k", dest="keyword", default="", help="Only run cases whose name contains this string")
+    p.add_argument("--rounds", type=int, default=5)
+    p.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds spent timing each case")
+    p.add_argument("--save", action="store_true", help="Write results to the baseline file")
+    p.add_argument("--compare", action="store_true", help="Compare against the baseline file and fail on regressions")
+    p.add_argument("--tolerance", type=float, default=0.25, help="Allowed median slowdown before a case counts as a regression")
+    p.add_argument("--baseline", default=BASELINE_PATH)
+    args = p.parse_args(argv)
+
+    baseline: Dict[str, Dict[str, float]] = {}
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save first")
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results: Dict[str, Dict[str, float]] = {}
+    regressions = []
+    print(f"{'case':<46} {'median ms':>10} {'min ms':>10} {'p95 ms':>10} {'vs base':>9}")
+    for name, setup in CASES:
+        if args.keyword and args.keyword not in name:
+            continue
+        try:
+            fn = setup()
+        except ImportError as e:
+            print(f"{name:<46} skipped ({e})")
+            continue
+        r = run_case(fn, args.rounds, args.min_time)
+        results[name] = r
+        delta = ""
+        base = baseline.get(name)
+        if base:
+            ratio = r["median_ms"] / max(1e-9, base["median_ms"])
+            delta = f"{(ratio - 1) * 100:+.1f}%"
+            if ratio > 1 + args.tolerance:
+                regressions.append((name, ratio))
+        print(f"{name:<46} {r['median_ms']:>10.3f} {r['min_ms']:>10.3f} {r['p95_ms']:>10.3f} {delta:>9}")
+
+    if args.save:
+        merged = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                merged = json.load(f)
+        merged.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(merged, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} results to {args.baseline}")
+
+    if regressions:
+        for name, ratio in regressions:
+            print(f"REGRESSION {name}: {ratio:.2f}x baseline median")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Throughput of concurrent voice (Whisper + VITS) and invoice OCR (TrOCR) work under each torch profile.
+
+Each profile runs in a fresh subprocess, because inter-op threads can only be
+set once per process. Run from ``server/``::
+
+    python -m benchmarks.mixed_load
+    python -m benchmarks.mixed_load --profiles shared partitioned --voice-workers 4 --ocr-workers 2 --seconds 60
+"""
+from __future__ import annotations
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict
+
+from benchmarks.micro import _synthetic_speech
+from components import runtime
+
+
+def _invoice_image() -> bytes:
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (640, 48), "white")
+    ImageDraw.Draw(img).text((8, 16), "Syringe 5ml   10   2.50", fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def run_profile(profile: str, voice_workers: int, ocr_workers: int, seconds: float) -> Dict[str, object]:
+    os.environ["TORCH_PROFILE"] = profile
+    runtime.configure(profile)
+    from components.stt import stt
+    from components.tts import tts
+    from components.invoice_processor import extract_text
+
+    audio = _synthetic_speech(5.0)
+    image = _invoice_image()
+    jobs = {
+        "voice": lambda: (stt.transcribe_array(audio, "en"), tts.speak("I deducted 3 syringes.", "en")),
+        "ocr": lambda: extract_text(image),
+    }
+    for job in jobs.values():
+        job()
+
+    counts = {"voice": 0, "ocr": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind: str):
+        while time.perf_counter() < deadline:
+            jobs[kind]()
+            with lock:
+                counts[kind] += 1
+
+    threads = [threading.Thread(target=worker, args=("voice",)) for _ in range(voice_workers)]
+    threads += [threading.Thread(target=worker, args=("ocr",)) for _ in range(ocr_workers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "profile": profile,
+        "voice_per_min": counts["voice"] * 60.0 / elapsed,
+        "ocr_per_min": counts["ocr"] * 60.0 / elapsed,
+        "settings": runtime.report(),
+    }
+
+
+def main(profiles, voice_workers: int, ocr_workers: int, seconds: float):
+    print(f"{'profile':<12} {'voice/min':>10} {'ocr/min':>10}  settings")
+    for profile in profiles:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.mixed_load", "--child", profile,
+             "--voice-workers", str(voice_workers), "--ocr-workers", str(ocr_workers), "--seconds", str(seconds)],
+            capture_output=True, text=True,
+        )
+        lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+        if out.returncode != 0 or not lines:
+            tail = out.stderr.strip().splitlines()[-1:] or ["no output"]
+            print(f"{profile:<12} failed: {tail[0]}")
+            continue
+        r = json.loads(lines[-1])
+        models = r["settings"]["models"]
+        summary = " ".join(f"{m}={c.get('threads') or '-'}" for m, c in models.items())
+        print(f"{profile:<12} {r['voice_per_min']:>10.1f} {r['ocr_per_min']:>10.1f}  {summary}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--profiles", nargs="+", default=list(runtime.PROFILES))
+    p.add_argument("--voice-workers", type=int, default=2)
+    p.add_argument("--ocr-workers", type=int, default=2)
+    p.add_argument("--seconds", type=float, default=30.0)
+    p.add_argument("--child", help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.child:
+        print(json.dumps(run_profile(args.child, args.voice_workers, args.ocr_workers, args.seconds)))
+    else:
+        main(args.profiles, args.voice_workers, args.ocr_workers, args.seconds)
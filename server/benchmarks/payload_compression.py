@@ -0,0 +1,55 @@
+"""Compare /analytics-data payload size and encode latency across shapes and encodings.
+
+Run from ``server/``: ``python -m benchmarks.payload_compression --items 2000``
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+
+from components import forecasting
+from components.compression import available_encoders
+from benchmarks.fixtures import make_items, make_usage_logs
+
+
+def _payloads(n_items: int, seed: int) -> dict:
+    items = make_items(n_items, seed=seed)
+    logs = make_usage_logs(items, seed=seed)
+    forecasts, analytics = forecasting.compute_forecasts_and_analytics(items, logs)
+    records = {
+        "items": [it.model_dump() for it in items],
+        "forecasts": forecasts,
+        "analytics": analytics,
+    }
+    col_forecasts, col_analytics = forecasting.to_columnar_payload(forecasts, analytics)
+    columnar = {
+        "shape": "columnar",
+        "items": forecasting.to_columnar(records["items"]),
+        "forecasts": col_forecasts,
+        "analytics": col_analytics,
+    }
+    return {"records": records, "columnar": columnar}
+
+
+def main(n_items: int = 2000, seed: int = 42, level: int = 5, repeat: int = 5):
+    encoders = available_encoders()
+    print(f"{'shape':<10} {'encoding':<10} {'bytes':>12} {'ratio':>8} {'ms':>10}")
+    for shape, payload in _payloads(n_items, seed).items():
+        raw = json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+        print(f"{shape:<10} {'identity':<10} {len(raw):>12} {1.0:>8.2f} {0.0:>10.2f}")
+        for name, encode in encoders.items():
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                out = encode(raw, level)
+            ms = (time.perf_counter() - t0) * 1000.0 / repeat
+            print(f"{shape:<10} {name:<10} {len(out):>12} {len(raw) / max(1, len(out)):>8.2f} {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--items", type=int, default=2000)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--level", type=int, default=5)
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args()
+    main(n_items=args.items, seed=args.seed, level=args.level, repeat=args.repeat)
@@ -0,0 +1,44 @@
+"""Time the Monte Carlo stockout simulation across catalog sizes and memory budgets.
+
+Run from ``server/``::
+
+    python -m benchmarks.stockout_simulation
+    python -m benchmarks.stockout_simulation --items 1000 10000 --paths 2000 --memory-mb 64 256
+"""
+from __future__ import annotations
+import argparse
+import time
+
+import numpy as np
+
+from components import forecasting
+
+
+def main(item_counts, paths: int, horizon: int, history_days: int, budgets, seed: int):
+    rng = np.random.default_rng(seed)
+    print(f"{'items':>7} {'paths':>6} {'memory MB':>10} {'chunk':>7} {'seconds':>9} {'items/s':>9}")
+    for n in item_counts:
+        rates = rng.gamma(0.6, 4.0, size=n).astype(np.float32)
+        # Intermittent demand: about a third of days have no usage.
+        history = (rng.poisson(rates[:, None], size=(n, history_days)) * (rng.random((n, history_days)) > 0.33)).astype(np.float32)
+        stock = rng.integers(0, 400, size=n)
+        lead = rng.integers(2, 15, size=n)
+        for mb in budgets:
+            max_bytes = int(mb * 1024 * 1024)
+            chunk = forecasting._simulation_chunk(n, paths, max(horizon, int(lead.max())), max_bytes)
+            t0 = time.perf_counter()
+            forecasting.simulate_stockouts(stock, history, horizon, paths, lead, 0.95, seed, max_bytes)
+            elapsed = time.perf_counter() - t0
+            print(f"{n:>7} {paths:>6} {mb:>10} {chunk:>7} {elapsed:>9.2f} {n / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--items", type=int, nargs="+", default=[1000, 5000])
+    p.add_argument("--paths", type=int, default=2000)
+    p.add_argument("--horizon", type=int, default=30)
+    p.add_argument("--history", type=int, default=60)
+    p.add_argument("--memory-mb", type=float, nargs="+", default=[64, 256])
+    p.add_argument("--seed", type=int, default=42)
+    args = p.parse_args()
+    main(args.items, args.paths, args.horizon, args.history, args.memory_mb, args.seed)
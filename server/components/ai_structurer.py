@@ -1,12 +1,48 @@
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from models import VoiceCommand
 from components.llm import local_llm
 
+_NUMBER_WORDS = (
+    "one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|thirteen|fourteen|fifteen|sixteen|"
+    "seventeen|eighteen|nineteen|twenty|thirty|forty|fifty|unu|doi|doua|două|trei|patru|cinci|sase|șase|"
+    "sapte|șapte|opt|noua|nouă|zece|douazeci|douăzeci"
+)
+_SEPARATORS = re.compile(r"\s*(?:;|,(?!\d)|\.(?=\s|$)|\band then\b|\bthen\b|\band\b|\bapoi\b|\bși\b|\bsi\b)\s*", re.IGNORECASE)
+_QUANTITY = re.compile(rf"\b(?:\d+|{_NUMBER_WORDS})\b", re.IGNORECASE)
+
+
+def split_commands(transcript: str) -> List[str]:
+    """Split dictated text like "used 3 syringes, 5 gloves and 2 bandages" into single commands.
+
+    Fragments that start with a quantity inherit the verb phrase of the
+    previous fragment, so each piece can be structured on its own.
+    """
+    commands: List[str] = []
+    verb = ""
+    for frag in _SEPARATORS.split(transcript or ""):
+        frag = frag.strip(" .")
+        if not frag:
+            continue
+        m = _QUANTITY.search(frag)
+        if m and m.start() > 0 and re.search(r"[^\W\d_]", frag[:m.start()]):
+            verb = frag[:m.start()].strip()
+        elif m and m.start() == 0 and verb:
+            frag = f"{verb} {frag}"
+        if commands and not m and not re.search(r"\?$|how many|câte|cate", frag, re.IGNORECASE):
+            # No quantity and not a question: part of the previous item's name ("soap and water").
+            commands[-1] = f"{commands[-1]} and {frag}"
+            continue
+        commands.append(frag)
+    return commands
+
+
 class AIStructurer:
     def structure_command(self, transcript: str) -> VoiceCommand:
         print(f"AI structuring transcript: '{transcript}'")
-        structured = local_llm.structure_command(transcript)
+        return self._to_command(transcript, local_llm.structure_command(transcript))
+
+    def _to_command(self, transcript: str, structured: Dict[str, Any]) -> VoiceCommand:
         print(f"LLM structured: {structured}")
         action = (structured.get("action") or "unknown").lower()
         item = structured.get("item")
@@ -58,4 +94,11 @@ class AIStructurer:
 
         return VoiceCommand(type=action, item=item, quantity=qty, notes=notes)
 
+    def structure_commands(self, transcript: str) -> List[VoiceCommand]:
+        parts = split_commands(transcript)
+        if len(parts) <= 1:
+            return [self.structure_command(transcript)]
+        print(f"AI structuring {len(parts)} commands: {parts}")
+        return [self._to_command(p, s) for p, s in zip(parts, local_llm.structure_commands(parts))]
+
 ai_structurer = AIStructurer()
\ No newline at end of file
@@ -0,0 +1,188 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def _moving_average(train: np.ndarray, horizon: int, window: int = 7) -> np.ndarray:
+    level = train[:, -min(window, train.shape[1]):].mean(axis=1)
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+def _exponential_smoothing(train: np.ndarray, horizon: int, alpha: float = 0.3) -> np.ndarray:
+    level = train[:, 0].copy()
+    for t in range(1, train.shape[1]):
+        level += alpha * (train[:, t] - level)
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+def _croston(train: np.ndarray, horizon: int, alpha: float = 0.1) -> np.ndarray:
+    """Croston's method with the Syntetos-Boylan bias correction, for intermittent demand."""
+    n = train.shape[0]
+    size = np.zeros(n, dtype=np.float32)
+    interval = np.ones(n, dtype=np.float32)
+    since = np.ones(n, dtype=np.float32)
+    seen = np.zeros(n, dtype=bool)
+    for t in range(train.shape[1]):
+        demand = train[:, t] > 0
+        first = demand & ~seen
+        update = demand & seen
+        size = np.where(first, train[:, t], np.where(update, size + alpha * (train[:, t] - size), size))
+        interval = np.where(first, since, np.where(update, interval + alpha * (since - interval), interval))
+        seen |= demand
+        since = np.where(demand, 1.0, since + 1.0)
+    rate = np.where(seen, (1 - alpha / 2) * size / np.maximum(interval, 1.0), 0.0)
+    return np.repeat(rate[:, None].astype(np.float32), horizon, axis=1)
+
+
+def _legacy(train: np.ndarray, horizon: int) -> np.ndarray:
+    from components.forecasting import forecast_usage
+    return np.stack([np.asarray(forecast_usage(row, horizon=horizon), dtype=np.float32) for row in train])
+
+
+# Candidate models: each maps an (items, days) history to an (items, horizon) forecast.
+MODELS: Dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    "moving_average": _moving_average,
+    "exp_smoothing": _exponential_smoothing,
+    "croston": _croston,
+    "ma_trend": _legacy,
+}
+
+
+def forecast(model: str, history: np.ndarray, horizon: int) -> np.ndarray:
+    return MODELS[model](np.atleast_2d(np.asarray(history, dtype=np.float32)), horizon)
+
+
+def _evaluate(args) -> Dict[str, np.ndarray]:
+    """Absolute error and actual totals per model for one chunk of items over all rolling origins."""
+    series, horizon, origins, models = args
+    days = series.shape[1]
+    errors = {m: np.zeros(series.shape[0], dtype=np.float64) for m in models}
+    actual_total = np.zeros(series.shape[0], dtype=np.float64)
+    for k in range(origins, 0, -1):
+        origin = days - k * horizon
+        if origin < horizon:
+            continue
+        actual = series[:, origin:origin + horizon]
+        actual_total += actual.sum(axis=1)
+        for m in models:
+            errors[m] += np.abs(MODELS[m](series[:, :origin], horizon) - actual).sum(axis=1)
+    return {"errors": errors, "actual": actual_total}
+
+
+def _mp_context():
+    method = os.getenv("FORECAST_START_METHOD") or ("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+    return multiprocessing.get_context(method)
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """Process count for ``backtest``: ``workers``, else ``FORECAST_WORKERS``; unset or 0 means the CPU count."""
+    if not workers:
+        workers = int(os.getenv("FORECAST_WORKERS") or 0)
+    return max(1, workers or os.cpu_count() or 1)
+
+
+def backtest(series: np.ndarray, horizon: int = 7, origins: int = 4, models: Optional[List[str]] = None, workers: Optional[int] = None, chunk: int = 1000) -> Dict[str, Any]:
+    """Score every candidate model per item over rolling forecast origins.
+
+    The last ``origins`` windows of ``horizon`` days are each forecast from the
+    data before them. Items are split into ``chunk``-row slices and evaluated
+    in a process pool of ``workers`` (``FORECAST_WORKERS``, default the CPU
+    count); every model is vectorized over the rows of a slice. The pool
+    starts its workers with ``FORECAST_START_METHOD`` (default ``forkserver``
+    where available, else ``spawn``), never a plain fork of this process,
+    whose Mongo monitors, flusher and torch threads could leave held locks
+    in the children.
+
+    Returns ``model`` (best model name per item), ``wape`` (its weighted
+    absolute percentage error) and ``confidence`` (``1 - wape`` clipped to
+    [0.05, 0.99]).
+    """
+    models = models or list(MODELS)
+    series = np.asarray(series, dtype=np.float32)
+    workers = resolve_workers(workers)
+    tasks = [(series[i:i + chunk], horizon, origins, models) for i in range(0, series.shape[0], chunk)]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=_mp_context()) as pool:
+            parts = list(pool.map(_evaluate, tasks))
+    else:
+        parts = [_evaluate(t) for t in tasks]
+    if not parts:
+        return {"model": [], "wape": np.zeros(0), "confidence": np.zeros(0), "models": models}
+    errors = np.stack([np.concatenate([p["errors"][m] for p in parts]) for m in models])
+    actual = np.concatenate([p["actual"] for p in parts])
+    # Ties (e.g. items with no usage at all) go to the earliest-listed, simplest model.
+    best = errors.argmin(axis=0)
+    best_error = errors[best, np.arange(errors.shape[1])]
+    wape = np.where(actual > 0, best_error / np.maximum(actual, 1e-9), np.where(best_error > 0, 1.0, 0.0))
+    return {
+        "model": [models[i] for i in best],
+        "wape": wape,
+        "confidence": np.clip(1.0 - wape, 0.05, 0.99),
+        "models": models,
+    }
+
+
+class ModelSelection:
+    """Per-item best-model choices, persisted in MongoDB and cached in memory.
+
+    ``choices()`` serves the cached map (reloaded after ``FORECAST_MODEL_TTL_S``);
+    ``start()`` launches a background backtest over the catalog and stores its
+    result, and ``status`` reports the latest run.
+    """
+
+    def __init__(self):
+        self._choices: Optional[Dict[str, dict]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.status: Dict[str, Any] = {"state": "idle"}
+
+    def choices(self, database) -> Dict[str, dict]:
+        ttl = float(os.getenv("FORECAST_MODEL_TTL_S", "3600"))
+        if self._choices is None or time.monotonic() - self._loaded_at > ttl:
+            self._choices = database.get_forecast_models()
+            self._loaded_at = time.monotonic()
+        return self._choices
+
+    def run(self, database, history_days: int = 120, horizon: int = 7, origins: int = 4, workers: Optional[int] = None) -> Dict[str, Any]:
+        from components.forecasting import usage_matrix
+        t0 = time.perf_counter()
+        ids = [it["id"] for it in database.get_inventory_docs()]
+        series = usage_matrix(ids, database.get_daily_usage(history_days), history_days)
+        result = backtest(series, horizon=horizon, origins=origins, workers=workers)
+        now = datetime.now()
+        docs = [
+            {"itemId": item_id, "model": model, "wape": float(wape), "confidence": float(conf), "evaluatedAt": now}
+            for item_id, model, wape, conf in zip(ids, result["model"], result["wape"], result["confidence"])
+        ]
+        database.save_forecast_models(docs)
+        self._choices = {d["itemId"]: d for d in docs}
+        self._loaded_at = time.monotonic()
+        counts: Dict[str, int] = {}
+        for m in result["model"]:
+            counts[m] = counts.get(m, 0) + 1
+        return {"items": len(ids), "modelCounts": counts, "seconds": round(time.perf_counter() - t0, 2)}
+
+    def start(self, database, **options) -> Dict[str, Any]:
+        with self._lock:
+            if self.status.get("state") == "running":
+                return self.status
+            self.status = {"state": "running", "startedAt": datetime.now().isoformat()}
+
+        def job():
+            try:
+                summary = self.run(database, **options)
+                self.status = {"state": "done", "finishedAt": datetime.now().isoformat(), **summary}
+            except Exception as e:
+                print(f"Forecast backtest failed: {e}")
+                self.status = {"state": "failed", "error": str(e)}
+        threading.Thread(target=job, name="forecast-backtest", daemon=True).start()
+        return self.status
+
+
+model_selection = ModelSelection()
@@ -0,0 +1,82 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+from components.metrics import current_spans, inc, spans_for
+
+
+class Coalescer:
+    """Gather calls from many threads into batches for one worker thread.
+
+    ``submit`` blocks its caller until the batch containing its item has run.
+    The worker takes the first queued item, then keeps collecting for up to
+    ``max_wait_ms`` or until ``max_batch`` items are queued, and hands the
+    whole list to ``batch_fn``, which must return one result per item in the
+    same order. While a batch is running, new calls queue up and form the next
+    batch, so batches grow with load instead of adding latency when idle.
+    ``max_batch=1`` disables batching and runs ``batch_fn`` in the caller.
+    Spans recorded while a batch runs are added to the ``Server-Timing`` of
+    every request that had an item in it.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch: Optional[int] = None, max_wait_ms: Optional[float] = None, name: str = "batch"):
+        self.batch_fn = batch_fn
+        self.max_batch = int(max_batch or os.getenv("LLM_BATCH_MAX", "16"))
+        self.max_wait = float(max_wait_ms if max_wait_ms is not None else os.getenv("LLM_BATCH_WAIT_MS", "5")) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, item: Any) -> Any:
+        return self.submit_many([item])[0]
+
+    def submit_many(self, items: List[Any]) -> List[Any]:
+        """Queue several items at once so they can share a batch; results keep the input order."""
+        if self.max_batch <= 1:
+            return [self.batch_fn([item])[0] for item in items]
+        futures = []
+        spans = current_spans()
+        for item in items:
+            fut: Future = Future()
+            self._queue.put((item, fut, spans))
+            futures.append(fut)
+        self._ensure_worker()
+        return [fut.result() for fut in futures]
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"{self.name}-coalescer", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            inc(f"{self.name}_batches_total", f"Batches run by the {self.name} coalescer")
+            inc(f"{self.name}_batched_items_total", f"Items run through the {self.name} coalescer", len(batch))
+            try:
+                with spans_for([spans for _item, _fut, spans in batch]):
+                    results = self.batch_fn([item for item, _fut, _spans in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _item, fut, _spans in batch:
+                    fut.set_exception(e)
+                continue
+            for (_item, fut, _spans), result in zip(batch, results):
+                fut.set_result(result)
@@ -0,0 +1,174 @@
+import gzip
+import os
+from typing import Callable, Dict, List, Optional
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except Exception:
+    brotli = None
+    HAS_BROTLI = False
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except Exception:
+    zstandard = None
+    HAS_ZSTD = False
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data: bytes, level: int) -> bytes:
+    return brotli.compress(data, quality=min(11, level))
+
+
+def _zstd(data: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def available_encoders() -> Dict[str, Callable[[bytes, int], bytes]]:
+    """Encoders usable in this process, in server preference order."""
+    encoders: Dict[str, Callable[[bytes, int], bytes]] = {}
+    if HAS_BROTLI:
+        encoders["br"] = _brotli
+    if HAS_ZSTD:
+        encoders["zstd"] = _zstd
+    encoders["gzip"] = _gzip
+    return encoders
+
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(header: Optional[str], encoders: List[str]) -> Optional[str]:
+    if not header:
+        return None
+    accepted = _parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best = None
+    best_q = 0.0
+    for name in encoders:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best = name
+            best_q = q
+    return best
+
+
+# Content types passed through uncompressed: already-compressed media and
+# opaque binaries gain nothing, and event streams must not be buffered.
+SKIP_CONTENT_TYPES = ("audio/", "image/", "video/", "application/octet-stream", "text/event-stream")
+
+
+def should_compress(content_type: str) -> bool:
+    return not content_type.strip().lower().startswith(SKIP_CONTENT_TYPES)
+
+
+def _compressible(headers: list) -> bool:
+    """Whether the middleware could compress a response with these headers, for some client."""
+    names = {k.lower(): v for k, v in headers}
+    return b"content-encoding" not in names and should_compress(names.get(b"content-type", b"").decode("latin-1"))
+
+
+def _with_vary(headers: list) -> list:
+    """``headers`` with ``Accept-Encoding`` added to ``Vary``, merged into an existing one."""
+    out = []
+    found = False
+    for k, v in headers:
+        if k.lower() == b"vary":
+            found = True
+            values = [p.strip().lower() for p in v.split(b",")]
+            if b"accept-encoding" not in values and b"*" not in values:
+                v = v + b", Accept-Encoding"
+        out.append((k, v))
+    if not found:
+        out.append((b"vary", b"Accept-Encoding"))
+    return out
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing buffered HTTP responses above a size threshold.
+
+    Picks the best of br / zstd / gzip that both the client (``Accept-Encoding``)
+    and this process support. Responses that already carry a ``Content-Encoding``
+    or whose content type is in ``SKIP_CONTENT_TYPES`` (audio, images, raw
+    binaries, server-sent events) are passed through untouched. Every other
+    response gets ``Vary: Accept-Encoding``, compressed or not, so shared
+    caches keep the variants apart.
+    """
+
+    def __init__(self, app, minimum_size: Optional[int] = None, level: Optional[int] = None):
+        self.app = app
+        self.minimum_size = int(minimum_size if minimum_size is not None else os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        self.level = int(level if level is not None else os.getenv("COMPRESSION_LEVEL", "5"))
+        self.encoders = available_encoders()
+        disabled = {e.strip() for e in os.getenv("COMPRESSION_DISABLED", "").split(",") if e.strip()}
+        for name in disabled:
+            self.encoders.pop(name, None)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        encoding = negotiate_encoding(headers.get("accept-encoding"), list(self.encoders))
+        if encoding is None:
+            # Not compressed for this client, but the same URL may be for another, so caches must key on it.
+            async def vary_only(message):
+                if message["type"] == "http.response.start" and _compressible(message.get("headers", [])):
+                    message = {**message, "headers": _with_vary(list(message.get("headers", [])))}
+                await send(message)
+
+            await self.app(scope, receive, vary_only)
+            return
+
+        start_message = None
+        body_parts: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if not _compressible(message.get("headers", [])):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+            if message["type"] == "http.response.body":
+                body_parts.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                body = b"".join(body_parts)
+                resp_headers = _with_vary([(k, v) for k, v in start_message.get("headers", []) if k.lower() != b"content-length"])
+                if len(body) >= self.minimum_size:
+                    body = self.encoders[encoding](body, self.level)
+                    resp_headers.append((b"content-encoding", encoding.encode("latin-1")))
+                resp_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                await send({**start_message, "headers": resp_headers})
+                await send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,9 +1,316 @@
 import os
-from pymongo import MongoClient
+import threading
+import time
+from pymongo import MongoClient, UpdateMany, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
 from pymongo.collection import Collection
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+from pydantic import TypeAdapter
+from components.ids import derived_id, is_id, new_id
+from components.metrics import timed_db
+from components.write_behind import APPLIED_FIELD, UsageBuffer
 from models import InventoryItem, UsageLog, Supplier, PurchaseOrder, PurchaseOrderItem
-from datetime import datetime
+from datetime import datetime, timedelta
+
+_usage_logs_adapter = TypeAdapter(List[UsageLog])
+_purchase_orders_adapter = TypeAdapter(List[PurchaseOrder])
+
+
+def _projection(model, nested: Optional[dict] = None) -> dict:
+    """Mongo projection selecting only the fields declared on ``model``."""
+    proj = {"_id": 0}
+    for name in model.model_fields:
+        sub = (nested or {}).get(name)
+        if sub is not None:
+            for sub_name in sub.model_fields:
+                proj[f"{name}.{sub_name}"] = 1
+        else:
+            proj[name] = 1
+    return proj
+
+
+def _optional_defaults(model) -> dict:
+    return {name: None for name, field in model.model_fields.items() if not field.is_required() and field.default is None}
+
+
+INVENTORY_PROJECTION = _projection(InventoryItem)
+USAGE_LOG_PROJECTION = _projection(UsageLog)
+PURCHASE_ORDER_PROJECTION = _projection(PurchaseOrder, nested={"items": PurchaseOrderItem})
+
+_INVENTORY_DEFAULTS = _optional_defaults(InventoryItem)
+_USAGE_LOG_DEFAULTS = _optional_defaults(UsageLog)
+_PURCHASE_ORDER_DEFAULTS = _optional_defaults(PurchaseOrder)
+
+
+# Case-insensitive comparison for item names ("syringes" == "Syringes").
+NAME_COLLATION = {"locale": "en", "strength": 2}
+
+# Documents seeded without an ``id`` are left out of the unique indexes.
+_HAS_ID = {"partialFilterExpression": {"id": {"$exists": True}}}
+
+INDEXES = {
+    "inventory": [
+        ([("id", ASCENDING)], {"name": "id_unique", "unique": True, **_HAS_ID}),
+        ([("name", ASCENDING)], {"name": "name_ci", "collation": NAME_COLLATION}),
+    ],
+    "usage_logs": [
+        ([("id", ASCENDING)], {"name": "id_unique", "unique": True, **_HAS_ID}),
+        ([("itemId", ASCENDING), ("timestamp", DESCENDING)], {"name": "itemId_timestamp"}),
+        ([("timestamp", DESCENDING)], {"name": "timestamp"}),
+    ],
+    "purchase_orders": [
+        ([("id", ASCENDING)], {"name": "id_unique", "unique": True, **_HAS_ID}),
+        ([("createdAt", DESCENDING)], {"name": "createdAt"}),
+    ],
+    "suppliers": [
+        ([("id", ASCENDING)], {"name": "id_unique", "unique": True, **_HAS_ID}),
+    ],
+    "usage_rollups": [
+        ([("period", ASCENDING), ("start", DESCENDING)], {"name": "period_start"}),
+        ([("itemId", ASCENDING), ("period", ASCENDING), ("start", DESCENDING)], {"name": "itemId_period_start"}),
+    ],
+    "sync_mutations": [
+        ([("at", ASCENDING)], {"name": "at_ttl", "expireAfterSeconds": 30 * 24 * 3600}),
+    ],
+    "usage_archive": [
+        ([("itemId", ASCENDING), ("day", DESCENDING)], {"name": "itemId_day", "unique": True}),
+    ],
+}
+
+# (name, collection, filter, sort, collation) for the queries the API runs per request.
+# Full listings of inventory and suppliers scan by design and are not included.
+HOT_QUERIES = [
+    ("inventory.by_id", "inventory", {"id": "probe"}, None, None),
+    ("inventory.by_name", "inventory", {"name": "probe"}, None, NAME_COLLATION),
+    ("usage_logs.by_item", "usage_logs", {"itemId": "probe"}, [("timestamp", DESCENDING)], None),
+    ("usage_logs.recent", "usage_logs", {}, [("timestamp", DESCENDING)], None),
+    ("purchase_orders.by_id", "purchase_orders", {"id": "probe"}, None, None),
+    ("purchase_orders.recent", "purchase_orders", {}, [("createdAt", DESCENDING)], None),
+    ("usage_logs.page", "usage_logs", {"id": {"$lt": "~"}}, [("id", DESCENDING)], None),
+    ("purchase_orders.page", "purchase_orders", {"id": {"$lt": "~"}}, [("id", DESCENDING)], None),
+    ("usage_rollups.daily", "usage_rollups", {"period": "day", "start": {"$gte": datetime(2000, 1, 1)}}, None, None),
+]
+
+ROLLUP_PERIODS = ("day", "week", "month")
+
+
+def period_start(ts: datetime, period: str) -> datetime:
+    day = datetime(ts.year, ts.month, ts.day)
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _rollup_writes(events: List[Tuple[str, int, datetime, int]]) -> List[UpdateOne]:
+    """Upserts adding ``(item_id, quantity, timestamp, count)`` events to their day/week/month totals."""
+    totals: Dict[Tuple[str, str, datetime], List[int]] = {}
+    for item_id, quantity, ts, count in events:
+        for period in ROLLUP_PERIODS:
+            acc = totals.setdefault((period, item_id, period_start(ts, period)), [0, 0])
+            acc[0] += int(quantity)
+            acc[1] += count
+    now = datetime.now()
+    return [
+        UpdateOne(
+            {"_id": f"{period}:{item_id}:{start.date().isoformat()}"},
+            {
+                "$inc": {"quantity": quantity, "count": count},
+                "$set": {"updatedAt": now},
+                "$setOnInsert": {"period": period, "itemId": item_id, "start": start},
+            },
+            upsert=True,
+        )
+        for (period, item_id, start), (quantity, count) in totals.items()
+    ]
+
+
+def insert_new(collection, docs: List[dict]) -> List[dict]:
+    """``insert_many`` that skips documents rejected by a unique index; returns the ones inserted."""
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        duplicate = {err["index"] for err in errors}
+        return [doc for i, doc in enumerate(docs) if i not in duplicate]
+    return docs
+
+
+def rebuild_rollups(database, batch_size: int = 5000) -> int:
+    """Recompute ``usage_rollups`` from raw and archived usage; returns the number of rollup rows."""
+    events = []
+    for log in database["usage_logs"].find({}, {"_id": 0, "itemId": 1, "quantity": 1, "timestamp": 1}):
+        if log.get("itemId") and isinstance(log.get("timestamp"), datetime):
+            events.append((log["itemId"], int(log.get("quantity") or 0), log["timestamp"], 1))
+    for bucket in database["usage_archive"].find({}, {"_id": 0, "itemId": 1, "day": 1, "quantity": 1, "count": 1}):
+        events.append((bucket["itemId"], int(bucket.get("quantity") or 0), bucket["day"], int(bucket.get("count") or 0)))
+    database["usage_rollups"].delete_many({})
+    writes = _rollup_writes(events)
+    for i in range(0, len(writes), batch_size):
+        database["usage_rollups"].bulk_write(writes[i:i + batch_size], ordered=False)
+    return len(writes)
+
+
+def archive_usage(database, retention_days: Optional[int] = None, batch_size: int = 5000) -> int:
+    """Move raw usage logs older than the retention window into per-item, per-day archive buckets.
+
+    Rollups already hold the totals, so analytics are unaffected; the archive
+    keeps every event compactly for audits. Each bucket lists the ``_id`` of
+    every log it holds in ``archived`` and a log is only added if its id is
+    not there yet, so a run that dies between archiving and deleting the raw
+    logs is simply finished by the next one without double counting.
+    Returns the number of logs moved.
+    """
+    if retention_days is None:
+        retention_days = int(os.getenv("USAGE_RETENTION_DAYS", "90"))
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    moved = 0
+    while True:
+        batch = list(database["usage_logs"].find({"timestamp": {"$lt": cutoff}}).limit(batch_size))
+        if not batch:
+            return moved
+        keyed = [(log.get("itemId"), period_start(log["timestamp"], "day"), log) for log in batch]
+        database["usage_archive"].bulk_write([
+            UpdateOne({"itemId": item_id, "day": day}, {"$setOnInsert": {"quantity": 0, "count": 0, "events": [], "archived": []}}, upsert=True)
+            for item_id, day in {(item_id, day) for item_id, day, _log in keyed}
+        ], ordered=False)
+        database["usage_archive"].bulk_write([
+            UpdateOne(
+                {"itemId": item_id, "day": day, "archived": {"$ne": log["_id"]}},
+                {
+                    "$push": {"events": {k: v for k, v in log.items() if k != "_id"}, "archived": log["_id"]},
+                    "$inc": {"quantity": int(log.get("quantity") or 0), "count": 1},
+                },
+            )
+            for item_id, day, log in keyed
+        ], ordered=False)
+        database["usage_logs"].delete_many({"_id": {"$in": [log["_id"] for log in batch]}})
+        moved += len(batch)
+
+
+def _keyset_page(collection, query: dict, projection: dict, cursor_id: Optional[str], limit: Optional[int], descending: bool):
+    """One page of ``collection`` ordered by ``id`` after ``cursor_id``, served by the unique ``id`` index."""
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be at least 1")
+    if cursor_id:
+        bound = {"$lt" if descending else "$gt": cursor_id}
+    else:
+        bound = {"$exists": True}  # lets the planner use the partial id index
+    cursor = collection.find({**query, "id": bound}, projection).sort("id", DESCENDING if descending else ASCENDING)
+    return cursor.limit(limit) if limit is not None else cursor
+
+
+# Field dating each document, used to give a migrated document an id from its own time.
+_ID_TIME_FIELDS = {"inventory": "lastUpdated", "usage_logs": "timestamp", "purchase_orders": "createdAt"}
+
+
+def _legacy_time(doc: dict, field: str) -> Optional[datetime]:
+    if isinstance(doc.get(field), datetime):
+        return doc[field]
+    try:
+        return datetime.fromtimestamp(float(str(doc.get("id")).split("-")[0]))
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def migrate_legacy_ids(database, batch_size: int = 1000) -> Dict[str, int]:
+    """Replace ids not made by ``components.ids`` (timestamp strings, seed ids) with generated ones.
+
+    New ids carry the document's own time, so migrated data sorts with new
+    data; the old id is kept in ``legacyId``. Item ids are also rewritten in
+    usage logs, archive buckets and purchase order lines, then rollups are
+    rebuilt and stale model choices dropped. Stop the API first (the
+    write-behind journal must be flushed). Safe to run again: references are
+    fixed from every ``legacyId`` on inventory, so an interrupted run finishes.
+    """
+    counts: Dict[str, int] = {}
+    for name, field in _ID_TIME_FIELDS.items():
+        collection = database[name]
+        writes = []
+        counts[name] = 0
+        for doc in collection.find({"id": {"$exists": True}}, {"_id": 1, "id": 1, field: 1}):
+            if is_id(doc["id"]):
+                continue
+            writes.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"id": new_id(_legacy_time(doc, field)), "legacyId": doc["id"]}}))
+            if len(writes) >= batch_size:
+                counts[name] += collection.bulk_write(writes, ordered=False).modified_count
+                writes = []
+        if writes:
+            counts[name] += collection.bulk_write(writes, ordered=False).modified_count
+
+    item_map = {doc["legacyId"]: doc["id"] for doc in database["inventory"].find({"legacyId": {"$exists": True}}, {"_id": 0, "id": 1, "legacyId": 1})}
+    old_ids = list(item_map)
+    rewritten = 0
+    for i in range(0, len(old_ids), batch_size):
+        chunk = old_ids[i:i + batch_size]
+        for name in ("usage_logs", "usage_archive"):
+            rewritten += database[name].bulk_write(
+                [UpdateMany({"itemId": old}, {"$set": {"itemId": item_map[old]}}) for old in chunk], ordered=False
+            ).modified_count
+        rewritten += database["purchase_orders"].bulk_write([
+            UpdateMany({"items.itemId": old}, {"$set": {"items.$[line].itemId": item_map[old]}}, array_filters=[{"line.itemId": old}])
+            for old in chunk
+        ], ordered=False).modified_count
+        database["forecast_models"].delete_many({"_id": {"$in": chunk}})
+    counts["references"] = rewritten
+    if rewritten:
+        counts["usage_rollups"] = rebuild_rollups(database)
+    return counts
+
+
+def ensure_indexes(database) -> List[str]:
+    """Create the indexes in ``INDEXES``; existing identical indexes are left alone."""
+    created = []
+    for collection, specs in INDEXES.items():
+        for keys, options in specs:
+            try:
+                created.append(f"{collection}.{database[collection].create_index(keys, **options)}")
+            except Exception as e:
+                print(f"Could not create index {collection}.{options['name']}: {e}")
+    return created
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []) or []:
+        stages += _plan_stages(child)
+    return stages
+
+
+def _client_options() -> dict:
+    """Pool, timeout and read preference settings for ``MongoClient`` from the environment."""
+    options = {
+        "maxPoolSize": int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+        "minPoolSize": int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGODB_MAX_IDLE_MS", "60000")),
+        "connectTimeoutMS": int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "readPreference": os.getenv("MONGODB_READ_PREFERENCE", "primary"),
+    }
+    if os.getenv("MONGODB_SOCKET_TIMEOUT_MS"):
+        options["socketTimeoutMS"] = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS"))
+    if os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS"):
+        options["waitQueueTimeoutMS"] = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS"))
+    return options
+
+
+def _with_status(item_data: dict) -> dict:
+    if item_data.get('status') is None:
+        current_stock = item_data.get('currentStock', 0) or 0
+        min_stock = item_data.get('minStock', 0) or 0
+        if current_stock <= 0:
+            item_data['status'] = 'out-of-stock'
+        elif current_stock <= min_stock:
+            item_data['status'] = 'low-stock'
+        else:
+            item_data['status'] = 'in-stock'
+    return item_data
 
 class Database:
     def __init__(self):
@@ -13,11 +320,16 @@ class Database:
         self._usage_logs = None
         self._suppliers = None
         self._purchase_orders = None
+        self._usage_rollups = None
+        self.write_behind: Optional[UsageBuffer] = None
+        self._supplier_cache: Optional[Dict[str, Supplier]] = None
+        self._supplier_loaded_at = 0.0
+        self._supplier_lock = threading.Lock()
 
     @property
     def client(self):
         if self._client is None:
-            self._client = MongoClient(os.getenv("MONGODB_URI"))
+            self._client = MongoClient(os.getenv("MONGODB_URI"), **_client_options())
         return self._client
 
     @property
@@ -50,18 +362,57 @@ class Database:
             self._purchase_orders = self.db["purchase_orders"]
         return self._purchase_orders
 
+    @property
+    def usage_rollups(self):
+        if self._usage_rollups is None:
+            self._usage_rollups = self.db["usage_rollups"]
+        return self._usage_rollups
+
+    def enable_write_behind(self, **options) -> UsageBuffer:
+        """Route ``log_usage`` through a journaled write-behind buffer (replays leftover journals)."""
+        if self.write_behind is None:
+            self.write_behind = UsageBuffer(self, **options)
+            self.write_behind.start()
+        return self.write_behind
+
+    def _inventory_projection(self) -> dict:
+        return {**INVENTORY_PROJECTION, APPLIED_FIELD: 1} if self.write_behind else INVENTORY_PROJECTION
+
+    def _pending_stock(self) -> Optional[Dict[str, Dict[str, int]]]:
+        """Buffered stock changes; take the snapshot before reading the inventory documents."""
+        return self.write_behind.unapplied() if self.write_behind else None
+
+    @staticmethod
+    def _apply_pending(doc: dict, pending: Optional[Dict[str, Dict[str, int]]]) -> dict:
+        applied = doc.pop(APPLIED_FIELD, None) or ()
+        if pending:
+            delta = sum(deltas.get(doc.get("id"), 0) for batch_id, deltas in pending.items() if batch_id not in applied)
+            if delta:
+                doc["currentStock"] = (doc.get("currentStock") or 0) + delta
+        return doc
+
+    def ensure_indexes(self) -> List[str]:
+        return ensure_indexes(self.db)
+
+    def explain_hot_queries(self) -> Dict[str, List[str]]:
+        """Winning-plan stages for each query in ``HOT_QUERIES``."""
+        plans = {}
+        for name, collection, query, sort, collation in HOT_QUERIES:
+            cursor = self.db[collection].find(query, collation=collation)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+            plans[name] = _plan_stages(plan)
+        return plans
+
+    @timed_db("get_inventory_items")
     def get_inventory_items(self) -> List[InventoryItem]:
         items = []
-        for item_data in self.inventory.find():
+        pending = self._pending_stock()
+        for item_data in self.inventory.find({}, self._inventory_projection()):
+            self._apply_pending(item_data, pending)
             if 'status' not in item_data:
-                current_stock = item_data.get('currentStock', 0)
-                min_stock = item_data.get('minStock', 0)
-                if current_stock <= 0:
-                    item_data['status'] = 'out-of-stock'
-                elif current_stock <= min_stock:
-                    item_data['status'] = 'low-stock'
-                else:
-                    item_data['status'] = 'in-stock'
+                _with_status(item_data)
 
             try:
                 item = InventoryItem(**item_data)
@@ -72,16 +423,27 @@ class Database:
                 continue
         return items
 
+    @timed_db("get_inventory_item")
     def get_inventory_item(self, item_id: str) -> Optional[InventoryItem]:
+        pending = self._pending_stock()
         item = self.inventory.find_one({"id": item_id})
-        return InventoryItem(**item) if item else None
+        return InventoryItem(**self._apply_pending(item, pending)) if item else None
 
+    @timed_db("update_stock")
     def update_stock(self, item_id: str, new_stock: int):
+        if self.write_behind:
+            # An absolute value must land after any buffered increments, not before them.
+            self.write_behind.flush()
         self.inventory.update_one({"id": item_id}, {"$set": {"currentStock": new_stock}})
 
-    def log_usage(self, item_id: str, quantity: int, user: str, notes: Optional[str] = None):
+    @timed_db("log_usage")
+    def log_usage(self, item_id: str, quantity: int, user: str, notes: Optional[str] = None, stock_delta: int = 0):
+        """Record a usage event and optionally change stock by ``stock_delta`` in the same step."""
+        if self.write_behind:
+            self.write_behind.add(item_id, quantity, user, notes, stock_delta)
+            return
         log = UsageLog(
-            id=str(datetime.now().timestamp()),
+            id=new_id(),
             itemId=item_id,
             quantity=quantity,
             user=user,
@@ -89,18 +451,87 @@ class Database:
             notes=notes
         )
         self.usage_logs.insert_one(log.model_dump())
+        self.usage_rollups.bulk_write(_rollup_writes([(item_id, quantity, log.timestamp, 1)]), ordered=False)
+        if stock_delta:
+            self.inventory.update_one({"id": item_id}, {"$inc": {"currentStock": stock_delta}})
 
     def get_usage_logs(self, item_id: Optional[str] = None) -> List[UsageLog]:
+        return _usage_logs_adapter.validate_python(self.get_usage_log_docs(item_id))
+
+    @timed_db("get_usage_log_docs")
+    def get_usage_log_docs(self, item_id: Optional[str] = None, before: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        """Read-only fast path: projected raw documents, no model construction.
+
+        With ``before`` or ``limit`` the logs are paged newest first by id
+        (ids are time-ordered); pass the last id of a page as ``before`` to
+        get the next one.
+        """
         query = {"itemId": item_id} if item_id else {}
-        logs = []
-        for log in self.usage_logs.find(query).sort("timestamp", -1):
-            logs.append(UsageLog(**log))
-        return logs
+        if before is None and limit is None:
+            cursor = self.usage_logs.find(query, USAGE_LOG_PROJECTION).sort("timestamp", -1)
+        else:
+            cursor = _keyset_page(self.usage_logs, query, USAGE_LOG_PROJECTION, before, limit, descending=True)
+        return [{**_USAGE_LOG_DEFAULTS, **log} for log in cursor]
+
+    @timed_db("get_usage_rollups")
+    def get_usage_rollups(self, period: str = "day", since: Optional[datetime] = None, item_id: Optional[str] = None) -> List[dict]:
+        """Usage totals per item per ``day``, ``week`` or ``month``, oldest first."""
+        query: dict = {"period": period}
+        if since is not None:
+            query["start"] = {"$gte": period_start(since, period)}
+        if item_id:
+            query["itemId"] = item_id
+        return list(self.usage_rollups.find(query, {"_id": 0, "itemId": 1, "start": 1, "quantity": 1, "count": 1}).sort("start", 1))
+
+    def get_daily_usage(self, days: int = 30) -> Iterator[dict]:
+        """Daily rollups shaped like usage logs (``itemId``, ``timestamp``, ``quantity``) for forecasting.
+
+        Streams the cursor instead of building a list; consume it once, e.g. in
+        ``forecasting.usage_matrix``, which reads it straight into index arrays.
+        """
+        since = datetime.now() - timedelta(days=days)
+        query = {"period": "day", "start": {"$gte": period_start(since, "day")}}
+        for r in self.usage_rollups.find(query, {"_id": 0, "itemId": 1, "start": 1, "quantity": 1}):
+            yield {"itemId": r["itemId"], "timestamp": r["start"], "quantity": r["quantity"]}
 
+    @timed_db("archive_usage")
+    def archive_usage(self, retention_days: Optional[int] = None) -> int:
+        return archive_usage(self.db, retention_days)
+
+    @timed_db("rebuild_rollups")
+    def rebuild_rollups(self) -> int:
+        return rebuild_rollups(self.db)
+
+    def maintain_usage(self):
+        """Backfill rollups for data written before they existed, then archive expired raw logs."""
+        if self.usage_rollups.estimated_document_count() == 0 and self.usage_logs.estimated_document_count() > 0:
+            print(f"Built {self.rebuild_rollups()} usage rollup rows")
+        moved = self.archive_usage()
+        if moved:
+            print(f"Archived {moved} usage logs past the retention window")
+
+    @timed_db("get_inventory_docs")
+    def get_inventory_docs(self, after: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        """Read-only fast path for ``get_inventory_items`` returning plain dicts.
+
+        With ``after`` or ``limit`` items are paged in id order, starting after ``after``.
+        """
+        pending = self._pending_stock()
+        if after is None and limit is None:
+            cursor = self.inventory.find({}, self._inventory_projection())
+        else:
+            cursor = _keyset_page(self.inventory, {}, self._inventory_projection(), after, limit, descending=False)
+        return [_with_status({**_INVENTORY_DEFAULTS, **self._apply_pending(doc, pending)}) for doc in cursor]
+
+    @timed_db("find_item_by_name")
     def find_item_by_name(self, name: str) -> Optional[InventoryItem]:
-        item = self.inventory.find_one({"name": {"$regex": name, "$options": "i"}})
-        return InventoryItem(**item) if item else None
+        pending = self._pending_stock()
+        item = self.inventory.find_one({"name": name}, collation=NAME_COLLATION)
+        if item is None:
+            item = self.inventory.find_one({"name": {"$regex": name, "$options": "i"}})
+        return InventoryItem(**self._apply_pending(item, pending)) if item else None
 
+    @timed_db("find_best_match_by_name")
     def find_best_match_by_name(self, name: str, threshold: float = 0.6) -> Optional[InventoryItem]:
         from difflib import SequenceMatcher
         best = None
@@ -108,6 +539,7 @@ class Database:
         target = (name or "").lower().strip()
         if not target:
             return None
+        pending = self._pending_stock()
         for raw in self.inventory.find({}, {"_id": 0}):
             candidate = (raw.get("name") or "").lower().strip()
             if not candidate:
@@ -119,12 +551,162 @@ class Database:
                 best_score = score
                 best = raw
         if best and best_score >= threshold:
-            return InventoryItem(**best)
+            return InventoryItem(**self._apply_pending(best, pending))
         return None
 
+    @timed_db("find_best_matches_by_name")
+    def find_best_matches_by_name(self, names: List[str], threshold: float = 0.6) -> Dict[str, Optional[InventoryItem]]:
+        """Resolve several spoken item names with a single scan of the inventory."""
+        from difflib import SequenceMatcher
+        targets = {n: (n or "").lower().strip() for n in names}
+        best: Dict[str, Optional[dict]] = {n: None for n in names}
+        best_score: Dict[str, float] = {n: 0.0 for n in names}
+        pending = self._pending_stock()
+        for raw in self.inventory.find({}, {"_id": 0}):
+            candidate = (raw.get("name") or "").lower().strip()
+            if not candidate:
+                continue
+            for name, target in targets.items():
+                if not target:
+                    continue
+                score = SequenceMatcher(None, target, candidate).ratio()
+                if target in candidate or candidate in target:
+                    score = max(score, 0.99)
+                if score > best_score[name]:
+                    best_score[name] = score
+                    best[name] = raw
+        return {
+            n: (InventoryItem(**self._apply_pending(dict(best[n]), pending)) if best[n] and best_score[n] >= threshold else None)
+            for n in names
+        }
+
+    @timed_db("apply_stock_batch")
+    def apply_stock_batch(self, ops: List[Tuple[str, str, int]], usage: List[Tuple[str, int]], user: str, notes: Optional[str] = None):
+        """Apply a dictated batch in two round trips.
+
+        ``ops`` are ``("inc" | "set", item_id, value)`` stock changes applied in
+        order with one ``bulk_write``; adjacent increments of the same item are
+        coalesced. ``usage`` entries become usage logs written with one
+        ``insert_many``.
+        """
+        if self.write_behind:
+            self.write_behind.flush()
+        writes = []
+        last = None
+        for kind, item_id, value in ops:
+            if kind == "inc" and last and last[0] == "inc" and last[1] == item_id:
+                last[2] += value
+                continue
+            last = [kind, item_id, value]
+            writes.append(last)
+        requests = [
+            UpdateOne({"id": item_id}, {"$inc": {"currentStock": value}} if kind == "inc" else {"$set": {"currentStock": value}})
+            for kind, item_id, value in writes
+        ]
+        if requests:
+            self.inventory.bulk_write(requests, ordered=True)
+        if usage:
+            now = datetime.now()
+            self.usage_logs.insert_many([
+                UsageLog(
+                    id=new_id(),
+                    itemId=item_id,
+                    quantity=quantity,
+                    user=user,
+                    timestamp=now,
+                    notes=notes,
+                ).model_dump()
+                for item_id, quantity in usage
+            ])
+            self.usage_rollups.bulk_write(_rollup_writes([(item_id, quantity, now, 1) for item_id, quantity in usage]), ordered=False)
+
+    @timed_db("apply_sync_mutations")
+    def apply_sync_mutations(self, mutations: List[dict], device_id: Optional[str] = None) -> List[dict]:
+        """Apply an ordered offline queue with one write per collection.
+
+        Mutations are ``{"clientId", "action", "data", "timestamp"}`` with
+        ``action`` ``logUsage`` (``itemId``, ``quantity``, ``user``/``userName``,
+        ``notes``) or ``updateStock`` (``itemId``, ``newStock``). Keys already
+        seen in ``sync_mutations`` or earlier in the same request come back as
+        ``duplicate``; only applied keys are recorded, so rejected mutations
+        can be corrected and resent. Usage logs get an id derived from the key,
+        so replaying a batch that failed half-way cannot log twice.
+        """
+        keys = [f"{device_id}:{m['clientId']}" if device_id else m["clientId"] for m in mutations]
+        seen = {doc["_id"] for doc in self.db["sync_mutations"].find({"_id": {"$in": keys}}, {"_id": 1})}
+        item_ids = {(m.get("data") or {}).get("itemId") for m in mutations}
+        known = {doc["id"] for doc in self.inventory.find({"id": {"$in": [i for i in item_ids if i]}}, {"_id": 0, "id": 1})}
+
+        results: List[dict] = []
+        logs: List[dict] = []
+        stock: Dict[str, int] = {}
+        applied: List[dict] = []
+        now = datetime.now()
+        for key, m in zip(keys, mutations):
+            data = m.get("data") or {}
+            result = {"clientId": m["clientId"], "status": "applied", "error": None}
+            results.append(result)
+            if key in seen:
+                result["status"] = "duplicate"
+                continue
+            seen.add(key)
+            try:
+                item_id = data.get("itemId")
+                if item_id not in known:
+                    raise ValueError(f"Unknown item: {item_id}")
+                if m["action"] == "logUsage":
+                    ts = datetime.fromtimestamp(m["timestamp"] / 1000.0) if m.get("timestamp") else now
+                    logs.append(UsageLog(
+                        id=derived_id(ts, f"sync:{key}"),
+                        itemId=item_id,
+                        quantity=int(data["quantity"]),
+                        user=data.get("user") or data.get("userName") or "unknown",
+                        timestamp=ts,
+                        notes=data.get("notes"),
+                    ).model_dump())
+                elif m["action"] == "updateStock":
+                    # Later sets of the same item win, so only the last one is written.
+                    stock[item_id] = int(data["newStock"])
+                else:
+                    raise ValueError(f"Unsupported action: {m['action']}")
+            except (KeyError, TypeError, ValueError) as e:
+                result["status"] = "error"
+                result["error"] = str(e)
+                continue
+            applied.append({"_id": key, "action": m["action"], "at": now})
+
+        if stock:
+            if self.write_behind:
+                self.write_behind.flush()
+            self.inventory.bulk_write([UpdateOne({"id": i}, {"$set": {"currentStock": v}}) for i, v in stock.items()], ordered=False)
+        if logs:
+            inserted = insert_new(self.usage_logs, logs)
+            if inserted:
+                self.usage_rollups.bulk_write(
+                    _rollup_writes([(log["itemId"], log["quantity"], log["timestamp"], 1) for log in inserted]), ordered=False
+                )
+        if applied:
+            try:
+                self.db["sync_mutations"].insert_many(applied, ordered=False)
+            except BulkWriteError:
+                pass  # a concurrent sync of the same queue recorded them first
+        return results
+
+    @timed_db("get_forecast_models")
+    def get_forecast_models(self) -> Dict[str, dict]:
+        """Backtested model choice per item (``model``, ``wape``, ``confidence``), keyed by item id."""
+        return {doc["_id"]: doc for doc in self.db["forecast_models"].find({})}
+
+    @timed_db("save_forecast_models")
+    def save_forecast_models(self, docs: List[dict]):
+        if docs:
+            self.db["forecast_models"].bulk_write(
+                [UpdateOne({"_id": d["itemId"]}, {"$set": d}, upsert=True) for d in docs], ordered=False
+            )
+
+    @timed_db("create_inventory_item")
     def create_inventory_item(self, name: str, initial_stock: int = 0, unit: str = "units") -> InventoryItem:
-        from datetime import datetime
-        item_id = str(datetime.now().timestamp())
+        item_id = new_id()
         doc = {
             "id": item_id,
             "name": name,
@@ -142,7 +724,39 @@ class Database:
         self.inventory.insert_one(doc)
         return InventoryItem(**doc)
 
+    def _supplier_directory(self) -> Dict[str, Supplier]:
+        """Suppliers by id, cached in process for ``SUPPLIER_CACHE_TTL_S`` seconds (default 300).
+
+        ``save_supplier`` drops the cache so this process sees its own writes
+        at once; writes from other processes show up after the TTL.
+        """
+        ttl = float(os.getenv("SUPPLIER_CACHE_TTL_S", "300"))
+        cache = self._supplier_cache
+        if cache is not None and time.monotonic() - self._supplier_loaded_at < ttl:
+            return cache
+        with self._supplier_lock:
+            if self._supplier_cache is None or time.monotonic() - self._supplier_loaded_at >= ttl:
+                self._supplier_cache = {s.id: s for s in self._load_suppliers()}
+                self._supplier_loaded_at = time.monotonic()
+            return self._supplier_cache
+
+    def invalidate_suppliers(self):
+        self._supplier_cache = None
+
     def get_suppliers(self) -> List[Supplier]:
+        return list(self._supplier_directory().values())
+
+    def get_supplier(self, supplier_id: str) -> Optional[Supplier]:
+        return self._supplier_directory().get(supplier_id)
+
+    @timed_db("save_supplier")
+    def save_supplier(self, supplier: Supplier) -> Supplier:
+        self.suppliers.update_one({"id": supplier.id}, {"$set": supplier.model_dump()}, upsert=True)
+        self.invalidate_suppliers()
+        return supplier
+
+    @timed_db("get_suppliers")
+    def _load_suppliers(self) -> List[Supplier]:
         out: List[Supplier] = []
         for raw in self.suppliers.find():
             try:
@@ -161,13 +775,50 @@ class Database:
                 print(f"Skipping supplier due to error: {e} | raw={raw}")
         return out
 
+    @timed_db("get_purchase_orders")
     def get_purchase_orders(self) -> List[PurchaseOrder]:
-        return [PurchaseOrder(**o) for o in self.purchase_orders.find().sort("createdAt", -1)]
+        docs = list(self.purchase_orders.find({}, PURCHASE_ORDER_PROJECTION).sort("createdAt", -1))
+        return _purchase_orders_adapter.validate_python(docs)
+
+    @timed_db("get_purchase_order_docs")
+    def get_purchase_order_docs(self, before: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        """Read-only fast path for ``get_purchase_orders`` returning plain dicts; pages newest first like ``get_usage_log_docs``."""
+        if before is None and limit is None:
+            cursor = self.purchase_orders.find({}, PURCHASE_ORDER_PROJECTION).sort("createdAt", -1)
+        else:
+            cursor = _keyset_page(self.purchase_orders, {}, PURCHASE_ORDER_PROJECTION, before, limit, descending=True)
+        return [{**_PURCHASE_ORDER_DEFAULTS, **o} for o in cursor]
+
+    @timed_db("get_monthly_spend")
+    def get_monthly_spend(self, months: int = 12) -> List[Tuple[str, float]]:
+        """``(YYYY-MM, total)`` purchase order spend for the last ``months`` calendar months, oldest first.
+
+        Summed server-side by one ``$group`` over the ``createdAt`` index;
+        drafts, cancelled and rejected orders are not spend.
+        """
+        now = datetime.now()
+        keys = []
+        year, month = now.year, now.month
+        for _ in range(months):
+            keys.append(f"{year:04d}-{month:02d}")
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        keys.reverse()
+        since = datetime.strptime(keys[0], "%Y-%m")
+        totals = {
+            row["_id"]: float(row["total"] or 0.0)
+            for row in self.purchase_orders.aggregate([
+                {"$match": {"createdAt": {"$gte": since}, "status": {"$nin": ["draft", "cancelled", "rejected"]}}},
+                {"$group": {"_id": {"$dateToString": {"format": "%Y-%m", "date": "$createdAt"}}, "total": {"$sum": "$total"}}},
+            ])
+        }
+        return [(key, round(totals.get(key, 0.0), 2)) for key in keys]
 
+    @timed_db("create_purchase_order")
     def create_purchase_order(self, order: PurchaseOrder) -> PurchaseOrder:
         self.purchase_orders.insert_one(order.model_dump())
         return order
 
+    @timed_db("update_order_status")
     def update_order_status(self, order_id: str, status: str, approved_by: Optional[str] = None):
         update = {"status": status}
         if status == "approved" and approved_by:
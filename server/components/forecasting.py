@@ -1,6 +1,10 @@
 from __future__ import annotations
-from typing import List, Dict, Any
+from array import array
+from contextlib import contextmanager, nullcontext
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 import math
+import os
+import threading
 try:
 	import numpy as np
 	HAS_NUMPY = True
@@ -19,35 +23,108 @@ def _safe_number(x, default=0.0):
 		return default
 
 
-def _build_daily_usage_series(logs: List[dict], days: int = 30):
+class _ScratchBuffer:
+	"""One float32 scratch buffer shared by every thread, capped at ``FORECAST_SCRATCH_MB`` (default 64).
+
+	``lease(rows, days)`` yields a zeroed ``(rows, days)`` view of it while
+	holding its lock. When another thread holds it, or the matrix would not
+	fit under the cap, a fresh array is yielded instead and dropped after the
+	block, so at most one capped buffer stays resident per process.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._buf = None
+
+	@contextmanager
+	def lease(self, rows: int, days: int):
+		cells = rows * days
+		cap = int(float(os.getenv("FORECAST_SCRATCH_MB", "64")) * 1024 * 1024) // 4
+		if cells > cap or not self._lock.acquire(blocking=False):
+			yield np.zeros((rows, days), dtype=np.float32)
+			return
+		try:
+			if self._buf is None or self._buf.size < cells:
+				self._buf = np.zeros(max(1, cells), dtype=np.float32)
+			view = self._buf[:cells].reshape(rows, days)
+			view.fill(0.0)
+			yield view
+		finally:
+			self._lock.release()
+
+
+_scratch = _ScratchBuffer()
+
+
+def _index_usage(logs: Iterable[Any], days: int, rows: Optional[Dict[str, int]] = None):
+	"""Stream ``logs`` into ``(rows, row_idx, col_idx, qty)`` for the last ``days`` days, oldest first.
+
+	``logs`` may be a cursor or generator of dicts or models and is read once;
+	the indexes go straight into compact typed arrays. With ``rows`` given
+	(item id to row), logs for other items are skipped; otherwise rows are
+	assigned in order of first appearance.
+	"""
 	from datetime import datetime, timedelta
 	end = datetime.utcnow().date()
 	start = end - timedelta(days=days - 1)
-	dates = [start + timedelta(days=i) for i in range(days)]
-	date_index = {d.isoformat(): i for i, d in enumerate(dates)}
-	series: Dict[str, Any] = {}
+	date_index = {(start + timedelta(days=i)).isoformat(): i for i in range(days)}
+	fixed = rows is not None
+	rows = rows if fixed else {}
+	row_idx = array('i')
+	col_idx = array('i')
+	qtys = array('f')
 	for log in logs:
-		item_id = log.get("itemId")
-		ts = log.get("timestamp")
-		qty = int(log.get("quantity", 0))
+		if hasattr(log, "model_dump"):
+			item_id, ts, qty = log.itemId, log.timestamp, log.quantity
+		else:
+			item_id, ts, qty = log.get("itemId"), log.get("timestamp"), log.get("quantity", 0)
 		if not item_id or ts is None:
 			continue
 		d = ts.date().isoformat() if hasattr(ts, "date") else str(ts)[:10]
-		if d not in date_index:
+		idx = date_index.get(d)
+		if idx is None:
 			continue
-		idx = date_index[d]
-		if item_id not in series:
-			if HAS_NUMPY:
-				series[item_id] = (np.zeros(days, dtype=float))
-			else:
-				series[item_id] = [0.0] * days
-		if HAS_NUMPY:
-			series[item_id][idx] += max(0, qty)
-		else:
-			series[item_id][idx] = float(series[item_id][idx]) + max(0, qty)
+		row = rows.get(item_id) if fixed else rows.setdefault(item_id, len(rows))
+		if row is None:
+			continue
+		row_idx.append(row)
+		col_idx.append(idx)
+		qtys.append(max(0, int(qty or 0)))
+	return rows, row_idx, col_idx, qtys
+
+
+def _fill_usage(matrix, row_idx, col_idx, qtys):
+	if len(qtys):
+		np.add.at(matrix, (np.frombuffer(row_idx, dtype=np.int32), np.frombuffer(col_idx, dtype=np.int32)), np.frombuffer(qtys, dtype=np.float32))
+	return matrix
+
+
+def _build_daily_usage_series(logs: Iterable[Any], days: int = 30):
+	"""Daily usage per item over the last ``days`` days, oldest first.
+
+	With numpy every series is a row view of one float32 ``(items, days)``
+	matrix; a year of history for 10k items is about 15 MB.
+	"""
+	rows, row_idx, col_idx, qtys = _index_usage(logs, days)
+	if HAS_NUMPY:
+		matrix = _fill_usage(np.zeros((len(rows), days), dtype=np.float32), row_idx, col_idx, qtys)
+		return {item_id: matrix[row] for item_id, row in rows.items()}
+	series: Dict[str, Any] = {item_id: [0.0] * days for item_id in rows}
+	ids = list(rows)
+	for r, c, q in zip(row_idx, col_idx, qtys):
+		series[ids[r]][c] += q
 	return series
 
 
+def usage_matrix(ids: List[str], logs: Iterable[Any], days: int):
+	"""float32 ``(len(ids), days)`` daily usage aligned with ``ids``; items without usage are zero rows."""
+	rows = {}
+	for i, item_id in enumerate(ids):
+		rows.setdefault(item_id, i)
+	_rows, row_idx, col_idx, qtys = _index_usage(logs, days, rows)
+	return _fill_usage(np.zeros((len(ids), days), dtype=np.float32), row_idx, col_idx, qtys)
+
+
 def _moving_average(x, window: int = 7):
 	if HAS_NUMPY:
 		if x.size == 0:
@@ -123,116 +200,248 @@ def forecast_usage(daily_usage, horizon: int = 30):
 		return preds
 
 
-def compute_forecasts_and_analytics(items: List[Any], logs: List[Any]) -> tuple[list[dict], dict]:
-	raw_logs = [l.model_dump() if hasattr(l, "model_dump") else dict(l) for l in logs]
-	usage_map = _build_daily_usage_series(raw_logs, days=30)
+def compute_forecasts_and_analytics(items: List[Any], logs: Iterable[Any], model_choices: Dict[str, dict] = None, window: int = 30, horizon: int = 30, monthly_spend: Optional[List[Tuple[str, float]]] = None) -> tuple[list[dict], dict]:
+	"""Per-item forecasts plus dashboard analytics.
+
+	``window`` days of ``logs`` history feed the forecasts and usage trends;
+	``horizon`` is the number of days forecast. ``model_choices`` maps item
+	ids to the backtested model and confidence from
+	``components.backtesting``; items without a choice use ``forecast_usage``
+	and report ``confidence`` as None (unscored). ``logs`` may be a cursor and
+	is read once. ``monthly_spend`` is ``(month, total)`` pairs from
+	``Database.get_monthly_spend``.
+	"""
+	if HAS_NUMPY:
+		# Rows follow ``items``; the matrix lives in the shared scratch buffer for the loop below.
+		rows: Dict[Any, int] = {}
+		for i, item in enumerate(items):
+			rows.setdefault(getattr(item, 'id', None), i)
+		_rows, row_idx, col_idx, qtys = _index_usage(logs, window, rows)
+		scratch = _scratch.lease(len(items), window)
+	else:
+		usage_map = _build_daily_usage_series(logs, days=window)
+		scratch = nullcontext(None)
+	no_usage = np.zeros(window, dtype=np.float32) if HAS_NUMPY else [0.0] * window
 	forecasts: list[dict] = []
 	total_spend = 0.0
 	top_items: list[dict] = []
 	category_values: Dict[str, float] = {}
-	for item in items:
-		item_id = getattr(item, 'id', None)
-		name = getattr(item, 'name', 'Unknown')
-		current_stock = int(getattr(item, 'currentStock', 0) or 0)
-		min_stock = int(getattr(item, 'minStock', 0) or 0)
-		price = _safe_number(getattr(item, 'price', 10.0) or 10.0, 10.0)
-		category = getattr(item, 'category', None) or 'General'
-		total_spend += current_stock * price
-		category_values[category] = category_values.get(category, 0.0) + current_stock * price
-		usage = usage_map.get(item_id, (np.zeros(30) if HAS_NUMPY else [0.0] * 30))
-		pred = forecast_usage(usage, horizon=30)
-		remaining = current_stock
-		days_until = 30
-		for i, u in enumerate(pred):
-			remaining -= int(u)
-			if remaining <= 0:
-				days_until = i + 1
-				break
-		if HAS_NUMPY:
-			avg_daily = float(usage.mean()) if getattr(usage, 'size', 0) > 0 else 0.0
-		else:
-			avg_daily = (sum(usage) / max(1, len(usage))) if len(usage) > 0 else 0.0
-		lead_time = 7
-		safety_stock = avg_daily * 3
-		reorder_point = int(round(avg_daily * lead_time + safety_stock))
-		order_qty = int(max(min_stock * 2, avg_daily * 30))
-		if days_until <= 3:
-			risk = 'high'
-		elif days_until <= 7:
-			risk = 'medium'
-		else:
-			risk = 'low'
-		size_val = (getattr(usage, 'size', None) or len(usage)) if not HAS_NUMPY else usage.size
-		confidence = float(min(0.95, 0.5 + (size_val / 100)))
-		predicted_usage = pred.tolist() if HAS_NUMPY else pred
-		forecasts.append({
-			'itemId': item_id,
-			'itemName': name,
-			'currentStock': current_stock,
-			'predictedUsage': predicted_usage,
-			'daysUntilStockout': int(days_until),
-			'recommendedReorderPoint': int(max(0, reorder_point)),
-			'recommendedOrderQuantity': int(max(0, order_qty)),
-			'confidence': confidence,
-			'riskLevel': risk,
-		})
-		if HAS_NUMPY:
-			recent_usage = int(usage[-7:].sum()) if getattr(usage, 'size', 0) >= 7 else int(usage.sum())
-		else:
+	category_counts: Dict[str, int] = {}
+	category_usage: Dict[str, Any] = {}
+	with scratch as matrix:
+		if matrix is not None:
+			_fill_usage(matrix, row_idx, col_idx, qtys)
+		for item in items:
+			item_id = getattr(item, 'id', None)
+			name = getattr(item, 'name', 'Unknown')
+			current_stock = int(getattr(item, 'currentStock', 0) or 0)
+			min_stock = int(getattr(item, 'minStock', 0) or 0)
+			price = _safe_number(getattr(item, 'price', 10.0) or 10.0, 10.0)
+			category = getattr(item, 'category', None) or 'General'
+			total_spend += current_stock * price
+			category_values[category] = category_values.get(category, 0.0) + current_stock * price
+			category_counts[category] = category_counts.get(category, 0) + 1
+			usage = matrix[rows[item_id]] if matrix is not None else usage_map.get(item_id, no_usage)
+			if category not in category_usage:
+				category_usage[category] = np.zeros(window, dtype=np.float64) if HAS_NUMPY else [0.0] * window
+			if HAS_NUMPY:
+				category_usage[category] += usage
+			else:
+				category_usage[category] = [a + b for a, b in zip(category_usage[category], usage)]
+			choice = (model_choices or {}).get(item_id) if HAS_NUMPY else None
+			if choice:
+				from components.backtesting import forecast
+				pred = np.round(forecast(choice['model'], usage, horizon)[0].astype(float), 2)
+			else:
+				pred = forecast_usage(usage, horizon=horizon)
+			remaining = current_stock
+			days_until = horizon
+			for i, u in enumerate(pred):
+				remaining -= float(u)
+				if remaining <= 0:
+					days_until = i + 1
+					break
+			avg_daily = float(sum(usage)) / max(1, window) if not HAS_NUMPY else float(usage.mean())
+			lead_time = 7
+			safety_stock = avg_daily * 3
+			reorder_point = int(round(avg_daily * lead_time + safety_stock))
+			order_qty = int(max(min_stock * 2, avg_daily * 30))
+			if days_until <= 3:
+				risk = 'high'
+			elif days_until <= 7:
+				risk = 'medium'
+			else:
+				risk = 'low'
+			# Only backtested choices carry a measured confidence; the rest are unscored.
+			confidence = float(choice['confidence']) if choice else None
+			predicted_usage = pred.tolist() if HAS_NUMPY else pred
+			forecasts.append({
+				'itemId': item_id,
+				'itemName': name,
+				'currentStock': current_stock,
+				'predictedUsage': predicted_usage,
+				'daysUntilStockout': int(days_until),
+				'recommendedReorderPoint': int(max(0, reorder_point)),
+				'recommendedOrderQuantity': int(max(0, order_qty)),
+				'confidence': confidence,
+				'riskLevel': risk,
+				'model': choice['model'] if choice else 'ma_trend',
+			})
 			recent_usage = int(sum(usage[-7:]))
-		top_items.append({
-			'name': name,
-			'totalCost': max(0.0, current_stock * price),
-			'usage': max(0, recent_usage),
-		})
+			top_items.append({
+				'name': name,
+				'totalCost': max(0.0, current_stock * price),
+				'usage': max(0, recent_usage),
+			})
 	top_items.sort(key=lambda x: x['totalCost'], reverse=True)
 	top_items = top_items[:5]
-	monthly = []
-	for i in range(12):
-		base = total_spend * 0.8
-		seasonal = (math.sin(((i + 1) * math.pi) / 6.0)) * total_spend * 0.2
-		monthly.append(float(max(0.0, base + seasonal)))
 	total_value = float(max(0.0, total_spend))
 	category_breakdown = []
 	for cat, val in category_values.items():
 		perc = (val / total_value * 100.0) if total_value > 0 else 0.0
 		category_breakdown.append({
 			'category': cat,
-			'items': sum(1 for it in items if (getattr(it, 'category', None) or 'General') == cat),
+			'items': category_counts[cat],
 			'totalValue': float(max(0.0, val)),
 			'percentage': float(max(0.0, perc)),
 		})
 	from datetime import datetime, timedelta
 	end = datetime.utcnow().date()
-	start = end - timedelta(days=29)
-	dates = [start + timedelta(days=i) for i in range(30)]
+	start = end - timedelta(days=window - 1)
 	trends = []
-	for d in dates:
-		d_iso = d.isoformat()
-		total = 0.0
-		categories: Dict[str, float] = {}
-		for item in items:
-			cat = getattr(item, 'category', None) or 'General'
-			u = usage_map.get(getattr(item, 'id'), (np.zeros(30) if HAS_NUMPY else [0.0] * 30))
-			idx = (d - start).days
-			if HAS_NUMPY:
-				length = int(getattr(u, 'size', 0))
-			else:
-				length = len(u)
-			val = float(u[idx]) if 0 <= idx < length else 0.0
-			total += val
-			categories[cat] = categories.get(cat, 0.0) + val
+	for idx in range(window):
+		categories = {cat: float(series[idx]) for cat, series in category_usage.items()}
 		trends.append({
-			'date': d_iso,
-			'totalUsage': float(max(0.0, total)),
+			'date': (start + timedelta(days=idx)).isoformat(),
+			'totalUsage': float(max(0.0, sum(categories.values()))),
 			'categories': categories,
 		})
 	analytics = {
 		'totalSpend': total_value,
-		'monthlySpend': monthly,
+		'monthlySpend': [float(total) for _month, total in (monthly_spend or [])],
+		'monthlySpendMonths': [month for month, _total in (monthly_spend or [])],
 		'topExpensiveItems': top_items,
 		'categoryBreakdown': category_breakdown,
 		'usageTrends': trends,
 	}
 	return forecasts, analytics
 
+
+
+def _simulation_chunk(n_items: int, paths: int, days: int, max_bytes: int) -> int:
+	# index (int32) + sampled demand and its running total (float32) per item, path and day
+	per_item = paths * days * 12
+	return max(1, min(n_items, max_bytes // max(1, per_item)))
+
+
+def simulate_stockouts(stock, history, horizon: int = 30, paths: int = 2000, lead_times=None, service_level: float = 0.95, seed=None, max_bytes=None) -> Dict[str, Any]:
+	"""Monte Carlo stockout simulation over items x paths x days.
+
+	``history`` is an ``(items, days)`` matrix of daily usage; each path
+	resamples ``horizon`` days from the item's own history (bootstrap), so
+	intermittent and bursty demand keep their shape. Items are processed in
+	chunks sized so the sampled arrays stay under ``max_bytes``
+	(``SIM_MEMORY_MB``, default 256).
+
+	Returns arrays: ``probability`` ``(items, horizon)`` that stock has run
+	out by each day, ``p50``/``p95`` the day by which half / 95% of paths
+	have run out (-1 when not within the horizon) and ``reorderPoint`` the
+	``service_level`` quantile of demand over each item's lead time.
+	"""
+	if not HAS_NUMPY:
+		raise RuntimeError("Monte Carlo simulation requires numpy")
+	import os
+	history = np.asarray(history, dtype=np.float32)
+	stock = np.asarray(stock, dtype=np.float32)
+	n_items = history.shape[0]
+	lead = np.full(n_items, 7, dtype=np.int64) if lead_times is None else np.clip(np.asarray(lead_times, dtype=np.int64), 1, None)
+	days = max(horizon, int(lead.max()) if n_items else horizon)
+	if max_bytes is None:
+		max_bytes = int(float(os.getenv("SIM_MEMORY_MB", "256")) * 1024 * 1024)
+	rng = np.random.default_rng(seed)
+	probability = np.zeros((n_items, horizon), dtype=np.float32)
+	p50 = np.full(n_items, -1, dtype=np.int32)
+	p95 = np.full(n_items, -1, dtype=np.int32)
+	reorder = np.zeros(n_items, dtype=np.float32)
+	if n_items == 0 or history.shape[1] == 0:
+		return {'probability': probability, 'p50': p50, 'p95': p95, 'reorderPoint': reorder}
+	chunk = _simulation_chunk(n_items, paths, days, max_bytes)
+	for lo in range(0, n_items, chunk):
+		hi = min(n_items, lo + chunk)
+		idx = rng.integers(0, history.shape[1], size=(hi - lo, paths, days), dtype=np.int32)
+		demand = np.take_along_axis(history[lo:hi, None, :], idx.reshape(hi - lo, 1, -1), axis=2).reshape(idx.shape)
+		del idx
+		cum = np.cumsum(demand, axis=2, out=demand)
+		out = cum[:, :, :horizon] >= stock[lo:hi, None, None]
+		prob = out.mean(axis=1, dtype=np.float32)
+		probability[lo:hi] = prob
+		# Running probability is non-decreasing, so the first day reaching a level is an argmax.
+		for level, target in ((0.5, p50), (0.95, p95)):
+			reached = prob >= level
+			target[lo:hi] = np.where(reached.any(axis=1), reached.argmax(axis=1), -1)
+		lead_demand = np.take_along_axis(cum, (lead[lo:hi] - 1)[:, None, None].repeat(paths, axis=1), axis=2)[:, :, 0]
+		reorder[lo:hi] = np.quantile(lead_demand, service_level, axis=1)
+	return {'probability': probability, 'p50': p50, 'p95': p95, 'reorderPoint': reorder}
+
+
+def simulation_report(items: List[Any], logs: Iterable[Any], lead_times: Dict[str, int] = None, history_days: int = 60, horizon: int = 30, paths: int = 2000, service_level: float = 0.95, seed=None) -> Dict[str, Any]:
+	from datetime import datetime, timedelta
+	ids = [getattr(it, 'id', None) for it in items]
+	history = usage_matrix(ids, logs, history_days)
+	stock = [int(getattr(it, 'currentStock', 0) or 0) for it in items]
+	lead = [int((lead_times or {}).get(item_id, 7)) for item_id in ids]
+	sim = simulate_stockouts(stock, history, horizon, paths, lead, service_level, seed)
+	today = datetime.utcnow().date()
+
+	def day_to_date(day: int):
+		return (today + timedelta(days=int(day) + 1)).isoformat() if day >= 0 else None
+
+	results = []
+	for i, item in enumerate(items):
+		results.append({
+			'itemId': ids[i],
+			'itemName': getattr(item, 'name', 'Unknown'),
+			'currentStock': stock[i],
+			'leadTimeDays': lead[i],
+			'stockoutProbability': [round(float(p), 4) for p in sim['probability'][i]],
+			'p50StockoutDate': day_to_date(sim['p50'][i]),
+			'p95StockoutDate': day_to_date(sim['p95'][i]),
+			'reorderPoint': int(math.ceil(float(sim['reorderPoint'][i]))),
+		})
+	return {
+		'paths': paths,
+		'horizon': horizon,
+		'historyDays': history_days,
+		'serviceLevel': service_level,
+		'items': results,
+	}
+
+
+def to_columnar(records: List[dict]) -> Dict[str, list]:
+	keys: list[str] = []
+	for rec in records:
+		for k in rec:
+			if k not in keys:
+				keys.append(k)
+	return {k: [rec.get(k) for rec in records] for k in keys}
+
+
+def columnar_trends(trends: List[dict]) -> Dict[str, Any]:
+	cats: list[str] = []
+	for t in trends:
+		for c in t.get('categories', {}):
+			if c not in cats:
+				cats.append(c)
+	return {
+		'date': [t['date'] for t in trends],
+		'totalUsage': [t['totalUsage'] for t in trends],
+		'categories': {c: [t.get('categories', {}).get(c, 0.0) for t in trends] for c in cats},
+	}
+
+
+def to_columnar_payload(forecasts: List[dict], analytics: dict) -> tuple[dict, dict]:
+	compact = dict(analytics)
+	compact['usageTrends'] = columnar_trends(analytics.get('usageTrends', []))
+	compact['topExpensiveItems'] = to_columnar(analytics.get('topExpensiveItems', []))
+	compact['categoryBreakdown'] = to_columnar(analytics.get('categoryBreakdown', []))
+	return to_columnar(forecasts), compact
@@ -5,6 +5,9 @@ import re
 
 from PIL import Image
 
+import components.ids as ids
+from components.runtime import run_model
+
 _ocr_pipeline = None
 
 
@@ -26,7 +29,7 @@ def extract_text(image_bytes: bytes) -> str:
 	except Exception:
 		img = Image.open(BytesIO(image_bytes))
 	ocr = _get_ocr_pipeline()
-	result = ocr(img)
+	result = run_model("trocr", ocr, img)
 	if isinstance(result, list) and result:
 		text = result[0].get("generated_text") or result[0].get("text") or ""
 	elif isinstance(result, dict):
@@ -106,13 +109,16 @@ def commit_items(items: List[Dict[str, Any]], supplier_id: str | None, created_b
 
 	po_id = None
 	if items:
-		suppliers = dbmod.db.get_suppliers()
-		supplier = next((s for s in suppliers if s.id == supplier_id), None) if supplier_id else (suppliers[0] if suppliers else None)
+		if supplier_id:
+			supplier = dbmod.db.get_supplier(supplier_id)
+		else:
+			suppliers = dbmod.db.get_suppliers()
+			supplier = suppliers[0] if suppliers else None
 		subtotal = sum(float(it.get("totalPrice") or (float(it.get("unitPrice") or 0) * int(it.get("quantity") or 0))) for it in items)
 		tax = round(subtotal * 0.08, 2)
 		total = round(subtotal + tax, 2)
-		order_id = str(datetime.now().timestamp())
-		order_number = f"INV-{datetime.now().year}-{int(datetime.now().timestamp())}"
+		order_id = ids.new_id()
+		order_number = ids.order_number("INV")
 		expected_delivery = datetime.now() + timedelta(days=(supplier.leadTimeDays if supplier else 0))
 		po_items = [PurchaseOrderItem(
 			itemId=it.get("itemId") or it.get("itemName"),
@@ -1,88 +1,320 @@
 import json
-from typing import Dict, Any, Optional
-from transformers import pipeline
+import os
+from typing import Dict, Any, List, Optional
+from transformers import pipeline, LogitsProcessor, LogitsProcessorList, StoppingCriteria, StoppingCriteriaList
 import re
+from components.metrics import span, inc
+from components.batching import Coalescer
+from components.runtime import run_model
+
+ACTIONS = ("usage", "update", "query", "unknown")
+
+FEW_SHOT_PROMPT = (
+    "You are an assistant for medical inventory. Read the user's command (English or Romanian) and output ONLY a JSON object with keys: action, item, quantity, response. No other text.\n"
+    "- action: one of usage | update | query | unknown\n"
+    "- item: name or null\n"
+    "- quantity: integer or null\n"
+    "- response: short, friendly sentence to speak back\n"
+    "- Correct small ASR mistakes in number words (e.g., free->three, to/too->two, for->four, won->one, ate->eight).\n"
+    "Examples:\n"
+    "Input: I used 5 gloves\n"
+    "Output: {\"action\": \"usage\", \"item\": \"Gloves\", \"quantity\": 5, \"response\": \"I deducted 5 Gloves.\"}\n"
+    "Input: I took 3 syringes\n"
+    "Output: {\"action\": \"usage\", \"item\": \"Syringes\", \"quantity\": 3, \"response\": \"I deducted 3 Syringes.\"}\n"
+    "Input: I took free syringes\n"
+    "Output: {\"action\": \"usage\", \"item\": \"Syringes\", \"quantity\": 3, \"response\": \"I deducted 3 Syringes.\"}\n"
+    "Input: Add 20 masks\n"
+    "Output: {\"action\": \"update\", \"item\": \"Masks\", \"quantity\": 20, \"response\": \"Set Masks to 20.\"}\n"
+    "Input: How many syringes do we have?\n"
+    "Output: {\"action\": \"query\", \"item\": \"Syringes\", \"quantity\": null, \"response\": \"Checking Syringes.\"}\n"
+    "Input: Am folosit 3 măști\n"
+    "Output: {\"action\": \"usage\", \"item\": \"Măști\", \"quantity\": 3, \"response\": \"Am scăzut 3 Măști.\"}\n"
+    "Input: Am luat 2 seringi\n"
+    "Output: {\"action\": \"usage\", \"item\": \"Seringi\", \"quantity\": 2, \"response\": \"Am scăzut 2 Seringi.\"}\n"
+    "Input: Adaugă 10 seringi\n"
+    "Output: {\"action\": \"update\", \"item\": \"Seringi\", \"quantity\": 10, \"response\": \"Am setat Seringi la 10.\"}\n"
+    "Input: Câte bandaje avem?\n"
+    "Output: {\"action\": \"query\", \"item\": \"Bandaje\", \"quantity\": null, \"response\": \"Verific Bandaje.\"}\n"
+)
+
+
+def prompt_suffix(normalized: str) -> str:
+    return f"Input: {normalized}\n" + "Output: "
+
+
+def few_shot_prompt(examples: Optional[int] = None) -> str:
+    """The static prompt, optionally trimmed to its first ``examples`` input/output pairs."""
+    if examples is None:
+        return FEW_SHOT_PROMPT
+    head, _, body = FEW_SHOT_PROMPT.partition("Examples:\n")
+    lines = body.splitlines(keepends=True)
+    return head + "Examples:\n" + "".join(lines[: 2 * max(0, examples)])
+
+
+class _AllowedTokens(LogitsProcessor):
+    """Mask every token outside a precomputed allow-list."""
+
+    def __init__(self, allowed_mask):
+        self.allowed_mask = allowed_mask
+
+    def __call__(self, input_ids, scores):
+        return scores.masked_fill(~self.allowed_mask[: scores.shape[-1]], float("-inf"))
+
+
+class _StopOnTokens(StoppingCriteria):
+    """Stop once every sequence has produced one of ``stop_mask``'s tokens after ``start``."""
+
+    def __init__(self, stop_mask, start: int):
+        self.stop_mask = stop_mask
+        self.start = start
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if input_ids.shape[1] <= self.start:
+            return False
+        return bool(self.stop_mask[input_ids[:, self.start:]].any(dim=1).all())
+
 
 class LocalLLM:
+    """MT5 command structurer.
+
+    By default decoding is constrained to the ``{action, item, quantity,
+    response}`` schema: the JSON skeleton is forced into the decoder, the
+    action is picked by scoring the four allowed values, ``item`` and
+    ``response`` are generated greedily until their closing quote and
+    ``quantity`` may only use digit or ``null`` tokens. Set
+    ``LLM_CONSTRAINED=0`` to fall back to free-form generation plus JSON
+    repair. ``LLM_GENERATE_RESPONSE=0`` skips the spoken ``response`` field,
+    which the structurer can synthesize itself.
+
+    The few-shot prefix is tokenized once at load and only the ``Input:``
+    line is tokenized per command. ``LLM_PROMPT_EXAMPLES`` trims the prefix
+    to fewer examples. Because MT5's encoder is bidirectional, prefix
+    encoder states cannot be reused exactly; ``LLM_PREFIX_ENCODER_CACHE=1``
+    opts into encoding the prefix once on its own and concatenating its
+    states with the separately encoded command (Fusion-in-Decoder style),
+    so each command only pays for encoding its own few tokens.
+
+    Concurrent ``structure_command`` calls are coalesced (``LLM_BATCH_MAX``
+    rows, ``LLM_BATCH_WAIT_MS`` collection window) into one padded encoder
+    pass and batched ``generate`` calls.
+    """
+
     def __init__(self):
         self.generator = None
-        self._load_model()
+        self.model = None
+        self.tokenizer = None
+        self.constrained = os.getenv("LLM_CONSTRAINED", "1").lower() not in ("0", "false", "no")
+        self.generate_response = os.getenv("LLM_GENERATE_RESPONSE", "1").lower() not in ("0", "false", "no")
+        self.num_beams = int(os.getenv("LLM_NUM_BEAMS", "1"))
+        examples = os.getenv("LLM_PROMPT_EXAMPLES")
+        self.prefix = few_shot_prompt(int(examples) if examples else None)
+        self.cache_prefix_states = os.getenv("LLM_PREFIX_ENCODER_CACHE", "0").lower() in ("1", "true", "yes")
+        self._prefix_ids: Optional[List[int]] = None
+        self._prefix_states = None
+        self.batcher = Coalescer(self._structure_batch, name="llm")
 
     def _load_model(self):
         if self.generator is None:
             print("Loading local MT5 model for multilingual text generation...")
             self.generator = pipeline("text2text-generation", model="google/mt5-small", device=-1)  # CPU
+            self.model = self.generator.model
+            self.tokenizer = self.generator.tokenizer
+            self._build_vocab_masks()
+            self._cache_prefix()
             print("Local MT5 model loaded successfully")
 
-    def chat(self, prompt: str) -> str:
-        try:
-            result = self.generator(
-                prompt,
+    def _build_vocab_masks(self):
+        import torch
+        vocab_size = self.model.config.vocab_size
+        pieces = self.tokenizer.convert_ids_to_tokens(list(range(min(vocab_size, len(self.tokenizer)))))
+        quote = torch.zeros(vocab_size, dtype=torch.bool)
+        brace = torch.zeros(vocab_size, dtype=torch.bool)
+        number = torch.zeros(vocab_size, dtype=torch.bool)
+        for idx, piece in enumerate(pieces):
+            if piece is None:
+                continue
+            text = piece.replace("\u2581", " ")
+            if '"' in text:
+                quote[idx] = True
+            if "}" in text:
+                brace[idx] = True
+            if re.fullmatch(r" ?\d+", text) or re.fullmatch(r" ?(n|nu|nul|null)", text) or re.fullmatch(r" ?,.*", text):
+                number[idx] = True
+        eos = self.tokenizer.eos_token_id
+        for mask in (quote, brace, number):
+            mask[eos] = True
+        self._quote_mask = quote
+        self._brace_mask = brace
+        self._quantity_mask = number
+
+    def _cache_prefix(self):
+        import torch
+        self._prefix_ids = self.tokenizer(self.prefix, add_special_tokens=False).input_ids
+        if self.cache_prefix_states:
+            ids = torch.tensor([self._prefix_ids + [self.tokenizer.eos_token_id]])
+            with torch.no_grad():
+                self._prefix_states = self.model.get_encoder()(input_ids=ids).last_hidden_state
+        print(f"Cached {len(self._prefix_ids)}-token prompt prefix (encoder states: {self._prefix_states is not None})")
+
+    def _generate(self, encoder_outputs, attention_mask, prefixes: List[str], max_new_tokens: int, stop_mask, allowed_mask=None) -> List[str]:
+        """Continue each row's forced decoder prefix and return the generated text per row.
+
+        MT5's decoder has no left-padding support, so rows are grouped by
+        prefix length and each group is decoded in one ``generate`` call.
+        """
+        import torch
+        from transformers.modeling_outputs import BaseModelOutput
+        start_id = self.model.config.decoder_start_token_id
+        rows = [[start_id] + self.tokenizer(p, add_special_tokens=False).input_ids for p in prefixes]
+        groups: Dict[int, List[int]] = {}
+        for i, ids in enumerate(rows):
+            groups.setdefault(len(ids), []).append(i)
+        processors = LogitsProcessorList([_AllowedTokens(allowed_mask)]) if allowed_mask is not None else None
+        hidden = encoder_outputs.last_hidden_state
+        texts = [""] * len(rows)
+        for start, idx in groups.items():
+            index = torch.tensor(idx)
+            out = self.model.generate(
+                encoder_outputs=BaseModelOutput(last_hidden_state=hidden[index]),
+                attention_mask=attention_mask[index],
+                decoder_input_ids=torch.tensor([rows[i] for i in idx]),
+                max_new_tokens=max_new_tokens,
+                num_beams=self.num_beams,
                 do_sample=False,
-                num_beams=2,
-                repetition_penalty=1.1,
-                max_new_tokens=128,
+                logits_processor=processors,
+                stopping_criteria=StoppingCriteriaList([_StopOnTokens(stop_mask, start)]),
             )
-            text = result[0]['generated_text']
-            return text
+            new_tokens = out[:, start:]
+            inc("llm_generated_tokens_total", "Tokens generated by MT5", int(new_tokens.numel()))
+            for i, row in zip(idx, new_tokens):
+                texts[i] = self.tokenizer.decode(row, skip_special_tokens=True)
+        return texts
+
+    def _encode_commands(self, normalized: List[str]):
+        """Encoder outputs for the cached prefix plus each command's ``Input:`` line, right-padded."""
+        import torch
+        from transformers.modeling_outputs import BaseModelOutput
+        eos = self.tokenizer.eos_token_id
+        suffixes = [self.tokenizer(prompt_suffix(n), add_special_tokens=False).input_ids + [eos] for n in normalized]
+        rows = suffixes if self._prefix_states is not None else [self._prefix_ids + ids for ids in suffixes]
+        width = max(len(ids) for ids in rows)
+        input_ids = torch.full((len(rows), width), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(rows), width), dtype=torch.long)
+        for i, ids in enumerate(rows):
+            input_ids[i, : len(ids)] = torch.tensor(ids)
+            attention_mask[i, : len(ids)] = 1
+        hidden = self.model.get_encoder()(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        if self._prefix_states is not None:
+            prefix = self._prefix_states.expand(len(rows), -1, -1)
+            hidden = torch.cat([prefix, hidden], dim=1)
+            attention_mask = torch.cat([torch.ones(prefix.shape[:2], dtype=torch.long), attention_mask], dim=1)
+        return BaseModelOutput(last_hidden_state=hidden), attention_mask
+
+    def _score_actions(self, encoder_outputs, attention_mask) -> List[str]:
+        """Pick, per row, the action whose forced JSON prefix the model finds most likely."""
+        import torch
+        prefixes = [self.tokenizer(f'{{"action": "{a}"', add_special_tokens=False).input_ids for a in ACTIONS]
+        width = max(len(p) for p in prefixes)
+        labels = torch.full((len(ACTIONS), width), -100, dtype=torch.long)
+        for i, ids in enumerate(prefixes):
+            labels[i, : len(ids)] = torch.tensor(ids)
+        batch = attention_mask.shape[0]
+        labels = labels.repeat(batch, 1)
+        hidden = encoder_outputs.last_hidden_state.repeat_interleave(len(ACTIONS), dim=0)
+        logits = self.model(
+            encoder_outputs=(hidden,),
+            attention_mask=attention_mask.repeat_interleave(len(ACTIONS), dim=0),
+            labels=labels,
+        ).logits
+        logprobs = torch.log_softmax(logits, dim=-1)
+        mask = labels != -100
+        picked = logprobs.gather(-1, labels.clamp(min=0).unsqueeze(-1)).squeeze(-1) * mask
+        best = picked.sum(dim=1).view(batch, len(ACTIONS)).argmax(dim=1)
+        return [ACTIONS[int(i)] for i in best]
+
+    def structured_generate(self, normalized: List[str]) -> List[Dict[str, Any]]:
+        import torch
+        with torch.no_grad():
+            with span("llm.encode"):
+                encoder_outputs, attention_mask = self._encode_commands(normalized)
+            with span("llm.generate"):
+                actions = self._score_actions(encoder_outputs, attention_mask)
+                prefixes = [f'{{"action": "{a}", "item": "' for a in actions]
+                items = [t.split('"')[0].strip() for t in self._generate(encoder_outputs, attention_mask, prefixes, 16, self._quote_mask)]
+                prefixes = [p + f'{item}", "quantity":' for p, item in zip(prefixes, items)]
+                quantities = []
+                for qty_text in self._generate(encoder_outputs, attention_mask, prefixes, 4, self._quote_mask | self._brace_mask, self._quantity_mask):
+                    m = re.match(r"\s*(\d+)", qty_text)
+                    quantities.append(int(m.group(1)) if m else None)
+                responses: List[Optional[str]] = [None] * len(normalized)
+                if self.generate_response:
+                    prefixes = [p + f' {q if q is not None else "null"}, "response": "' for p, q in zip(prefixes, quantities)]
+                    responses = [t.split('"')[0].strip() or None for t in self._generate(encoder_outputs, attention_mask, prefixes, 32, self._quote_mask)]
+        return [
+            {"action": a, "item": item or None, "quantity": q, "response": r}
+            for a, item, q, r in zip(actions, items, quantities, responses)
+        ]
+
+    def chat(self, prompts: List[str]) -> List[str]:
+        try:
+            with span("llm.load_model"):
+                self._load_model()
+            with span("llm.generate"):
+                results = self.generator(
+                    prompts,
+                    batch_size=len(prompts),
+                    do_sample=False,
+                    num_beams=self.num_beams,
+                    repetition_penalty=1.1,
+                    max_new_tokens=128,
+                    stopping_criteria=StoppingCriteriaList([_StopOnTokens(self._brace_mask, 1)]),
+                )
+            texts = [(r[0] if isinstance(r, list) else r)['generated_text'] for r in results]
+            inc("llm_generated_tokens_total", "Tokens generated by MT5", sum(len(ids) for ids in self.tokenizer(texts, add_special_tokens=False).input_ids))
+            return texts
         except Exception as e:
             print(f"Error with local model: {e}")
-            return "Sorry, I couldn't process that."
+            return ["Sorry, I couldn't process that."] * len(prompts)
 
-    def structure_command(self, transcript: str) -> Dict[str, Any]:
-        def normalize_transcript(text: str) -> str:
-            t = text.strip()
-            low = t.lower()
-            fillers = ["whatever", "please", "um", "uh", "like", "you know"]
-            for f in fillers:
-                low = re.sub(rf"\b{re.escape(f)}\b", "", low)
-            homophones = {
-                "free": "three",
-                "tree": "three",
-                "to": "two",
-                "too": "two",
-                "for": "four",
-                "won": "one",
-                "oh": "zero",
-                "o": "one",
-                "ate": "eight",
-            }
-            for src, dst in homophones.items():
-                low = re.sub(rf"\b{re.escape(src)}\b", dst, low)
-            low = re.sub(r"\s+", " ", low).strip()
-            return low
-
-        normalized = normalize_transcript(transcript)
-        prompt = (
-            "You are an assistant for medical inventory. Read the user's command (English or Romanian) and output ONLY a JSON object with keys: action, item, quantity, response. No other text.\n"
-            "- action: one of usage | update | query | unknown\n"
-            "- item: name or null\n"
-            "- quantity: integer or null\n"
-            "- response: short, friendly sentence to speak back\n"
-            "- Correct small ASR mistakes in number words (e.g., free->three, to/too->two, for->four, won->one, ate->eight).\n"
-            "Examples:\n"
-            "Input: I used 5 gloves\n"
-            "Output: {\"action\": \"usage\", \"item\": \"Gloves\", \"quantity\": 5, \"response\": \"I deducted 5 Gloves.\"}\n"
-            "Input: I took 3 syringes\n"
-            "Output: {\"action\": \"usage\", \"item\": \"Syringes\", \"quantity\": 3, \"response\": \"I deducted 3 Syringes.\"}\n"
-            "Input: I took free syringes\n"
-            "Output: {\"action\": \"usage\", \"item\": \"Syringes\", \"quantity\": 3, \"response\": \"I deducted 3 Syringes.\"}\n"
-            "Input: Add 20 masks\n"
-            "Output: {\"action\": \"update\", \"item\": \"Masks\", \"quantity\": 20, \"response\": \"Set Masks to 20.\"}\n"
-            "Input: How many syringes do we have?\n"
-            "Output: {\"action\": \"query\", \"item\": \"Syringes\", \"quantity\": null, \"response\": \"Checking Syringes.\"}\n"
-            "Input: Am folosit 3 măști\n"
-            "Output: {\"action\": \"usage\", \"item\": \"Măști\", \"quantity\": 3, \"response\": \"Am scăzut 3 Măști.\"}\n"
-            "Input: Am luat 2 seringi\n"
-            "Output: {\"action\": \"usage\", \"item\": \"Seringi\", \"quantity\": 2, \"response\": \"Am scăzut 2 Seringi.\"}\n"
-            "Input: Adaugă 10 seringi\n"
-            "Output: {\"action\": \"update\", \"item\": \"Seringi\", \"quantity\": 10, \"response\": \"Am setat Seringi la 10.\"}\n"
-            "Input: Câte bandaje avem?\n"
-            "Output: {\"action\": \"query\", \"item\": \"Bandaje\", \"quantity\": null, \"response\": \"Verific Bandaje.\"}\n"
-            f"Input: {normalized}\n"
-            "Output: "
-        )
-        response = self.chat(prompt)
+    @staticmethod
+    def normalize_transcript(text: str) -> str:
+        t = text.strip()
+        low = t.lower()
+        fillers = ["whatever", "please", "um", "uh", "like", "you know"]
+        for f in fillers:
+            low = re.sub(rf"\b{re.escape(f)}\b", "", low)
+        homophones = {
+            "free": "three",
+            "tree": "three",
+            "to": "two",
+            "too": "two",
+            "for": "four",
+            "won": "one",
+            "oh": "zero",
+            "o": "one",
+            "ate": "eight",
+        }
+        for src, dst in homophones.items():
+            low = re.sub(rf"\b{re.escape(src)}\b", dst, low)
+        low = re.sub(r"\s+", " ", low).strip()
+        return low
+
+    def _structure_batch(self, normalized: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Run one coalesced batch; ``None`` marks rows whose output is unusable."""
+        if not self.constrained:
+            texts = run_model("mt5", self.chat, [self.prefix + prompt_suffix(n) for n in normalized])
+            return [self._parse_json(text) for text in texts]
+        try:
+            with span("llm.load_model"):
+                self._load_model()
+            results = run_model("mt5", self.structured_generate, normalized)
+        except Exception as e:
+            print(f"Error with constrained decoding: {e}")
+            return [None] * len(normalized)
+        return [r if r.get("action") != "unknown" or r.get("item") else None for r in results]
+
+    @staticmethod
+    def _parse_json(response: str) -> Optional[Any]:
         json_text = None
         if response:
             m = re.search(r"\{[\s\S]*\}", response)
@@ -104,86 +336,103 @@ class LocalLLM:
             return t
 
         try:
-            structured = json.loads(repair_json(json_text))
-            print(f"LLM structured: {structured}")
-            return structured
-            
-        except json.JSONDecodeError:
-            text = transcript.lower().strip()
-
-            en_ro_numbers = {
-                "zero": 0, "one": 1, "unu": 1, "o": 1, "a": 1, "two": 2, "doi": 2, "doua": 2, "două": 2,
-                "three": 3, "trei": 3, "four": 4, "patru": 4, "five": 5, "cinci": 5, "six": 6, "șase": 6, "sase": 6,
-                "seven": 7, "sapte": 7, "șapte": 7, "eight": 8, "opt": 8, "nine": 9, "noua": 9, "nouă": 9,
-                "ten": 10, "zece": 10, "eleven": 11, "unsprezece": 11, "twelve": 12, "doisprezece": 12, "douasprezece": 12, "douăsprezece": 12,
-                "thirteen": 13, "treisprezece": 13, "fourteen": 14, "paisprezece": 14, "fifteen": 15, "cincisprezece": 15,
-                "sixteen": 16, "saisprezece": 16, "șaisprezece": 16, "seventeen": 17, "saptesprezece": 17, "șaptesprezece": 17,
-                "eighteen": 18, "optsprezece": 18, "nineteen": 19, "nouasprezece": 19, "nouăsprezece": 19,
-                "twenty": 20, "douazeci": 20, "douăzeci": 20,
-                "thirty": 30, "treizeci": 30, "forty": 40, "patruzeci": 40, "fifty": 50, "cincizeci": 50,
-                "sixty": 60, "saizeci": 60, "șaizeci": 60, "seventy": 70, "saptezeci": 70, "șaptezeci": 70,
-                "eighty": 80, "optzeci": 80, "ninety": 90, "nouazeci": 90, "nouăzeci": 90,
-            }
-
-            def words_to_num(words: list[str]) -> Optional[int]:
-                total = 0
-                i = 0
-                while i < len(words):
-                    w = words[i]
-                    if w in en_ro_numbers:
-                        val = en_ro_numbers[w]
-                        total += val
-                        i += 1
-                        continue
-                    if i + 1 < len(words):
-                        pair = f"{words[i]} {words[i+1]}"
-                        if words[i] in ("twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety",
-                                        "douazeci", "douăzeci", "treizeci", "patruzeci", "cincizeci", "saizeci", "șaizeci", "saptezeci", "șaptezeci", "optzeci", "nouazeci", "nouăzeci") and words[i+1] in en_ro_numbers:
-                            total += en_ro_numbers[words[i]] + en_ro_numbers[words[i+1]]
-                            i += 2
-                            continue
-                        if words[i+1] in ("si", "și") and i + 2 < len(words) and words[i] in en_ro_numbers and words[i+2] in en_ro_numbers:
-                            total += en_ro_numbers[words[i]] + en_ro_numbers[words[i+2]]
-                            i += 3
-                            continue
+            return json.loads(repair_json(json_text))
+        except (json.JSONDecodeError, TypeError):
+            return None
+
+    def structure_commands(self, transcripts: List[str]) -> List[Dict[str, Any]]:
+        """Structure several commands; concurrent callers share batched MT5 calls through ``batcher``."""
+        inc("llm_commands_total", "Commands sent to the MT5 structurer", len(transcripts))
+        results = self.batcher.submit_many([self.normalize_transcript(t) for t in transcripts])
+        out = []
+        for transcript, structured in zip(transcripts, results):
+            if structured is not None:
+                print(f"LLM structured: {structured}")
+                out.append(structured)
+                continue
+            inc("llm_parse_failures_total", "MT5 outputs that could not be used and fell back to the regex parser")
+            fallback = self._fallback_structure(transcript)
+            print(f"LLM output unusable, fallback: {fallback}")
+            out.append(fallback)
+        return out
+
+    def structure_command(self, transcript: str) -> Dict[str, Any]:
+        return self.structure_commands([transcript])[0]
+
+    def _fallback_structure(self, transcript: str) -> Dict[str, Any]:
+        text = transcript.lower().strip()
+
+        en_ro_numbers = {
+            "zero": 0, "one": 1, "unu": 1, "o": 1, "a": 1, "two": 2, "doi": 2, "doua": 2, "două": 2,
+            "three": 3, "trei": 3, "four": 4, "patru": 4, "five": 5, "cinci": 5, "six": 6, "șase": 6, "sase": 6,
+            "seven": 7, "sapte": 7, "șapte": 7, "eight": 8, "opt": 8, "nine": 9, "noua": 9, "nouă": 9,
+            "ten": 10, "zece": 10, "eleven": 11, "unsprezece": 11, "twelve": 12, "doisprezece": 12, "douasprezece": 12, "douăsprezece": 12,
+            "thirteen": 13, "treisprezece": 13, "fourteen": 14, "paisprezece": 14, "fifteen": 15, "cincisprezece": 15,
+            "sixteen": 16, "saisprezece": 16, "șaisprezece": 16, "seventeen": 17, "saptesprezece": 17, "șaptesprezece": 17,
+            "eighteen": 18, "optsprezece": 18, "nineteen": 19, "nouasprezece": 19, "nouăsprezece": 19,
+            "twenty": 20, "douazeci": 20, "douăzeci": 20,
+            "thirty": 30, "treizeci": 30, "forty": 40, "patruzeci": 40, "fifty": 50, "cincizeci": 50,
+            "sixty": 60, "saizeci": 60, "șaizeci": 60, "seventy": 70, "saptezeci": 70, "șaptezeci": 70,
+            "eighty": 80, "optzeci": 80, "ninety": 90, "nouazeci": 90, "nouăzeci": 90,
+        }
+
+        def words_to_num(words: list[str]) -> Optional[int]:
+            total = 0
+            i = 0
+            while i < len(words):
+                w = words[i]
+                if w in en_ro_numbers:
+                    val = en_ro_numbers[w]
+                    total += val
                     i += 1
-                return total or None
+                    continue
+                if i + 1 < len(words):
+                    pair = f"{words[i]} {words[i+1]}"
+                    if words[i] in ("twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety",
+                                    "douazeci", "douăzeci", "treizeci", "patruzeci", "cincizeci", "saizeci", "șaizeci", "saptezeci", "șaptezeci", "optzeci", "nouazeci", "nouăzeci") and words[i+1] in en_ro_numbers:
+                        total += en_ro_numbers[words[i]] + en_ro_numbers[words[i+1]]
+                        i += 2
+                        continue
+                    if words[i+1] in ("si", "și") and i + 2 < len(words) and words[i] in en_ro_numbers and words[i+2] in en_ro_numbers:
+                        total += en_ro_numbers[words[i]] + en_ro_numbers[words[i+2]]
+                        i += 3
+                        continue
+                i += 1
+            return total or None
 
-            qty = None
-            m_qty_digit = re.search(r"(\d+)", text)
-            if m_qty_digit:
-                qty = int(m_qty_digit.group(1))
-            else:
-                qty = words_to_num(text.split())
-
-            action = "unknown"
-            if any(k in text for k in ["use", "used", "take", "took", "consume", "consumed", "folos", "consum", "am luat", "am folosit", "iau ", "am luat"]):
-                action = "usage" if qty else "unknown"
-            if any(k in text for k in ["add", "adauga", "adaugă", "update", "set", "restock", "re-stock", "pun "]):
-                action = "update" if qty is not None else action
-            if any(k in text for k in ["how many", "do we have", "cat avem", "cât avem", "stoc", "stock", "have left", "available"]):
-                action = "query"
-
-            item = None
-            if action == "query":
-                m = re.search(r"(?:how many|cate|câte|cat|cât)\s+([a-zăâîșț\s\-]+?)(?:\s+(?:do we have|avem))?\??$", text)
-                if m:
-                    item = m.group(1).strip().title()
+        qty = None
+        m_qty_digit = re.search(r"(\d+)", text)
+        if m_qty_digit:
+            qty = int(m_qty_digit.group(1))
+        else:
+            qty = words_to_num(text.split())
+
+        action = "unknown"
+        if any(k in text for k in ["use", "used", "take", "took", "consume", "consumed", "folos", "consum", "am luat", "am folosit", "iau ", "am luat"]):
+            action = "usage" if qty else "unknown"
+        if any(k in text for k in ["add", "adauga", "adaugă", "update", "set", "restock", "re-stock", "pun "]):
+            action = "update" if qty is not None else action
+        if any(k in text for k in ["how many", "do we have", "cat avem", "cât avem", "stoc", "stock", "have left", "available"]):
+            action = "query"
+
+        item = None
+        if action == "query":
+            m = re.search(r"(?:how many|cate|câte|cat|cât)\s+([a-zăâîșț\s\-]+?)(?:\s+(?:do we have|avem))?\??$", text)
+            if m:
+                item = m.group(1).strip().title()
+        else:
+            m = re.search(r"(?:add|adauga|adaugă|update|set|use|used|take|took|consume|consumed|folos|consum|am folosit|iau|pun|am luat)\s+(?:\d+|[a-zăâîșț]+)\s+([a-zăâîșț0-9\s\-]+)", text)
+            if m:
+                item = m.group(1).strip().title()
             else:
-                m = re.search(r"(?:add|adauga|adaugă|update|set|use|used|take|took|consume|consumed|folos|consum|am folosit|iau|pun|am luat)\s+(?:\d+|[a-zăâîșț]+)\s+([a-zăâîșț0-9\s\-]+)", text)
-                if m:
-                    item = m.group(1).strip().title()
-                else:
-                    tokens = re.findall(r"[A-Za-zăâîșț\-]+", text)
-                    item = tokens[-1] if tokens else None
-                    item = item.title() if item else None
-            fallback = {
-                "action": action,
-                "item": item,
-                "quantity": qty,
-                "response": transcript,
-            }
-            print(f"LLM JSON parse failed, fallback: {fallback}")
-            return fallback
+                tokens = re.findall(r"[A-Za-zăâîșț\-]+", text)
+                item = tokens[-1] if tokens else None
+                item = item.title() if item else None
+        return {
+            "action": action,
+            "item": item,
+            "quantity": qty,
+            "response": transcript,
+        }
 
 local_llm = LocalLLM()
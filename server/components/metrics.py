@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import List, Optional, Tuple
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+    HAS_PROMETHEUS = True
+except Exception:
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    Counter = Histogram = generate_latest = None
+    HAS_PROMETHEUS = False
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+if HAS_PROMETHEUS:
+    STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Latency of voice/text pipeline stages", ["stage"], buckets=_LATENCY_BUCKETS)
+    HTTP_SECONDS = Histogram("http_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=_LATENCY_BUCKETS)
+    DB_SECONDS = Histogram("db_operation_seconds", "Database call latency", ["operation"], buckets=_LATENCY_BUCKETS)
+else:
+    STAGE_SECONDS = HTTP_SECONDS = DB_SECONDS = None
+
+COUNTERS = {}
+# inc() runs on threadpool and coalescer threads; registering a name twice makes prometheus_client raise.
+_counters_lock = threading.Lock()
+
+# Spans recorded during the current request, used for the Server-Timing header.
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+
+def record(stage: str, seconds: float):
+    if STAGE_SECONDS is not None:
+        STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage, export it as a histogram sample and attach it to the current request."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - t0)
+
+
+def current_spans() -> Optional[List[Tuple[str, float]]]:
+    """The span list of the request running in this context, if any; hand it to ``spans_for`` on another thread."""
+    return _request_spans.get()
+
+
+@contextmanager
+def spans_for(targets: List[Optional[List[Tuple[str, float]]]]):
+    """Record spans on a worker thread and attach them to every request in ``targets`` when done.
+
+    Used by threads serving several requests at once (the coalescer), whose
+    spans would otherwise never reach the callers' ``Server-Timing`` header.
+    """
+    collected: List[Tuple[str, float]] = []
+    token = _request_spans.set(collected)
+    try:
+        yield
+    finally:
+        _request_spans.reset(token)
+        seen = set()
+        for spans in targets:
+            if spans is not None and id(spans) not in seen:
+                seen.add(id(spans))
+                spans.extend(collected)
+
+
+def timed_db(operation: str):
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - t0
+                if DB_SECONDS is not None:
+                    DB_SECONDS.labels(operation=operation).observe(elapsed)
+                spans = _request_spans.get()
+                if spans is not None:
+                    spans.append((f"db.{operation}", elapsed))
+        return wrapper
+    return deco
+
+
+def inc(name: str, description: str = "", amount: float = 1.0):
+    """Increment a named counter, creating it on first use."""
+    if not HAS_PROMETHEUS:
+        return
+    counter = COUNTERS.get(name)
+    if counter is None:
+        with _counters_lock:
+            counter = COUNTERS.get(name)
+            if counter is None:
+                counter = COUNTERS[name] = Counter(name, description or name)
+    counter.inc(amount)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    if not HAS_PROMETHEUS:
+        return b"# prometheus_client is not installed\n", CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def _server_timing(spans: List[Tuple[str, float]], total: float) -> bytes:
+    totals = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    parts = [f"{stage};dur={seconds * 1000.0:.1f}" for stage, seconds in totals.items()]
+    parts.append(f"total;dur={total * 1000.0:.1f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP latency histograms and emitting ``Server-Timing``.
+
+    The header is added when ``SERVER_TIMING=1`` is set or the request carries
+    ``X-Server-Timing: 1``, so production traffic can be profiled per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.always = os.getenv("SERVER_TIMING", "0").lower() in ("1", "true", "yes")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        want_timing = self.always or any(
+            k.lower() == b"x-server-timing" and v.strip() in (b"1", b"true") for k, v in scope.get("headers", [])
+        )
+        spans: List[Tuple[str, float]] = []
+        token = _request_spans.set(spans)
+        status = {"code": 500}
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if want_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(spans, time.perf_counter() - t0)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_spans.reset(token)
+            if HTTP_SECONDS is not None:
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                HTTP_SECONDS.labels(method=scope.get("method", ""), route=route, status=str(status["code"])).observe(time.perf_counter() - t0)
@@ -0,0 +1,274 @@
+"""On-demand profiling for a running API worker.
+
+Admin-only: every endpoint and the per-request toggle require the
+``X-Admin-Token`` header to match ``PROFILER_TOKEN``. When that variable is
+unset profiling is disabled entirely.
+
+CLI usage against a running worker::
+
+    python -m components.profiler --url http://localhost:8000 --seconds 15 --mode sample -o worker.folded
+"""
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse, Response
+
+router = APIRouter()
+
+_lock = threading.Lock()
+
+
+def _token() -> Optional[str]:
+    return os.getenv("PROFILER_TOKEN") or None
+
+
+def _profile_dir() -> str:
+    path = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "healthcare-profiles")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _prune_profiles():
+    """Keep the newest ``PROFILE_KEEP`` dumps (default 50) and drop any older than ``PROFILE_MAX_AGE_H`` hours (default 24)."""
+    keep = int(os.getenv("PROFILE_KEEP", "50"))
+    max_age = float(os.getenv("PROFILE_MAX_AGE_H", "24")) * 3600
+    now = time.time()
+    dumps = []
+    for entry in os.scandir(_profile_dir()):
+        if not entry.name.endswith((".pstats", ".folded")):
+            continue
+        try:
+            dumps.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            continue
+    dumps.sort(reverse=True)
+    for i, (mtime, path) in enumerate(dumps):
+        if i >= keep or now - mtime > max_age:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    expected = _token()
+    return bool(expected and token and hmac.compare_digest(expected, token))
+
+
+def _require_admin(token: Optional[str]):
+    if not _token():
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not is_authorized(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread at a fixed interval into collapsed-stack counts.
+
+    The output is the ``frame;frame;frame count`` format consumed by
+    flamegraph.pl, speedscope and inferno. Threads in ``exclude`` are skipped.
+    """
+
+    def __init__(self, interval: float = 0.005, exclude: tuple = ()):
+        self.interval = max(0.001, interval)
+        self.exclude = set(exclude)
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.is_set():
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident in self.exclude:
+                    continue
+                self.samples[f"{names.get(ident, ident)};{self._collapse(frame)}"] += 1
+            time.sleep(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+
+
+def _thread_sampler() -> SamplingProfiler:
+    """Sampler for every thread but the caller's, i.e. the threadpool work a cProfile run on the loop misses."""
+    return SamplingProfiler(float(os.getenv("PROFILE_THREAD_INTERVAL_S", "0.005")), exclude=(threading.get_ident(),))
+
+
+@router.post("/profile")
+async def profile_worker(seconds: float = 10.0, mode: str = "sample", interval: float = 0.005, x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    seconds = max(0.1, min(seconds, 300.0))
+    if not _lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    try:
+        if mode == "sample":
+            prof = SamplingProfiler(interval)
+            prof.start()
+            await asyncio.sleep(seconds)
+            prof.stop()
+            return Response(content=prof.collapsed(), media_type="text/plain")
+        if mode == "cprofile":
+            # cProfile only sees the thread that enables it: the event loop, where the
+            # async handlers run. Blocking work offloaded with run_in_threadpool
+            # (MT5, analytics, simulation, backtests) shows up there only as awaits,
+            # so the other threads are sampled alongside into a collapsed-stack file
+            # named in X-Profile-Threads-Id.
+            prof = cProfile.Profile()
+            threads = _thread_sampler()
+            threads.start()
+            prof.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                prof.disable()
+                threads.stop()
+            base = f"worker-{os.getpid()}-{int(time.time())}"
+            path = os.path.join(_profile_dir(), f"{base}.pstats")
+            prof.dump_stats(path)
+            threads.dump(os.path.join(_profile_dir(), f"{base}.folded"))
+            _prune_profiles()
+            return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(path), headers={"X-Profile-Threads-Id": f"{base}.folded"})
+        raise HTTPException(status_code=400, detail="mode must be 'sample' or 'cprofile'")
+    finally:
+        _lock.release()
+
+
+@router.get("/profiles/{name}")
+async def get_profile(name: str, x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    path = os.path.join(_profile_dir(), os.path.basename(name))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(path))
+
+
+class ProfileRequestMiddleware:
+    """Runs a single request under cProfile when it carries ``X-Profile: 1`` and a valid admin token.
+
+    The pstats dump is written to ``PROFILE_DIR`` and its name returned in the
+    ``X-Profile-Id`` response header; fetch it from ``/api/admin/profiles/{id}``.
+    Old dumps are pruned after each write (see ``_prune_profiles``).
+    cProfile only covers the event-loop thread, so the other threads (where
+    ``run_in_threadpool`` work runs) are sampled for the duration of the request
+    into a collapsed-stack file named in ``X-Profile-Threads-Id``. The sampler
+    sees every worker thread, so requests served concurrently show up there too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _token():
+            await self.app(scope, receive, send)
+            return
+        headers = {k.lower(): v for k, v in scope.get("headers", [])}
+        if headers.get(b"x-profile", b"").strip() not in (b"1", b"true"):
+            await self.app(scope, receive, send)
+            return
+        if not is_authorized(headers.get(b"x-admin-token", b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+        # Only one cProfile can be active per thread; skip rather than fail the request.
+        if not _lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        base = f"request-{uuid.uuid4().hex[:12]}"
+        prof = cProfile.Profile()
+        threads = _thread_sampler()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (b"x-profile-id", f"{base}.pstats".encode("latin-1")),
+                    (b"x-profile-threads-id", f"{base}.folded".encode("latin-1")),
+                ]}
+            await send(message)
+
+        threads.start()
+        prof.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            prof.disable()
+            threads.stop()
+            _lock.release()
+            prof.dump_stats(os.path.join(_profile_dir(), f"{base}.pstats"))
+            threads.dump(os.path.join(_profile_dir(), f"{base}.folded"))
+            _prune_profiles()
+
+
+def summarize(path: str, limit: int = 30) -> str:
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+if __name__ == "__main__":
+    import argparse
+    import requests
+
+    p = argparse.ArgumentParser(description="Profile a running API worker")
+    p.add_argument("--url", default="http://localhost:8000")
+    p.add_argument("--seconds", type=float, default=10.0)
+    p.add_argument("--mode", choices=["sample", "cprofile"], default="sample")
+    p.add_argument("--interval", type=float, default=0.005)
+    p.add_argument("--token", default=os.getenv("PROFILER_TOKEN"))
+    p.add_argument("-o", "--output", required=True)
+    args = p.parse_args()
+    resp = requests.post(
+        f"{args.url}/api/admin/profile",
+        params={"seconds": args.seconds, "mode": args.mode, "interval": args.interval},
+        headers={"X-Admin-Token": args.token or ""},
+        timeout=args.seconds + 60,
+    )
+    resp.raise_for_status()
+    with open(args.output, "wb") as f:
+        f.write(resp.content)
+    print(f"Wrote {len(resp.content)} bytes to {args.output}")
+    if args.mode == "cprofile":
+        print(summarize(args.output))
+        threads_id = resp.headers.get("X-Profile-Threads-Id")
+        if threads_id:
+            threads = requests.get(f"{args.url}/api/admin/profiles/{threads_id}", headers={"X-Admin-Token": args.token or ""}, timeout=60)
+            threads.raise_for_status()
+            with open(f"{args.output}.threads.folded", "wb") as f:
+                f.write(threads.content)
+            print(f"Wrote worker-thread samples to {args.output}.threads.folded")
@@ -0,0 +1,111 @@
+import math
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from models import PurchaseOrder, PurchaseOrderItem, Supplier
+
+DEFAULT_LEAD_TIME = 7
+TAX_RATE = 0.08
+
+
+def plan_reorders(
+    items: List[Any],
+    usage: np.ndarray,
+    suppliers: List[Supplier],
+    service_level: float = 0.95,
+    cover_days: int = 30,
+    created_by: str = "system",
+    now: Optional[datetime] = None,
+) -> Dict[str, list]:
+    """Reorder recommendations grouped into one draft purchase order per supplier.
+
+    ``usage`` is an ``(items, days)`` matrix of daily usage aligned with
+    ``items``. Each item's supplier (``item.supplier``, matched by supplier id
+    or name) sets its lead time ``L``; the reorder point is
+    ``mean * L + z * std * sqrt(L)`` for the ``service_level`` quantile ``z``.
+    Items at or below their reorder point or ``minStock`` are ordered up to
+    ``L + cover_days`` days of demand plus safety stock. When a supplier's
+    lines add up to less than its ``minimumOrder``, every line is scaled up
+    by the same factor and rounded up, so the order meets the minimum.
+
+    Returns ``recommendations`` (``PurchaseOrderItem`` fields plus
+    ``supplierId``, including items with no known supplier) and ``drafts``
+    (``PurchaseOrder`` documents with status ``draft``, not yet stored).
+    """
+    now = now or datetime.now()
+    n = len(items)
+    if n == 0:
+        return {"recommendations": [], "drafts": []}
+    by_key: Dict[str, int] = {}
+    for i, s in enumerate(suppliers):
+        by_key.setdefault(s.id, i)
+        by_key.setdefault(s.name, i)
+    # Supplier index per item; len(suppliers) marks "no known supplier".
+    group = np.array([by_key.get(getattr(it, "supplier", None) or "", len(suppliers)) for it in items], dtype=np.int64)
+    lead_by_group = np.array([max(1, s.leadTimeDays) for s in suppliers] + [DEFAULT_LEAD_TIME], dtype=np.float64)
+    minimum_by_group = np.array([max(0.0, s.minimumOrder) for s in suppliers] + [0.0], dtype=np.float64)
+
+    stock = np.array([int(getattr(it, "currentStock", 0) or 0) for it in items], dtype=np.float64)
+    min_stock = np.array([int(getattr(it, "minStock", 0) or 0) for it in items], dtype=np.float64)
+    price = np.array([float(getattr(it, "price", None) or 10.0) for it in items], dtype=np.float64)
+    usage = np.asarray(usage, dtype=np.float64).reshape(n, -1)
+    mean = usage.mean(axis=1) if usage.shape[1] else np.zeros(n)
+    std = usage.std(axis=1) if usage.shape[1] else np.zeros(n)
+    lead = lead_by_group[group]
+
+    z = NormalDist().inv_cdf(service_level)
+    safety = z * std * np.sqrt(lead)
+    reorder_point = mean * lead + safety
+    order_up_to = np.maximum(mean * (lead + cover_days) + safety, min_stock * 2)
+    needs = (stock <= reorder_point) | (stock <= min_stock)
+    qty = np.where(needs, np.maximum(1.0, np.ceil(order_up_to - stock)), 0.0)
+
+    subtotal = np.bincount(group, weights=qty * price, minlength=len(suppliers) + 1)
+    scale = np.where((subtotal > 0) & (subtotal < minimum_by_group), minimum_by_group / np.maximum(subtotal, 1e-9), 1.0)
+    qty = np.ceil(qty * scale[group])
+
+    days_of_cover = np.where(mean > 0, stock / np.maximum(mean, 1e-9), np.inf)
+    high = (stock <= 0) | (days_of_cover <= lead)
+
+    recommendations: List[dict] = []
+    lines: Dict[int, List[PurchaseOrderItem]] = {}
+    for i in np.flatnonzero(qty > 0):
+        it = items[i]
+        line = PurchaseOrderItem(
+            itemId=it.id,
+            itemName=it.name,
+            quantity=int(qty[i]),
+            unitPrice=float(price[i]),
+            totalPrice=round(float(qty[i] * price[i]), 2),
+            urgency="high" if high[i] else "medium",
+        )
+        g = int(group[i])
+        recommendations.append({**line.model_dump(), "supplierId": suppliers[g].id if g < len(suppliers) else None})
+        if g < len(suppliers):
+            lines.setdefault(g, []).append(line)
+
+    drafts: List[dict] = []
+    for g, order_lines in lines.items():
+        supplier = suppliers[g]
+        sub = round(sum(line.totalPrice for line in order_lines), 2)
+        tax = round(sub * TAX_RATE, 2)
+        drafts.append(PurchaseOrder(
+            id=f"draft-{supplier.id}",
+            orderNumber=f"DRAFT-{supplier.id}",
+            supplierId=supplier.id,
+            supplierName=supplier.name,
+            status="draft",
+            items=order_lines,
+            subtotal=sub,
+            tax=tax,
+            total=round(sub + tax, 2),
+            createdBy=created_by,
+            createdAt=now,
+            expectedDelivery=now + timedelta(days=int(math.ceil(lead_by_group[g]))),
+            notes=f"Reorder plan: {len(order_lines)} items, {supplier.leadTimeDays}-day lead time",
+        ).model_dump())
+    drafts.sort(key=lambda d: d["total"], reverse=True)
+    return {"recommendations": recommendations, "drafts": drafts}
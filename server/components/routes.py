@@ -1,20 +1,37 @@
-from fastapi import APIRouter, HTTPException
-from models import ProcessVoiceRequest, ProcessVoiceResponse, VoiceResponse, PurchaseOrder, PurchaseOrderItem
+from fastapi import APIRouter, HTTPException, Query
+from models import ProcessVoiceRequest, ProcessVoiceResponse, VoiceCommand, VoiceResponse, PurchaseOrder, PurchaseOrderItem, Supplier, SyncRequest, SyncResponse
+from pydantic import ValidationError
 import components.stt as stt
 import components.ai_structurer as ai_structurer
 import components.db as db
 import components.tts as tts
 import components.forecasting as forecasting
+import components.reorder as reorder
+from components.backtesting import model_selection
 import components.invoice_processor as inv
-from fastapi import UploadFile, File, Form
+from fastapi import UploadFile, File, Form, WebSocket, Response
+import base64
+import os
+import components.streaming as streaming
+from starlette.concurrency import run_in_threadpool
+from components.metrics import span, inc
+import components.ids as ids
 
 router = APIRouter()
 
+# Page size for keyset-paged listings; omitted means the whole listing, as before.
+PAGE_LIMIT = Query(None, ge=1, le=1000)
+
+def _page(key: str, docs: list, limit: int = None) -> dict:
+    """Wrap a keyset page; ``next`` is the cursor for the following page, or None on the last one."""
+    if limit is None:
+        return {key: docs}
+    return {key: docs, "next": docs[-1]["id"] if docs and len(docs) == limit else None}
+
 @router.get("/inventory")
-async def get_inventory():
+async def get_inventory(after: str = None, limit: int = PAGE_LIMIT):
     try:
-        items = db.db.get_inventory_items()
-        return {"items": [item.model_dump() for item in items]}
+        return _page("items", db.db.get_inventory_docs(after, limit), limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -28,18 +45,16 @@ async def update_inventory(item_id: str, payload: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/usage-logs")
-async def get_all_usage_logs():
+async def get_all_usage_logs(before: str = None, limit: int = PAGE_LIMIT):
     try:
-        logs = db.db.get_usage_logs()
-        return {"logs": [log.model_dump() for log in logs]}
+        return _page("logs", db.db.get_usage_log_docs(None, before, limit), limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/usage-logs/{item_id}")
-async def get_usage_logs(item_id: str):
+async def get_usage_logs(item_id: str, before: str = None, limit: int = PAGE_LIMIT):
     try:
-        logs = db.db.get_usage_logs(item_id)
-        return {"logs": [log.model_dump() for log in logs]}
+        return _page("logs", db.db.get_usage_log_docs(item_id, before, limit), limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -59,6 +74,23 @@ async def create_usage(payload: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/sync", response_model=SyncResponse)
+async def sync_offline_mutations(request: SyncRequest):
+    try:
+        if len(request.mutations) > int(os.getenv("SYNC_MAX_MUTATIONS", "1000")):
+            raise HTTPException(status_code=413, detail="Too many mutations in one sync request")
+        results = db.db.apply_sync_mutations([m.model_dump() for m in request.mutations], request.deviceId)
+        return {
+            "results": results,
+            "applied": sum(1 for r in results if r["status"] == "applied"),
+            "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+            "errors": sum(1 for r in results if r["status"] == "error"),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/suppliers")
 async def get_suppliers():
     try:
@@ -67,11 +99,20 @@ async def get_suppliers():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.put("/suppliers/{supplier_id}")
+async def save_supplier(supplier_id: str, payload: dict):
+    try:
+        supplier = Supplier(**{**payload, "id": supplier_id})
+        return {"supplier": db.db.save_supplier(supplier).model_dump()}
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/purchase-orders")
-async def list_purchase_orders():
+async def list_purchase_orders(before: str = None, limit: int = PAGE_LIMIT):
     try:
-        orders = db.db.get_purchase_orders()
-        return {"orders": [o.model_dump() for o in orders]}
+        return _page("orders", db.db.get_purchase_order_docs(before, limit), limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -85,8 +126,7 @@ async def create_purchase_order(payload: dict):
         if not supplier_id or not items_payload:
             raise HTTPException(status_code=400, detail="supplierId and items are required")
 
-        suppliers = db.db.get_suppliers()
-        supplier = next((s for s in suppliers if s.id == supplier_id), None)
+        supplier = db.db.get_supplier(supplier_id)
         if not supplier:
             raise HTTPException(status_code=404, detail="Supplier not found")
 
@@ -100,8 +140,8 @@ async def create_purchase_order(payload: dict):
         total = round(subtotal + tax, 2)
 
         from datetime import datetime, timedelta
-        order_id = str(datetime.now().timestamp())
-        order_number = f"PO-{datetime.now().year}-{int(datetime.now().timestamp())}"
+        order_id = ids.new_id()
+        order_number = ids.order_number("PO")
         expected_delivery = datetime.now() + timedelta(days=supplier.leadTimeDays)
 
         order = PurchaseOrder(
@@ -167,52 +207,96 @@ async def get_stock_alerts():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/analytics-data")
-async def get_analytics_data():
+async def get_analytics_data(shape: str = "records", window: int = 30, horizon: int = 30):
     try:
+        if not (1 <= window <= 730 and 1 <= horizon <= 365):
+            raise HTTPException(status_code=400, detail="window must be 1-730 days and horizon 1-365 days")
         items = db.db.get_inventory_items()
-        logs = db.db.get_usage_logs()
-        forecasts, analytics = forecasting.compute_forecasts_and_analytics(items, logs)
+        logs = db.db.get_daily_usage(window)
+        with span("analytics.forecast"):
+            forecasts, analytics = await run_in_threadpool(
+                forecasting.compute_forecasts_and_analytics,
+                items, logs, model_selection.choices(db.db), window, horizon, db.db.get_monthly_spend(12),
+            )
+        if shape == "columnar":
+            forecasts, analytics = forecasting.to_columnar_payload(forecasts, analytics)
+            return {
+                "shape": "columnar",
+                "items": forecasting.to_columnar([item.model_dump() for item in items]),
+                "forecasts": forecasts,
+                "analytics": analytics,
+            }
         return {
             "items": [item.model_dump() for item in items],
             "forecasts": forecasts,
             "analytics": analytics,
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analytics/simulation")
+async def get_stockout_simulation(paths: int = 2000, horizon: int = 30, history: int = 60, service_level: float = 0.95, item_id: str = None, seed: int = None):
+    try:
+        if not (1 <= paths <= 20000 and 1 <= horizon <= 365 and 1 <= history <= 365 and 0 < service_level < 1):
+            raise HTTPException(status_code=400, detail="paths must be 1-20000, horizon and history 1-365, service_level between 0 and 1")
+        items = db.db.get_inventory_items()
+        if item_id:
+            items = [it for it in items if it.id == item_id]
+        lead_by_supplier = {}
+        for s in db.db.get_suppliers():
+            lead_by_supplier[s.id] = s.leadTimeDays
+            lead_by_supplier[s.name] = s.leadTimeDays
+        lead_times = {it.id: lead_by_supplier.get(it.supplier, 7) for it in items}
+        logs = db.db.get_daily_usage(history)
+        with span("analytics.simulate"):
+            return await run_in_threadpool(
+                forecasting.simulation_report, items, logs, lead_times, history, horizon, paths, service_level, seed
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/analytics/backtest", status_code=202)
+async def start_backtest(history: int = 120, horizon: int = 7, origins: int = 4):
+    try:
+        if not (1 <= horizon <= 60 and 1 <= origins <= 52 and horizon * (origins + 1) <= history <= 730):
+            raise HTTPException(status_code=400, detail="history must cover origins + 1 horizons and be at most 730 days")
+        return model_selection.start(db.db, history_days=history, horizon=horizon, origins=origins)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/analytics/backtest")
+async def get_backtest_status():
+    return model_selection.status
+
 @router.get("/orders-bootstrap")
-async def get_orders_bootstrap():
+async def get_orders_bootstrap(window: int = 30, service_level: float = 0.95):
     try:
+        if not (1 <= window <= 365 and 0 < service_level < 1):
+            raise HTTPException(status_code=400, detail="window must be 1-365 days and service_level between 0 and 1")
         suppliers = db.db.get_suppliers()
-        orders = db.db.get_purchase_orders()
+        orders = db.db.get_purchase_order_docs()
         items = db.db.get_inventory_items()
-        logs = db.db.get_usage_logs()
-        forecasts, _analytics = forecasting.compute_forecasts_and_analytics(items, logs)
-        def recommend(items, forecasts):
-            recs = []
-            usage_by_id = {f['itemId']: f for f in forecasts}
-            for it in items:
-                f = usage_by_id.get(it.id)
-                if not f:
-                    continue
-                if f.get('riskLevel') == 'high' or f.get('daysUntilStockout', 999) <= 7:
-                    qty = int(max(0, f.get('recommendedOrderQuantity', 0)))
-                    unit_price = float(getattr(it, 'price', 10.0) or 10.0)
-                    recs.append({
-                        'itemId': it.id,
-                        'itemName': it.name,
-                        'quantity': qty,
-                        'unitPrice': unit_price,
-                        'totalPrice': qty * unit_price,
-                        'urgency': 'high' if f.get('riskLevel') == 'high' else 'medium',
-                    })
-            return recs
-        recommendations = recommend(items, forecasts)
+        logs = db.db.get_daily_usage(window)
+
+        def plan():
+            usage = forecasting.usage_matrix([it.id for it in items], logs, window)
+            return reorder.plan_reorders(items, usage, suppliers, service_level=service_level)
+        with span("orders.plan_reorders"):
+            planned = await run_in_threadpool(plan)
         return {
             "suppliers": [s.model_dump() for s in suppliers],
-            "orders": [o.model_dump() for o in orders],
-            "recommendations": recommendations,
+            "orders": orders,
+            "recommendations": planned["recommendations"],
+            "drafts": planned["drafts"],
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -220,33 +304,43 @@ async def get_orders_bootstrap():
 async def process_voice(request: ProcessVoiceRequest):
     try:
         print(f"Processing voice request with language: {request.language}")
+        audio_options = _request_audio_options(request)
+
+        if request.long_form:
+            return process_long_form(request)
 
-        transcript = stt.stt.transcribe(request.audio, request.language)
+        with span("voice.transcribe"):
+            transcript = stt.stt.transcribe(request.audio, request.language)
         print(f"Transcription result: '{transcript}'")
 
-        command = ai_structurer.ai_structurer.structure_command(transcript)
+        with span("voice.structure"):
+            command = ai_structurer.ai_structurer.structure_command(transcript)
         print(f"Structured command: type={command.type}, item={command.item}, quantity={command.quantity}")
 
-        response = execute_command(command)
+        with span("voice.execute"):
+            response = execute_command(command)
         print(f"Command response: {response.message}")
 
         tts_text = response.message or command.notes or "Sorry, I couldn't process that."
-        audio_response = tts.tts.get_audio_base64(tts_text)
+        with span("voice.tts"):
+            audio = render_audio(tts_text, request.language, **audio_options)
         print("Voice response generated")
 
         return ProcessVoiceResponse(
             transcript=transcript,
             command=command,
             response=response,
-            audio_response=audio_response
+            **audio
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing voice: {str(e)}")
         import traceback
         traceback.print_exc()
         error_message = "Sorry, there was an error processing your request."
         try:
-            audio_response = tts.tts.get_audio_base64(error_message)
+            audio_response = tts.tts.get_audio_base64(error_message, request.language)
         except:
             audio_response = None
         raise HTTPException(status_code=500, detail=str(e))
@@ -258,24 +352,34 @@ async def process_text(payload: dict):
         language = payload.get("language", "en") or "en"
         if not text.strip():
             raise HTTPException(status_code=400, detail="text is required")
+        audio_options = _audio_options(payload)
 
         transcript = text.strip()
         print(f"Processing text request: '{transcript}' (lang={language})")
 
-        command = ai_structurer.ai_structurer.structure_command(transcript)
+        # Structuring runs off the event loop so concurrent requests can share one MT5 batch.
+        if payload.get("long_form"):
+            with span("text.structure"):
+                commands = await run_in_threadpool(ai_structurer.ai_structurer.structure_commands, transcript)
+            return _batch_response(transcript, commands, None, language, audio_options)
+
+        with span("text.structure"):
+            command = await run_in_threadpool(ai_structurer.ai_structurer.structure_command, transcript)
         print(f"Structured command: type={command.type}, item={command.item}, quantity={command.quantity}")
 
-        response = execute_command(command)
+        with span("text.execute"):
+            response = execute_command(command)
         print(f"Command response: {response.message}")
 
         tts_text = response.message or command.notes or "Sorry, I couldn't process that."
-        audio_response = tts.tts.get_audio_base64(tts_text)
+        with span("text.tts"):
+            audio = render_audio(tts_text, language, **audio_options)
 
         return ProcessVoiceResponse(
             transcript=transcript,
             command=command,
             response=response,
-            audio_response=audio_response
+            **audio
         )
     except HTTPException:
         raise
@@ -290,14 +394,17 @@ async def process_text(payload: dict):
             audio_response = None
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.websocket("/ws/transcribe")
+async def transcribe_stream(websocket: WebSocket):
+    await streaming.stream_transcription(websocket, stt.stt, ai_structurer.ai_structurer, execute_command, tts.tts)
+
 def execute_command(command):
     if command.type == "usage" and command.item and command.quantity:
         item = db.db.find_best_match_by_name(command.item) or db.db.find_item_by_name(command.item)
         if not item:
             return VoiceResponse(message=f"I couldn't find {command.item} in inventory.", success=False)
         if item.currentStock >= command.quantity:
-            db.db.log_usage(item.id, command.quantity, "voice_user")
-            db.db.update_stock(item.id, item.currentStock - command.quantity)
+            db.db.log_usage(item.id, command.quantity, "voice_user", stock_delta=-command.quantity)
             remaining = item.currentStock - command.quantity
             return VoiceResponse(
                 message=f"Done. I deducted {command.quantity} {item.unit} of {item.name}. {remaining} left.",
@@ -329,6 +436,148 @@ def execute_command(command):
     return VoiceResponse(message="I didn't catch that. Please try again, like 'Add 20 masks' or 'I used 3 syringes'.", success=False)
 
 
+def execute_commands(commands):
+    """Execute a dictated list of commands with one name-matching scan and one batched write.
+
+    Stock is tracked locally across the batch so "used 3 syringes ... used 2
+    syringes" checks the second deduction against what the first left. Names
+    the fuzzy scan misses fall back to ``find_item_by_name`` like the
+    single-command path, and items created by the batch resolve for the
+    commands after them.
+    """
+    names = list({c.item for c in commands if c.item})
+    matches = db.db.find_best_matches_by_name(names) if names else {}
+    looked_up = set()
+    stock = {}
+    ops = []
+    usage = []
+    results = []
+    for command in commands:
+        item = matches.get(command.item) if command.item else None
+        if item is None and command.item and command.item not in looked_up:
+            looked_up.add(command.item)
+            item = matches[command.item] = db.db.find_item_by_name(command.item)
+        if command.type == "usage" and command.item and command.quantity:
+            if not item:
+                results.append(VoiceResponse(message=f"I couldn't find {command.item} in inventory.", success=False))
+                continue
+            current = stock.get(item.id, item.currentStock)
+            if current < command.quantity:
+                results.append(VoiceResponse(message=f"Not enough {item.name} in stock to deduct {command.quantity}.", success=False))
+                continue
+            stock[item.id] = current - command.quantity
+            ops.append(("inc", item.id, -command.quantity))
+            usage.append((item.id, command.quantity))
+            results.append(VoiceResponse(message=f"Deducted {command.quantity} {item.unit} of {item.name}, {stock[item.id]} left.", success=True))
+        elif command.type == "update" and command.item and command.quantity is not None:
+            if not item:
+                created = matches[command.item] = db.db.create_inventory_item(command.item, command.quantity, unit="units")
+                stock[created.id] = created.currentStock
+                results.append(VoiceResponse(message=f"Added {created.name} with a stock of {created.currentStock} {created.unit}.", success=True))
+                continue
+            stock[item.id] = command.quantity
+            ops.append(("set", item.id, command.quantity))
+            results.append(VoiceResponse(message=f"{item.name} is now {command.quantity} {item.unit}.", success=True))
+        elif command.type == "query" and command.item:
+            if not item:
+                results.append(VoiceResponse(message=f"I couldn't find {command.item} in inventory.", success=False))
+                continue
+            results.append(VoiceResponse(message=f"You have {stock.get(item.id, item.currentStock)} {item.unit} of {item.name} available.", success=True))
+        else:
+            results.append(VoiceResponse(message="I didn't catch one of the commands.", success=False))
+    db.db.apply_stock_batch(ops, usage, user="voice_user")
+    return results
+
+
+def _batch_response(transcript, commands, audio_seconds, language="en", audio_options=None):
+    audio_options = check_audio_options(**(audio_options or {}))
+    with span("batch.execute"):
+        results = execute_commands(commands)
+    ok = sum(1 for r in results if r.success)
+    message = " ".join(r.message for r in results) or "I didn't catch that."
+    data = {
+        "results": [r.model_dump() for r in results],
+        "executed": ok,
+        "failed": len(results) - ok,
+    }
+    if audio_seconds:
+        inc("long_form_commands_total", "Commands structured from long-form dictation", len(commands))
+        data["audioSeconds"] = audio_seconds
+        data["commandsPerAudioSecond"] = len(commands) / audio_seconds
+    response = VoiceResponse(message=message, success=ok > 0 and ok == len(results), data=data)
+    summary = VoiceCommand(type="batch", notes=f"{len(commands)} commands, {ok} executed")
+    with span("batch.tts"):
+        audio = render_audio(message, language, **audio_options)
+    return ProcessVoiceResponse(
+        transcript=transcript,
+        command=summary,
+        response=response,
+        commands=commands,
+        **audio
+    )
+
+
+def process_long_form(request):
+    audio_options = _request_audio_options(request)
+    with span("voice.transcribe"):
+        transcript, audio_seconds = stt.stt.transcribe_long(request.audio, request.language)
+    print(f"Long-form transcription: '{transcript}' ({audio_seconds:.1f}s)")
+    with span("voice.structure"):
+        commands = ai_structurer.ai_structurer.structure_commands(transcript)
+    print(f"Structured {len(commands)} command(s) from long-form dictation")
+    return _batch_response(transcript, commands, audio_seconds, request.language, audio_options)
+
+
+AUDIO_DELIVERIES = ("inline", "url")
+
+
+def check_audio_options(audio_format=None, audio_bitrate=None, audio_delivery=None) -> dict:
+    """Validate and normalize the TTS output options.
+
+    Callers run this before structuring or executing anything, so a bad
+    option is a 400 with nothing written rather than one after stock moved.
+    """
+    fmt = (audio_format or tts.default_audio_format()).lower()
+    if fmt not in tts.AUDIO_FORMATS:
+        raise HTTPException(status_code=400, detail=f"audio_format must be one of {', '.join(tts.AUDIO_FORMATS)}")
+    if audio_bitrate is not None and audio_bitrate not in tts.AUDIO_BITRATES:
+        raise HTTPException(status_code=400, detail=f"audio_bitrate must be one of {', '.join(tts.AUDIO_BITRATES)}")
+    delivery = audio_delivery or "inline"
+    if delivery not in AUDIO_DELIVERIES:
+        raise HTTPException(status_code=400, detail=f"audio_delivery must be one of {', '.join(AUDIO_DELIVERIES)}")
+    return {"audio_format": fmt, "audio_bitrate": audio_bitrate, "audio_delivery": delivery}
+
+
+def _request_audio_options(request) -> dict:
+    return check_audio_options(request.audio_format, request.audio_bitrate, request.audio_delivery)
+
+
+def _audio_options(payload: dict) -> dict:
+    return check_audio_options(payload.get("audio_format"), payload.get("audio_bitrate"), payload.get("audio_delivery"))
+
+
+def render_audio(text, language="en", audio_format=None, audio_bitrate=None, audio_delivery=None) -> dict:
+    """Synthesize ``text`` in the negotiated format, inline as base64 or as a fetchable URL."""
+    options = check_audio_options(audio_format, audio_bitrate, audio_delivery)
+    fmt, audio_delivery = options["audio_format"], options["audio_delivery"]
+    data = tts.tts.speak(text, language, fmt, audio_bitrate)
+    if audio_delivery == "url":
+        audio_id = tts.audio_store.put(data, tts.AUDIO_FORMATS[fmt]["mime"])
+        return {"audio_response": None, "audio_url": f"/api/audio/{audio_id}", "audio_format": fmt}
+    with span("tts.base64_encode"):
+        encoded = base64.b64encode(data).decode("utf-8")
+    return {"audio_response": encoded, "audio_url": None, "audio_format": fmt}
+
+
+@router.get("/audio/{audio_id}")
+async def get_audio(audio_id: str):
+    entry = tts.audio_store.get(audio_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Audio not found or expired")
+    data, mime = entry
+    return Response(content=data, media_type=mime)
+
+
 @router.post("/invoice/extract")
 async def invoice_extract(file: UploadFile = File(...)):
     try:
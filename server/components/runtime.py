@@ -0,0 +1,176 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+MODELS = ("whisper", "mt5", "vits", "trocr")
+
+# Relative share of the cores each model gets in the "shared" and "partitioned" profiles.
+WEIGHTS = {"whisper": 3, "mt5": 2, "vits": 2, "trocr": 3}
+
+PROFILES = ("default", "shared", "partitioned")
+
+_settings: Dict[str, Dict[str, object]] = {}
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_configured = False
+_lock = threading.Lock()
+
+
+def parse_cpus(spec: str) -> List[int]:
+    """Parse a core list like ``"0-3,6"`` into ``[0, 1, 2, 3, 6]``."""
+    cpus: List[int] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def profile_settings(profile: str, cpus: Optional[List[int]] = None) -> Dict[str, Dict[str, object]]:
+    """Thread count and core set per model for a named profile.
+
+    ``default`` leaves torch alone. ``shared`` gives each model a thread
+    count proportional to its weight so concurrent models stop
+    oversubscribing the machine, but lets the OS schedule them anywhere.
+    ``partitioned`` additionally pins each model to its own slice of cores;
+    with fewer cores than models the slices overlap.
+    """
+    cpus = cpus or available_cpus()
+    if profile == "default":
+        return {m: {"threads": None, "cpus": None} for m in MODELS}
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown torch profile: {profile}")
+    total = sum(WEIGHTS.values())
+    out: Dict[str, Dict[str, object]] = {}
+    pos = 0
+    for model in MODELS:
+        count = max(1, round(len(cpus) * WEIGHTS[model] / total))
+        core_set = [cpus[(pos + i) % len(cpus)] for i in range(min(count, len(cpus)))]
+        pos += count
+        out[model] = {"threads": len(core_set), "cpus": core_set if profile == "partitioned" else None}
+    return out
+
+
+def configure(profile: Optional[str] = None) -> Dict[str, Dict[str, object]]:
+    """Apply ``TORCH_PROFILE`` plus per-model overrides; safe to call more than once.
+
+    ``<MODEL>_THREADS`` (e.g. ``WHISPER_THREADS=4``) and ``<MODEL>_CPUS``
+    (e.g. ``TROCR_CPUS=4-7``) override the profile for one model.
+    ``TORCH_NUM_THREADS`` and ``TORCH_INTEROP_THREADS`` set the process-wide
+    intra/inter-op defaults; inter-op threads can only be set before torch
+    runs any parallel work, so configure at startup.
+    """
+    global _configured
+    import torch
+    with _lock:
+        profile = profile or os.getenv("TORCH_PROFILE", "default")
+        settings = profile_settings(profile)
+        for model in MODELS:
+            threads = os.getenv(f"{model.upper()}_THREADS")
+            cpus = os.getenv(f"{model.upper()}_CPUS")
+            if threads:
+                settings[model]["threads"] = int(threads)
+            if cpus:
+                settings[model]["cpus"] = parse_cpus(cpus)
+                settings[model]["threads"] = settings[model]["threads"] or len(settings[model]["cpus"])
+        if os.getenv("TORCH_NUM_THREADS"):
+            torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS")))
+        if os.getenv("TORCH_INTEROP_THREADS") and not _configured:
+            try:
+                torch.set_num_interop_threads(int(os.getenv("TORCH_INTEROP_THREADS")))
+            except RuntimeError as e:
+                print(f"Could not set inter-op threads: {e}")
+        for executor in _executors.values():
+            executor.shutdown(wait=False)
+        _executors.clear()
+        _settings.clear()
+        _settings.update(settings)
+        _settings["_profile"] = {"name": profile}
+        _configured = True
+        return settings
+
+
+def _pin_thread(threads: Optional[int], cpus: Optional[List[int]]):
+    import torch
+    if threads:
+        torch.set_num_threads(int(threads))
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+
+def _executor(model: str) -> Optional[ThreadPoolExecutor]:
+    if not _configured:
+        configure()
+    conf = _settings.get(model) or {}
+    threads = conf.get("threads")
+    cpus = conf.get("cpus")
+    if not threads and not cpus:
+        return None
+    with _lock:
+        executor = _executors.get(model)
+        if executor is None:
+            executor = _executors[model] = ThreadPoolExecutor(
+                max_workers=int(os.getenv(f"{model.upper()}_WORKERS", "1")),
+                thread_name_prefix=f"{model}-model",
+                initializer=_pin_thread,
+                initargs=(threads, cpus),
+            )
+        return executor
+
+
+def run_model(model: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run ``fn(*args, **kwargs)`` on ``model``'s own threads and wait for the result.
+
+    Each configured model gets a dedicated executor (``<MODEL>_WORKERS``
+    threads, default 1), and every one of its threads is set up once before
+    it runs anything: its OpenMP intra-op thread count, which is per calling
+    thread, and its core set via ``sched_setaffinity``. Affinity is inherited
+    by threads created afterwards, so the OpenMP pool each executor thread
+    spawns on its first parallel op stays on that model's cores. Threads
+    shared between models, like the anyio pool, are never re-pinned.
+
+    MKL keeps one thread count for the whole process, so ops that go through
+    MKL use whichever count was set last; only OpenMP-parallel ops are held
+    to the partition. The caller's context variables (request spans) travel
+    with the call. With the ``default`` profile and no overrides ``fn`` runs
+    in the caller.
+    """
+    executor = _executor(model)
+    if executor is None:
+        return fn(*args, **kwargs)
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs).result()
+
+
+def report() -> Dict[str, object]:
+    """Effective process-wide torch settings and the per-model configuration."""
+    import torch
+    return {
+        "profile": (_settings.get("_profile") or {}).get("name"),
+        "torch": torch.__version__,
+        "cpus": len(available_cpus()),
+        "intraOpThreads": torch.get_num_threads(),
+        "interOpThreads": torch.get_num_interop_threads(),
+        "models": {m: dict(_settings.get(m) or {}) for m in MODELS},
+    }
+
+
+def print_report():
+    info = report()
+    print(
+        f"Torch {info['torch']} profile={info['profile']} cpus={info['cpus']} "
+        f"intra-op={info['intraOpThreads']} inter-op={info['interOpThreads']}"
+    )
+    for model, conf in info["models"].items():
+        print(f"  {model}: threads={conf.get('threads') or 'default'} cpus={conf.get('cpus') or 'any'}")
@@ -0,0 +1,269 @@
+import json
+import time
+from typing import List, Optional
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+import components.vad as vad
+from components.stt import NO_SPEECH
+from components.metrics import span
+
+SAMPLE_RATE = 16000
+
+
+class StreamingSession:
+    """Rolling 16 kHz buffer with incremental VAD-based end-of-utterance detection.
+
+    Audio is appended as it arrives and only the newly completed VAD frames
+    are scored, so each frame costs the same however long the utterance
+    gets. ``utterance()`` is the speech since the current utterance started,
+    and ``end_of_utterance()`` reports when the speaker has been silent for
+    ``end_silence_ms`` after speaking. Positions are absolute stream sample
+    indexes; ``_origin`` is the stream index of ``_data[_start]``.
+
+    For partial transcripts, ``pending()`` is the utterance audio not yet
+    ``commit``-ed, so each partial decodes only recent audio.
+    """
+
+    def __init__(self, end_silence_ms: int = 700, max_utterance_s: float = 30.0, idle_keep_s: float = 1.0, min_speech_ms: int = 150, pad_ms: int = 150):
+        self.vad = vad.StreamingVAD(SAMPLE_RATE)
+        self.end_silence = int(SAMPLE_RATE * end_silence_ms / 1000)
+        self.max_utterance = int(SAMPLE_RATE * max_utterance_s)
+        self.idle_keep = int(SAMPLE_RATE * idle_keep_s)
+        self.min_frames = max(1, min_speech_ms * SAMPLE_RATE // 1000 // self.vad.hop)
+        self.pad = int(SAMPLE_RATE * pad_ms / 1000)
+        self._data = np.zeros(SAMPLE_RATE * 4, dtype=np.float32)
+        self._start = 0
+        self._len = 0
+        self._origin = 0
+        self._frames = 0
+        self._run = 0
+        self._speech_start: Optional[int] = None
+        self._speech_end: Optional[int] = None
+        self._committed: Optional[int] = None
+        self.committed_text: List[str] = []
+
+    @property
+    def total(self) -> int:
+        return self._origin + self._len
+
+    def append(self, samples: np.ndarray):
+        samples = samples.astype(np.float32, copy=False)
+        self._write(samples)
+        hop = self.vad.hop
+        for voiced in self.vad.feed(samples):
+            frame_start = self._frames * hop
+            self._frames += 1
+            self._run = self._run + 1 if voiced else 0
+            if self._run < self.min_frames:
+                continue
+            if self._speech_start is None:
+                self._speech_start = max(self._origin, frame_start - (self._run - 1) * hop - self.pad)
+                self._committed = self._speech_start
+            self._speech_end = frame_start + self.vad.frame + self.pad
+        if self._speech_start is None and self._len > self.idle_keep:
+            # Keep a little lead-in before the first word; older silence is dropped.
+            self._drop(self._len - self.idle_keep)
+
+    def _write(self, samples: np.ndarray):
+        n = samples.shape[0]
+        if self._start + self._len + n > self._data.shape[0]:
+            keep = self._data[self._start:self._start + self._len]
+            if self._len + n > self._data.shape[0] // 2:
+                grown = np.zeros(max(self._data.shape[0] * 2, self._len + n), dtype=np.float32)
+                grown[:self._len] = keep
+                self._data = grown
+            else:
+                self._data[:self._len] = keep
+            self._start = 0
+        self._data[self._start + self._len:self._start + self._len + n] = samples
+        self._len += n
+
+    def _drop(self, n: int):
+        n = min(n, self._len)
+        self._start += n
+        self._len -= n
+        self._origin += n
+
+    def _slice(self, lo: int, hi: int) -> np.ndarray:
+        lo = max(lo, self._origin) - self._origin
+        hi = min(hi, self.total) - self._origin
+        return self._data[self._start + lo:self._start + max(lo, hi)]
+
+    @property
+    def has_speech(self) -> bool:
+        return self._speech_start is not None
+
+    def end_of_utterance(self) -> bool:
+        if self._speech_start is None:
+            return False
+        trailing = self.total - self._speech_end
+        return trailing >= self.end_silence or self.total - self._speech_start >= self.max_utterance
+
+    def utterance(self) -> np.ndarray:
+        if self._speech_start is None:
+            return self._data[:0]
+        return self._slice(self._speech_start, self._speech_end)
+
+    def pending(self) -> np.ndarray:
+        """Utterance audio after the last ``commit``."""
+        if self._speech_start is None:
+            return self._data[:0]
+        return self._slice(self._committed, self._speech_end)
+
+    def commit(self, samples: int, text: str):
+        """Mark ``samples`` of pending audio as decoded into ``text``; later partials skip it."""
+        self._committed += samples
+        self.committed_text.append(text)
+
+    def consume(self):
+        """Forget the finished utterance, keeping any audio recorded after it."""
+        if self._speech_end is not None:
+            self._drop(min(self._speech_end, self.total) - self._origin)
+        self._speech_start = self._speech_end = self._committed = None
+        self._run = 0
+        self.committed_text = []
+
+
+FORMATS = {"pcm16": 2, "f32": 4}
+
+
+def parse_params(params) -> dict:
+    """Validate the session query parameters; raises ``ValueError`` naming the bad one."""
+    def number(name, default, cast, lo, hi):
+        raw = params.get(name, default)
+        try:
+            value = cast(raw)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number, got {raw!r}")
+        if not lo <= value <= hi:
+            raise ValueError(f"{name} must be between {lo} and {hi}")
+        return value
+
+    fmt = params.get("format", "pcm16")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return {
+        "language": params.get("language", "en"),
+        "format": fmt,
+        "sample_rate": number("sample_rate", SAMPLE_RATE, int, 8000, 192000),
+        "tts": params.get("tts", "0") in ("1", "true"),
+        "partial_interval": number("partial_interval", "1.0", float, 0.1, 30.0),
+        "partial_commit_s": number("partial_commit_s", "5.0", float, 0.5, 60.0),
+        "end_silence_ms": number("end_silence_ms", "700", int, 100, 10000),
+    }
+
+
+def _pcm_to_float(data: bytes, fmt: str) -> np.ndarray:
+    if fmt == "f32":
+        return np.frombuffer(data, dtype="<f4")
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+async def stream_transcription(websocket: WebSocket, stt, structurer, execute_command, tts=None):
+    """Serve one streaming recognition session.
+
+    Query parameters: ``language`` (en/ro), ``format`` (``pcm16`` little-endian
+    int16 or ``f32``), ``sample_rate`` (resampled to 16 kHz when different) and
+    ``tts=1`` to include spoken replies. Binary messages carry audio frames;
+    the text message ``{"type": "end"}`` flushes the current utterance.
+
+    The server sends ``partial`` transcripts while the user speaks, a
+    ``final`` transcript at end of utterance, then a ``result`` with the
+    structured command and its execution. A partial decodes only the audio
+    since the last committed piece; once that reaches ``partial_commit_s``
+    seconds (default 5) its text is kept and the next partials start after
+    it, so partial decoding stays linear in the utterance length. The final
+    transcript decodes the whole utterance once. When the final turns out to
+    hold no speech, ``final`` has ``noSpeech: true`` and no ``result`` follows.
+
+    Invalid parameters close the socket with code 1008 and the reason before
+    it is accepted. Frames need not end on a sample boundary: trailing bytes
+    are kept and joined to the next frame.
+    """
+    try:
+        params = parse_params(websocket.query_params)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    await websocket.accept()
+    language = params["language"]
+    fmt = params["format"]
+    width = FORMATS[fmt]
+    rate = params["sample_rate"]
+    want_tts = params["tts"]
+    partial_every = int(SAMPLE_RATE * params["partial_interval"])
+    commit_every = int(SAMPLE_RATE * params["partial_commit_s"])
+    session = StreamingSession(end_silence_ms=params["end_silence_ms"])
+    since_partial = 0
+    carry = b""
+
+    async def finalize():
+        audio = session.utterance()
+        session.consume()
+        if audio.shape[0] == 0:
+            return
+        t0 = time.perf_counter()
+        transcript = await run_in_threadpool(stt.transcribe_array, audio, language)
+        if transcript == NO_SPEECH:
+            await websocket.send_json({"type": "final", "text": "", "noSpeech": True})
+            return
+        await websocket.send_json({"type": "final", "text": transcript})
+        with span("stream.structure_execute"):
+            command = await run_in_threadpool(structurer.structure_command, transcript)
+            response = await run_in_threadpool(execute_command, command)
+        message = {
+            "type": "result",
+            "transcript": transcript,
+            "command": command.model_dump(),
+            "response": response.model_dump(),
+            "latencyMs": (time.perf_counter() - t0) * 1000.0,
+        }
+        if want_tts and tts is not None:
+            text = response.message or command.notes or ""
+            message["audio_response"] = await run_in_threadpool(tts.get_audio_base64, text, language) if text else None
+        await websocket.send_json(message)
+
+    try:
+        while True:
+            msg = await websocket.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            if msg.get("bytes") is not None:
+                data = carry + msg["bytes"]
+                usable = len(data) - len(data) % width
+                carry = data[usable:]
+                if usable == 0:
+                    continue
+                samples = _pcm_to_float(data[:usable], fmt)
+                if rate != SAMPLE_RATE:
+                    import librosa
+                    samples = await run_in_threadpool(librosa.resample, samples, orig_sr=rate, target_sr=SAMPLE_RATE)
+                session.append(samples)
+                since_partial += samples.shape[0]
+                if session.end_of_utterance():
+                    since_partial = 0
+                    await finalize()
+                elif session.has_speech and since_partial >= partial_every:
+                    since_partial = 0
+                    pending = session.pending()
+                    with span("stream.partial"):
+                        text = await run_in_threadpool(stt.transcribe_array, pending, language)
+                    if text == NO_SPEECH:
+                        text = ""
+                    if pending.shape[0] >= commit_every:
+                        session.commit(pending.shape[0], text)
+                        text = ""
+                    await websocket.send_json({"type": "partial", "text": " ".join(t for t in session.committed_text + [text] if t)})
+            elif msg.get("text"):
+                try:
+                    control = json.loads(msg["text"])
+                except ValueError:
+                    control = {}
+                if control.get("type") == "end":
+                    await finalize()
+                    await websocket.send_json({"type": "done"})
+    except WebSocketDisconnect:
+        pass
@@ -1,12 +1,20 @@
 import torch
 import numpy as np
 import io
+import re
 import base64
+from typing import List, Tuple
 import librosa
 from pydub import AudioSegment
+from components.metrics import span, inc
+from components.runtime import run_model
+import components.vad as vad
 
 import os
 
+# Returned instead of a transcript when the VAD finds no speech in the audio.
+NO_SPEECH = "No speech detected"
+
 class SpeechToText:
     def __init__(self):
         self.pipe = None
@@ -38,43 +46,41 @@ class SpeechToText:
             )
             print(f"Whisper model '{self._model_id}' loaded successfully")
 
-    def transcribe(self, audio_data: str, language: str = "en") -> str:
-        try:
-            print(f"Starting transcription, audio data length: {len(audio_data)}")
-            self._load_model()
-            
+    def _decode(self, audio_data: str) -> np.ndarray:
+        with span("stt.base64_decode"):
             audio_bytes = base64.b64decode(audio_data)
-            print(f"Decoded audio bytes: {len(audio_bytes)}")
-            
-            print("Converting audio format with pydub...")
+        print(f"Decoded audio bytes: {len(audio_bytes)}")
+
+        print("Converting audio format with pydub...")
+        with span("stt.pydub_convert"):
             audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
-            
+
             wav_buffer = io.BytesIO()
             audio_segment.export(wav_buffer, format="wav")
             wav_buffer.seek(0)
-            
-            print("Loading audio with librosa...")
+
+        print("Loading audio with librosa...")
+        with span("stt.librosa_resample"):
             audio_array, sample_rate = librosa.load(wav_buffer, sr=16000, mono=True)
-            max_len = 16000 * 15
-            if audio_array.shape[0] > max_len:
-                audio_array = audio_array[:max_len]
-            print(f"Audio loaded - shape: {audio_array.shape}, sample_rate: {sample_rate}")
+        print(f"Audio loaded - shape: {audio_array.shape}, sample_rate: {sample_rate}")
+        return audio_array
+
+    @staticmethod
+    def _whisper_language(language: str) -> str:
+        lang_in = (language or "en").lower()
+        return "ro" if lang_in.startswith("ro") else "en"
+
+    def transcribe(self, audio_data: str, language: str = "en") -> str:
+        try:
+            print(f"Starting transcription, audio data length: {len(audio_data)}")
+            audio_array = self._decode(audio_data)
             
             if len(audio_array) == 0:
                 return "No audio data received"
             
             print(f"Audio array stats - min: {audio_array.min():.6f}, max: {audio_array.max():.6f}, mean: {audio_array.mean():.6f}")
-            
-            lang_in = (language or "en").lower()
-            lang = "ro" if lang_in.startswith("ro") else "en"
-            
-            print("Running Whisper inference...")
-            result = self.pipe(audio_array, generate_kwargs={"task": "transcribe", "language": lang})
-            transcript = result["text"].strip()
-            print(f"Transcription result: '{transcript}'")
-            
-            return transcript if transcript else "No speech detected"
-            
+            return self.transcribe_array(audio_array, language)
+
         except Exception as e:
             error_msg = f"Error processing audio: {str(e)}"
             print(error_msg)
@@ -82,4 +88,107 @@ class SpeechToText:
             traceback.print_exc()
             return error_msg
 
+    def transcribe_array(self, audio_array: np.ndarray, language: str = "en") -> str:
+        """Transcribe 16 kHz mono float audio that is already decoded."""
+        if audio_array.shape[0] == 0:
+            return NO_SPEECH
+        with span("stt.vad"):
+            segments = vad.detect_speech(audio_array, sample_rate=16000)
+        if not segments:
+            inc("stt_vad_rejected_total", "Clips rejected by VAD without running Whisper")
+            print("VAD found no speech, skipping Whisper")
+            return NO_SPEECH
+        groups = vad.split_segments(segments, max_samples=16000 * 15)
+        chunks = [vad.gather(audio_array, g) for g in groups]
+        speech_samples = sum(c.shape[0] for c in chunks)
+        inc("stt_vad_trimmed_seconds_total", "Seconds of silence trimmed before Whisper", (audio_array.shape[0] - speech_samples) / 16000)
+        print(f"VAD kept {speech_samples / 16000:.2f}s of {audio_array.shape[0] / 16000:.2f}s in {len(chunks)} chunk(s)")
+
+        lang = self._whisper_language(language)
+
+        with span("stt.load_model"):
+            self._load_model()
+
+        print("Running Whisper inference...")
+        with span("stt.whisper"):
+            results = run_model("whisper", self.pipe, chunks if len(chunks) > 1 else chunks[0], generate_kwargs={"task": "transcribe", "language": lang})
+        if isinstance(results, dict):
+            results = [results]
+        transcript = " ".join(r["text"].strip() for r in results).strip()
+        print(f"Transcription result: '{transcript}'")
+
+        return transcript if transcript else NO_SPEECH
+
+    def transcribe_long(self, audio_data: str, language: str = "en", chunk_s: float = 15.0, overlap_s: float = 2.0) -> Tuple[str, float]:
+        """Transcribe dictation of any length.
+
+        Speech segments found by the VAD are cut into ``chunk_s`` windows that
+        overlap by ``overlap_s``, all windows go through Whisper in one batch,
+        and the overlapping words are stitched back together. Pauses between
+        segments become sentence breaks so the structurer can split commands.
+        Returns the transcript and the clip duration in seconds.
+        """
+        try:
+            print(f"Starting long-form transcription, audio data length: {len(audio_data)}")
+            audio_array = self._decode(audio_data)
+            duration = audio_array.shape[0] / 16000
+            if len(audio_array) == 0:
+                return "No audio data received", 0.0
+
+            with span("stt.vad"):
+                segments = vad.detect_speech(audio_array, sample_rate=16000)
+            if not segments:
+                inc("stt_vad_rejected_total", "Clips rejected by VAD without running Whisper")
+                return NO_SPEECH, duration
+
+            windows = vad.overlapped_windows(segments, int(16000 * chunk_s), int(16000 * overlap_s))
+            chunks = [audio_array[s:e] for _seg, s, e in windows]
+            print(f"Long-form: {len(segments)} speech segment(s), {len(chunks)} window(s) over {duration:.1f}s")
+
+            with span("stt.load_model"):
+                self._load_model()
+            with span("stt.whisper"):
+                results = run_model(
+                    "whisper",
+                    self.pipe,
+                    chunks,
+                    batch_size=int(os.getenv("STT_BATCH_SIZE", "8")),
+                    generate_kwargs={"task": "transcribe", "language": self._whisper_language(language)},
+                )
+            if isinstance(results, dict):
+                results = [results]
+
+            pieces: List[str] = []
+            current_seg = None
+            for (seg_idx, _s, _e), r in zip(windows, results):
+                text = r["text"].strip()
+                if not text:
+                    continue
+                if seg_idx == current_seg and pieces:
+                    pieces[-1] = merge_overlap(pieces[-1], text)
+                else:
+                    pieces.append(text)
+                    current_seg = seg_idx
+            transcript = ". ".join(p.rstrip(".") for p in pieces).strip()
+            inc("stt_long_form_audio_seconds_total", "Seconds of audio transcribed in long-form mode", duration)
+            print(f"Long-form transcription result: '{transcript}'")
+            return (transcript if transcript else NO_SPEECH), duration
+        except Exception as e:
+            error_msg = f"Error processing audio: {str(e)}"
+            print(error_msg)
+            import traceback
+            traceback.print_exc()
+            return error_msg, 0.0
+
+
+def merge_overlap(left: str, right: str, max_words: int = 12) -> str:
+    """Join two transcripts of overlapping audio, dropping the words they share."""
+    lw = left.split()
+    rw = right.split()
+    norm = lambda w: re.sub(r"[^\w]", "", w.lower())
+    for k in range(min(max_words, len(lw), len(rw)), 0, -1):
+        if [norm(w) for w in lw[-k:]] == [norm(w) for w in rw[:k]]:
+            return " ".join(lw + rw[k:])
+    return " ".join(lw + rw)
+
 stt = SpeechToText()
\ No newline at end of file
@@ -1,45 +1,219 @@
 import torch
 import numpy as np
 import io
+import os
+import gc
 import base64
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
 from transformers import VitsModel, AutoTokenizer
 import scipy.io.wavfile
+from components.metrics import span
+from components.runtime import run_model
+
+DEFAULT_VOICES = {
+    "en": "facebook/mms-tts-eng",
+    "ro": "facebook/mms-tts-ron",
+}
+
+
+# pydub/ffmpeg export settings and MIME type per negotiable output format.
+AUDIO_FORMATS = {
+    "wav": {"format": "wav", "codec": None, "mime": "audio/wav", "bitrate": None},
+    "mp3": {"format": "mp3", "codec": None, "mime": "audio/mpeg", "bitrate": "32k"},
+    "opus": {"format": "ogg", "codec": "libopus", "mime": "audio/ogg", "bitrate": "24k"},
+}
+
+
+# Bitrates accepted for lossy formats; anything else is rejected before it reaches ffmpeg.
+AUDIO_BITRATES = ("16k", "24k", "32k", "48k", "64k", "96k", "128k")
+
+
+def default_audio_format() -> str:
+    return os.getenv("TTS_AUDIO_FORMAT", "wav")
+
+
+def encode_audio(samples: np.ndarray, sample_rate: int, fmt: str = "wav", bitrate: Optional[str] = None) -> bytes:
+    """Encode int16 mono PCM as WAV, MP3 or Opus-in-OGG."""
+    spec = AUDIO_FORMATS.get(fmt)
+    if spec is None:
+        raise ValueError(f"Unsupported audio format: {fmt}")
+    if bitrate is not None and bitrate not in AUDIO_BITRATES:
+        raise ValueError(f"Unsupported audio bitrate: {bitrate}")
+    if fmt == "wav":
+        wav_buffer = io.BytesIO()
+        scipy.io.wavfile.write(wav_buffer, rate=sample_rate, data=samples)
+        return wav_buffer.getvalue()
+    from pydub import AudioSegment
+    segment = AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=sample_rate, channels=1)
+    out = io.BytesIO()
+    kwargs = {"format": spec["format"], "bitrate": bitrate or spec["bitrate"]}
+    if spec["codec"]:
+        kwargs["codec"] = spec["codec"]
+    segment.export(out, **kwargs)
+    return out.getvalue()
+
+
+def _voice_for(language: str) -> str:
+    lang = (language or "en").lower().split("-")[0].split("_")[0]
+    return os.getenv(f"TTS_MODEL_{lang.upper()}") or DEFAULT_VOICES.get(lang) or DEFAULT_VOICES["en"]
+
+
+def _waveform(model, inputs):
+    with torch.no_grad():
+        return model(**inputs).waveform
+
+
+def _model_bytes(model) -> int:
+    return sum(p.numel() * p.element_size() for p in model.parameters()) + sum(
+        b.numel() * b.element_size() for b in model.buffers()
+    )
+
 
 class TextToSpeech:
-    def __init__(self):
-        self.model = None
-        self.tokenizer = None
-        self._model_loaded = False
-
-    def _load_model(self):
-        if not self._model_loaded:
-            print("Loading lightweight TTS model (facebook/mms-tts-eng)...")
-            self.model = VitsModel.from_pretrained("facebook/mms-tts-eng")
-            self.tokenizer = AutoTokenizer.from_pretrained("facebook/mms-tts-eng")
-            self._model_loaded = True
+    """VITS voices loaded per language on first use and kept in an LRU pool.
+
+    At most ``TTS_MAX_MODELS`` voices stay resident and their combined weights
+    stay under ``TTS_MEMORY_BUDGET_MB``; the least recently used voice is
+    evicted first. Tokenizers are small and are cached separately, so an
+    evicted voice reloads only its weights. Languages that map to the same
+    checkpoint share one entry.
+    """
+
+    def __init__(self, max_models: Optional[int] = None, memory_budget_mb: Optional[float] = None):
+        self.max_models = int(max_models or os.getenv("TTS_MAX_MODELS", "2"))
+        self.memory_budget = float(memory_budget_mb or os.getenv("TTS_MEMORY_BUDGET_MB", "0")) * 1024 * 1024
+        self._models: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tokenizers = {}
+        self._lock = threading.Lock()
+
+    def _tokenizer(self, model_id: str):
+        tok = self._tokenizers.get(model_id)
+        if tok is None:
+            tok = self._tokenizers[model_id] = AutoTokenizer.from_pretrained(model_id)
+        return tok
+
+    def _evict(self):
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models
+            or (self.memory_budget and sum(size for _m, size in self._models.values()) > self.memory_budget)
+        ):
+            model_id, _ = self._models.popitem(last=False)
+            print(f"Evicting TTS model {model_id}")
+        gc.collect()
+
+    def _load_model(self, language: str = "en"):
+        model_id = _voice_for(language)
+        with self._lock:
+            entry = self._models.get(model_id)
+            if entry is not None:
+                self._models.move_to_end(model_id)
+                return model_id, entry[0], self._tokenizer(model_id)
+            print(f"Loading lightweight TTS model ({model_id})...")
+            model = VitsModel.from_pretrained(model_id)
+            model.eval()
+            self._models[model_id] = (model, _model_bytes(model))
+            tokenizer = self._tokenizer(model_id)
+            self._evict()
             print("TTS model loaded successfully")
+            return model_id, model, tokenizer
 
-    def speak(self, text: str) -> bytes:
-        self._load_model()
+    def resident(self) -> list:
+        return list(self._models)
 
-        inputs = self.tokenizer(text, return_tensors="pt")
-        inputs["input_ids"] = inputs["input_ids"].long()
+    def speak(self, text: str, language: str = "en", fmt: str = "wav", bitrate: Optional[str] = None) -> bytes:
+        with span("tts.load_model"):
+            _model_id, model, tokenizer = self._load_model(language)
 
-        with torch.no_grad():
-            output = self.model(**inputs).waveform
+        with span("tts.tokenize"):
+            inputs = tokenizer(text, return_tensors="pt")
+            inputs["input_ids"] = inputs["input_ids"].long()
 
-        audio_array = output.squeeze().numpy()
+        with span("tts.vits"):
+            output = run_model("vits", _waveform, model, inputs)
 
-        audio_array = (audio_array * 32767).astype(np.int16)
+        with span(f"tts.{fmt}_encode"):
+            audio_array = output.squeeze().numpy()
 
-        wav_buffer = io.BytesIO()
-        scipy.io.wavfile.write(wav_buffer, rate=self.model.config.sampling_rate, data=audio_array)
-        wav_buffer.seek(0)
+            audio_array = (audio_array * 32767).astype(np.int16)
 
-        return wav_buffer.getvalue()
+            return encode_audio(audio_array, model.config.sampling_rate, fmt, bitrate)
+
+    def get_audio_base64(self, text: str, language: str = "en", fmt: str = "wav", bitrate: Optional[str] = None) -> str:
+        audio_data = self.speak(text, language, fmt, bitrate)
+        with span("tts.base64_encode"):
+            return base64.b64encode(audio_data).decode('utf-8')
+
+class AudioStore:
+    """Short-lived store for audio served as a separate resource instead of inline base64.
+
+    Clips are files in ``TTS_AUDIO_DIR`` (default ``<tmp>/tts-audio``), so any
+    worker can serve a clip another worker rendered; with several hosts the
+    directory must be a shared mount. Each file holds the MIME type on its
+    first line followed by the audio. Clips expire ``TTS_AUDIO_TTL_S`` after
+    they are written, and the oldest are removed beyond ``TTS_AUDIO_MAX_ITEMS``.
+    """
+
+    _ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+    def __init__(self, ttl_s: Optional[float] = None, max_items: Optional[int] = None, directory: Optional[str] = None):
+        self.ttl = float(ttl_s or os.getenv("TTS_AUDIO_TTL_S", "300"))
+        self.max_items = int(max_items or os.getenv("TTS_AUDIO_MAX_ITEMS", "256"))
+        self.directory = directory or os.getenv("TTS_AUDIO_DIR") or os.path.join(tempfile.gettempdir(), "tts-audio")
+        self._lock = threading.Lock()
+
+    def _path(self, audio_id: str) -> str:
+        return os.path.join(self.directory, f"{audio_id}.audio")
+
+    def _prune(self):
+        now = time.time()
+        clips = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".audio"):
+                continue
+            try:
+                clips.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+        clips.sort()
+        excess = len(clips) - self.max_items
+        for i, (mtime, path) in enumerate(clips):
+            if i >= excess and now - mtime <= self.ttl:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def put(self, data: bytes, mime: str) -> str:
+        audio_id = uuid.uuid4().hex
+        path = self._path(audio_id)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(mime.encode("ascii") + b"\n" + data)
+            os.replace(path + ".tmp", path)
+            self._prune()
+        return audio_id
 
-    def get_audio_base64(self, text: str) -> str:
-        audio_data = self.speak(text)
-        return base64.b64encode(audio_data).decode('utf-8')
+    def get(self, audio_id: str) -> Optional[tuple]:
+        if not self._ID_RE.match(audio_id):
+            return None
+        path = self._path(audio_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                mime, _, data = f.read().partition(b"\n")
+        except FileNotFoundError:
+            return None
+        return data, mime.decode("ascii")
 
 tts = TextToSpeech()
+audio_store = AudioStore()
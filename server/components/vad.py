@@ -0,0 +1,198 @@
+import os
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def _frame_features(audio: np.ndarray, frame: int, hop: int) -> Tuple[np.ndarray, np.ndarray]:
+    if audio.shape[0] < frame:
+        audio = np.pad(audio, (0, frame - audio.shape[0]))
+    n_frames = 1 + (audio.shape[0] - frame) // hop
+    idx = np.arange(frame)[None, :] + hop * np.arange(n_frames)[:, None]
+    frames = audio[idx].astype(np.float32, copy=False)
+    rms = np.sqrt(np.mean(frames * frames, axis=1) + 1e-12)
+    energy_db = 20.0 * np.log10(rms + 1e-10)
+    # Spectral flatness: ~1 for white noise, close to 0 for voiced speech.
+    spec = np.abs(np.fft.rfft(frames * np.hanning(frame).astype(np.float32), axis=1)) + 1e-10
+    flatness = np.exp(np.mean(np.log(spec), axis=1)) / np.mean(spec, axis=1)
+    return energy_db, flatness
+
+
+def speech_threshold(energy_db: np.ndarray, flatness: np.ndarray, energy_margin_db: float, min_energy_db: float, max_flatness: float) -> float:
+    """Energy (dB) a frame must exceed to count as speech.
+
+    Normally the clip's noise floor (10th-percentile frame energy) plus
+    ``energy_margin_db``, never below ``min_energy_db``. When even the
+    quietest frames are above the absolute floor and tonal rather than flat,
+    there is no silence to measure (a tightly trimmed or sustained voiced
+    clip), so the absolute floor alone is used.
+    """
+    noise_floor = float(np.percentile(energy_db, 10))
+    if noise_floor > min_energy_db:
+        quietest = energy_db <= noise_floor
+        if float(np.median(flatness[quietest])) < max_flatness:
+            return min_energy_db
+    return max(min_energy_db, noise_floor + energy_margin_db)
+
+
+def detect_speech(
+    audio: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    frame_ms: int = 30,
+    hop_ms: int = 10,
+    energy_margin_db: Optional[float] = None,
+    min_energy_db: Optional[float] = None,
+    max_flatness: float = 0.5,
+    min_speech_ms: int = 150,
+    min_silence_ms: int = 300,
+    pad_ms: int = 150,
+) -> List[Tuple[int, int]]:
+    """Return ``(start, end)`` sample ranges that contain speech.
+
+    A frame counts as speech when its energy is above both an absolute floor and
+    the clip's estimated noise floor plus a margin, and its spectrum is not flat
+    like broadband noise. Short gaps are bridged, short blips dropped and each
+    segment is padded so Whisper keeps word onsets.
+    """
+    if energy_margin_db is None:
+        energy_margin_db = float(os.getenv("VAD_MARGIN_DB", "10"))
+    if min_energy_db is None:
+        min_energy_db = float(os.getenv("VAD_MIN_DB", "-50"))
+    if audio.size == 0:
+        return []
+    frame = int(sample_rate * frame_ms / 1000)
+    hop = int(sample_rate * hop_ms / 1000)
+    energy_db, flatness = _frame_features(audio, frame, hop)
+    threshold = speech_threshold(energy_db, flatness, energy_margin_db, min_energy_db, max_flatness)
+    voiced = (energy_db > threshold) & (flatness < max_flatness)
+    if not voiced.any():
+        return []
+
+    # Run-length encode voiced frames into [start_frame, end_frame) runs.
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    max_gap = max(1, min_silence_ms // hop_ms)
+    merged: List[List[int]] = []
+    for s, e in zip(starts, ends):
+        if merged and s - merged[-1][1] <= max_gap:
+            merged[-1][1] = e
+        else:
+            merged.append([s, e])
+
+    min_frames = max(1, min_speech_ms // hop_ms)
+    pad = int(sample_rate * pad_ms / 1000)
+    segments: List[Tuple[int, int]] = []
+    for s, e in merged:
+        if e - s < min_frames:
+            continue
+        start = max(0, s * hop - pad)
+        end = min(audio.shape[0], (e - 1) * hop + frame + pad)
+        if segments and start <= segments[-1][1]:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
+
+
+class StreamingVAD:
+    """Frame-by-frame speech detection for a live stream.
+
+    Each ``feed`` scores only the frames completed by the new samples, so the
+    cost per call does not grow with the stream. Frame ``i`` starts at sample
+    ``i * hop`` of the stream. The noise floor comes from the last
+    ``noise_window_s`` of frames, with the same rules as ``detect_speech``.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        frame_ms: int = 30,
+        hop_ms: int = 10,
+        energy_margin_db: Optional[float] = None,
+        min_energy_db: Optional[float] = None,
+        max_flatness: float = 0.5,
+        noise_window_s: float = 5.0,
+    ):
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.hop = int(sample_rate * hop_ms / 1000)
+        self.energy_margin_db = float(os.getenv("VAD_MARGIN_DB", "10")) if energy_margin_db is None else energy_margin_db
+        self.min_energy_db = float(os.getenv("VAD_MIN_DB", "-50")) if min_energy_db is None else min_energy_db
+        self.max_flatness = max_flatness
+        history = max(1, int(noise_window_s * 1000 / hop_ms))
+        self._energy: deque = deque(maxlen=history)
+        self._flatness: deque = deque(maxlen=history)
+        self._tail = np.zeros(0, dtype=np.float32)
+
+    def feed(self, samples: np.ndarray) -> np.ndarray:
+        """Voiced flags for the frames completed by ``samples``, in stream order."""
+        data = np.concatenate([self._tail, samples.astype(np.float32, copy=False)])
+        if data.shape[0] < self.frame:
+            self._tail = data
+            return np.zeros(0, dtype=bool)
+        n = 1 + (data.shape[0] - self.frame) // self.hop
+        energy_db, flatness = _frame_features(data[: (n - 1) * self.hop + self.frame], self.frame, self.hop)
+        self._tail = data[n * self.hop:]
+        self._energy.extend(energy_db.tolist())
+        self._flatness.extend(flatness.tolist())
+        threshold = speech_threshold(
+            np.fromiter(self._energy, dtype=np.float32), np.fromiter(self._flatness, dtype=np.float32),
+            self.energy_margin_db, self.min_energy_db, self.max_flatness,
+        )
+        return (energy_db > threshold) & (flatness < self.max_flatness)
+
+
+def split_segments(segments: List[Tuple[int, int]], max_samples: int) -> List[List[Tuple[int, int]]]:
+    """Group consecutive speech segments into batches no longer than ``max_samples`` of speech.
+
+    Segments that are themselves longer than ``max_samples`` are cut into
+    ``max_samples``-long pieces.
+    """
+    groups: List[List[Tuple[int, int]]] = []
+    current: List[Tuple[int, int]] = []
+    current_len = 0
+    for start, end in segments:
+        while end - start > max_samples:
+            if current:
+                groups.append(current)
+                current, current_len = [], 0
+            groups.append([(start, start + max_samples)])
+            start += max_samples
+        length = end - start
+        if current and current_len + length > max_samples:
+            groups.append(current)
+            current, current_len = [], 0
+        current.append((start, end))
+        current_len += length
+    if current:
+        groups.append(current)
+    return groups
+
+
+def overlapped_windows(segments: List[Tuple[int, int]], window: int, overlap: int) -> List[Tuple[int, int, int]]:
+    """Cut each speech segment into ``window``-sample pieces overlapping by ``overlap`` samples.
+
+    Returns ``(segment_index, start, end)`` triples so callers can tell which
+    windows belong to the same stretch of continuous speech.
+    """
+    step = max(1, window - overlap)
+    out: List[Tuple[int, int, int]] = []
+    for idx, (start, end) in enumerate(segments):
+        pos = start
+        while True:
+            stop = min(end, pos + window)
+            out.append((idx, pos, stop))
+            if stop >= end:
+                break
+            pos += step
+    return out
+
+
+def gather(audio: np.ndarray, segments: List[Tuple[int, int]]) -> np.ndarray:
+    if not segments:
+        return audio[:0]
+    return np.concatenate([audio[s:e] for s, e in segments])
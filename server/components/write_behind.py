@@ -0,0 +1,282 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    fcntl = None
+    HAS_FCNTL = False
+
+from components.ids import new_id
+from components.metrics import inc
+
+# Batch ids recorded on each inventory document; replaying a batch that is listed is a no-op.
+APPLIED_FIELD = "_flushes"
+APPLIED_KEEP = 50
+
+
+class _Batch:
+    def __init__(self, journal_dir: str, owner: str, batch_id: Optional[str] = None, path: Optional[str] = None):
+        self.id = batch_id or uuid.uuid4().hex
+        self.path = path or os.path.join(journal_dir, f"usage-{owner}-{self.id}.jsonl")
+        self.events: List[dict] = []
+        self.deltas: Dict[str, int] = {}
+        self.opened = time.monotonic()
+        self._file = None
+
+    def add(self, event: dict, fsync: bool):
+        if not self.events:
+            self.opened = time.monotonic()
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps({**event, "timestamp": event["timestamp"].isoformat()}) + "\n")
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+        self._track(event)
+
+    def _track(self, event: dict):
+        self.events.append(event)
+        if event["stockDelta"]:
+            self.deltas[event["itemId"]] = self.deltas.get(event["itemId"], 0) + event["stockDelta"]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def parse_name(path: str):
+        """``(owner, batch_id)`` from ``usage-<owner>-<batch>.jsonl``; owner is None for pre-owner journal names."""
+        stem = os.path.basename(path)[len("usage-"):-len(".jsonl")]
+        owner, _, batch_id = stem.rpartition("-")
+        return owner or None, batch_id
+
+    @classmethod
+    def load(cls, journal_dir: str, path: str) -> "_Batch":
+        owner, batch_id = cls.parse_name(path)
+        batch = cls(journal_dir, owner, batch_id, path)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash mid-write
+                event["timestamp"] = datetime.fromisoformat(event["timestamp"])
+                batch._track(event)
+        return batch
+
+
+class UsageBuffer:
+    """Write-behind buffer for usage events.
+
+    ``add`` appends the event to a local journal and returns; a background
+    thread flushes the batch once it holds ``USAGE_FLUSH_SIZE`` events or is
+    ``USAGE_FLUSH_MS`` old, as one ``insert_many`` of usage logs, one
+    ``bulk_write`` of per-item ``$inc`` stock changes and one rollup
+    ``bulk_write``.
+
+    Each batch has its own journal file, deleted once the batch is written.
+    Journal names carry an owner token (pid plus a random suffix) and the
+    owner holds an exclusive lock on ``owner-<token>.lock`` while it runs, so
+    uvicorn workers can share ``USAGE_JOURNAL_DIR``: ``start`` replays only
+    journals whose owner lock is free (the process is gone) and never touches
+    a live worker's files. Without ``fcntl`` an owner counts as gone when its
+    pid no longer exists. Stock increments
+    are tagged with the batch id on the inventory document so a replayed batch
+    is not applied twice, and duplicate usage log ids are skipped by the
+    unique ``id`` index.
+
+    Stock reads stay read-your-writes through ``unapplied``: readers add the
+    deltas of every batch the document does not list as applied yet.
+    """
+
+    def __init__(self, database, journal_dir: Optional[str] = None, max_events: Optional[int] = None, max_delay_ms: Optional[float] = None):
+        self.database = database
+        self.journal_dir = journal_dir or os.getenv("USAGE_JOURNAL_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "usage_journal"))
+        self.max_events = int(max_events or os.getenv("USAGE_FLUSH_SIZE", "500"))
+        self.max_delay = float(max_delay_ms or os.getenv("USAGE_FLUSH_MS", "200")) / 1000.0
+        self.fsync = os.getenv("USAGE_JOURNAL_FSYNC", "0").lower() in ("1", "true", "yes")
+        self._cond = threading.Condition()
+        self._open: Optional[_Batch] = None
+        self._inflight: List[_Batch] = []
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._owner_lock = None
+
+    def _lock_path(self, owner: str) -> str:
+        return os.path.join(self.journal_dir, f"owner-{owner}.lock")
+
+    def _claim(self, owner: Optional[str]):
+        """Lock file of a dead owner, held locked, or None when ``owner`` is still running."""
+        if owner is None:
+            return open(os.devnull, "a")
+        path = self._lock_path(owner)
+        if not HAS_FCNTL:
+            try:
+                os.kill(int(owner.split("-", 1)[0]), 0)
+                return None
+            except (OSError, ValueError):
+                return open(os.devnull, "a")
+        try:
+            f = open(path, "a")
+        except OSError:
+            return None
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+        return f
+
+    def _orphaned_journals(self) -> List[str]:
+        """Journals of owners that are no longer running; their lock files are removed."""
+        by_owner: Dict[Optional[str], List[str]] = {}
+        for path in glob.glob(os.path.join(self.journal_dir, "usage-*.jsonl")):
+            by_owner.setdefault(_Batch.parse_name(path)[0], []).append(path)
+        for path in glob.glob(os.path.join(self.journal_dir, "owner-*.lock")):
+            by_owner.setdefault(os.path.basename(path)[len("owner-"):-len(".lock")], [])
+        orphaned: List[str] = []
+        for owner, paths in by_owner.items():
+            if owner == self.owner:
+                continue
+            claim = self._claim(owner)
+            if claim is None:
+                continue
+            orphaned.extend(paths)
+            if owner is not None:
+                try:
+                    os.remove(self._lock_path(owner))
+                except FileNotFoundError:
+                    pass
+            claim.close()
+        return sorted(orphaned, key=os.path.getmtime)
+
+    def start(self):
+        """Take this process's owner lock, replay journals of dead owners, then start the flusher thread."""
+        os.makedirs(self.journal_dir, exist_ok=True)
+        if HAS_FCNTL:
+            self._owner_lock = open(self._lock_path(self.owner), "a")
+            fcntl.flock(self._owner_lock.fileno(), fcntl.LOCK_EX)
+        paths = self._orphaned_journals()
+        with self._cond:
+            self._inflight.extend(_Batch.load(self.journal_dir, p) for p in paths)
+            self._open = _Batch(self.journal_dir, self.owner)
+        if paths:
+            print(f"Replaying {len(paths)} usage journal file(s) left by stopped workers")
+            self.flush_inflight()
+        self._thread = threading.Thread(target=self._run, name="usage-write-behind", daemon=True)
+        self._thread.start()
+
+    def add(self, item_id: str, quantity: int, user: str, notes: Optional[str] = None, stock_delta: int = 0):
+        now = datetime.now()
+        event = {
+            "id": new_id(),
+            "itemId": item_id,
+            "quantity": quantity,
+            "user": user,
+            "timestamp": now,
+            "notes": notes,
+            "stockDelta": stock_delta,
+        }
+        with self._cond:
+            self._open.add(event, self.fsync)
+            if len(self._open.events) >= self.max_events:
+                self._cond.notify()
+        inc("usage_buffered_total", "Usage events accepted by the write-behind buffer")
+
+    def unapplied(self) -> Dict[str, Dict[str, int]]:
+        """``{batch_id: {item_id: delta}}`` for batches whose stock change may not be in MongoDB yet."""
+        with self._cond:
+            batches = self._inflight + ([self._open] if self._open else [])
+            return {b.id: dict(b.deltas) for b in batches if b.deltas}
+
+    def _rotate(self):
+        if self._open is not None and self._open.events:
+            self._open.close()
+            self._inflight.append(self._open)
+            self._open = _Batch(self.journal_dir, self.owner)
+
+    def flush(self):
+        """Write everything buffered so far before returning."""
+        with self._cond:
+            self._rotate()
+        self.flush_inflight()
+
+    def flush_inflight(self):
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    if not self._inflight:
+                        return
+                    batch = self._inflight[0]
+                self._write(batch)
+                with self._cond:
+                    self._inflight.pop(0)
+                try:
+                    os.remove(batch.path)
+                except FileNotFoundError:
+                    pass
+
+    def _write(self, batch: _Batch):
+        from components.db import _rollup_writes, insert_new
+        stock = [
+            UpdateOne(
+                {"id": item_id, APPLIED_FIELD: {"$ne": batch.id}},
+                {"$inc": {"currentStock": delta}, "$push": {APPLIED_FIELD: {"$each": [batch.id], "$slice": -APPLIED_KEEP}}},
+            )
+            for item_id, delta in batch.deltas.items() if delta
+        ]
+        if stock:
+            self.database.inventory.bulk_write(stock, ordered=False)
+        logs = [{k: v for k, v in e.items() if k != "stockDelta"} for e in batch.events]
+        inserted = insert_new(self.database.usage_logs, logs) if logs else []
+        if inserted:
+            self.database.usage_rollups.bulk_write(
+                _rollup_writes([(log["itemId"], log["quantity"], log["timestamp"], 1) for log in inserted]), ordered=False
+            )
+        inc("usage_flushes_total", "Write-behind batches written to MongoDB")
+        inc("usage_flushed_events_total", "Usage events written by the write-behind buffer", len(logs))
+
+    def _run(self):
+        while not self._stopped:
+            with self._cond:
+                self._cond.wait(timeout=self.max_delay)
+                batch = self._open
+                if batch is not None and batch.events and (
+                    len(batch.events) >= self.max_events or time.monotonic() - batch.opened >= self.max_delay
+                ):
+                    self._rotate()
+            try:
+                self.flush_inflight()
+            except Exception as e:
+                print(f"Usage write-behind flush failed, will retry: {e}")
+                time.sleep(self.max_delay)
+
+    def close(self):
+        self._stopped = True
+        with self._cond:
+            self._cond.notify()
+        self.flush()
+        with self._cond:
+            if self._open is not None:
+                self._open.close()
+        if self._owner_lock is not None:
+            # Everything is written; drop the lock file so the directory does not collect them.
+            try:
+                os.remove(self._lock_path(self.owner))
+            except FileNotFoundError:
+                pass
+            self._owner_lock.close()
+            self._owner_lock = None
@@ -3,9 +3,17 @@ from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
 from components.routes import router
+from components.compression import CompressionMiddleware
+from components.metrics import MetricsMiddleware, render_latest
+from components.profiler import ProfileRequestMiddleware, router as profiler_router
+import components.runtime as runtime
+from fastapi import Response
 
 load_dotenv()
 
+runtime.configure()
+runtime.print_report()
+
 app = FastAPI()
 
 app.add_middleware(
@@ -16,12 +24,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfileRequestMiddleware)
+
 app.include_router(router, prefix="/api")
+app.include_router(profiler_router, prefix="/api/admin")
+
+@app.on_event("startup")
+def bootstrap_indexes():
+    if os.getenv("DB_ENSURE_INDEXES", "1").lower() in ("0", "false", "no"):
+        return
+    from components.db import db
+    try:
+        print(f"MongoDB indexes ready: {', '.join(db.ensure_indexes())}")
+    except Exception as e:
+        print(f"Index bootstrap failed: {e}")
+
+@app.on_event("startup")
+def start_write_behind():
+    if os.getenv("USAGE_WRITE_BEHIND", "0").lower() in ("1", "true", "yes"):
+        from components.db import db
+        buffer = db.enable_write_behind()
+        print(f"Usage write-behind enabled (flush at {buffer.max_events} events or {buffer.max_delay * 1000:.0f} ms)")
+
+@app.on_event("shutdown")
+def stop_write_behind():
+    from components.db import db
+    if db.write_behind:
+        db.write_behind.close()
+
+@app.on_event("startup")
+def start_usage_maintenance():
+    if os.getenv("USAGE_MAINTENANCE", "1").lower() in ("0", "false", "no"):
+        return
+    import threading
+    from components.db import db
+
+    def run():
+        try:
+            db.maintain_usage()
+        except Exception as e:
+            print(f"Usage maintenance failed: {e}")
+    threading.Thread(target=run, name="usage-maintenance", daemon=True).start()
 
 @app.get("/")
 async def root():
     return {"message": "Healthcare Voice Assistant API"}
 
+@app.get("/metrics")
+async def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
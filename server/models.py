@@ -46,12 +46,19 @@ class AudioData(BaseModel):
 class ProcessVoiceRequest(BaseModel):
     audio: str
     language: Optional[str] = "en"
+    long_form: bool = False
+    audio_format: Optional[str] = None
+    audio_bitrate: Optional[str] = None
+    audio_delivery: Optional[str] = None
 
 class ProcessVoiceResponse(BaseModel):
     transcript: str
     command: VoiceCommand
     response: VoiceResponse
     audio_response: Optional[str] = None
+    audio_url: Optional[str] = None
+    audio_format: Optional[str] = None
+    commands: Optional[List[VoiceCommand]] = None
 
 
 class Supplier(BaseModel):
@@ -90,3 +97,24 @@ class PurchaseOrder(BaseModel):
     notes: Optional[str] = None
     approvedBy: Optional[str] = None
     approvedAt: Optional[datetime] = None
+
+class SyncMutation(BaseModel):
+    clientId: str
+    action: str
+    data: Dict[str, Any] = {}
+    timestamp: Optional[float] = None
+
+class SyncRequest(BaseModel):
+    deviceId: Optional[str] = None
+    mutations: List[SyncMutation]
+
+class SyncResult(BaseModel):
+    clientId: str
+    status: str
+    error: Optional[str] = None
+
+class SyncResponse(BaseModel):
+    results: List[SyncResult]
+    applied: int
+    duplicates: int
+    errors: int
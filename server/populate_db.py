@@ -1,13 +1,30 @@
 from __future__ import annotations
 import os
-from datetime import datetime
+import random
+from datetime import datetime, timedelta
+from itertools import islice
 from pymongo import MongoClient
+from components.ids import new_id
 
 MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017')
 DB_NAME = os.environ.get('MONGO_DB', 'healthcare')
 
+CATEGORIES = ['PPE', 'Consumables', 'Medicines', 'Surgical', 'Diagnostics', 'Wound Care']
+PRODUCTS = [
+    ('Surgical Mask', 'PPE'), ('Latex Gloves', 'PPE'), ('Nitrile Gloves', 'PPE'), ('Face Shield', 'PPE'),
+    ('Syringe 5ml', 'Consumables'), ('Syringe 10ml', 'Consumables'), ('IV Catheter', 'Consumables'),
+    ('Alcohol Swab', 'Consumables'), ('Paracetamol 500mg', 'Medicines'), ('Ibuprofen 400mg', 'Medicines'),
+    ('Amoxicillin 500mg', 'Medicines'), ('Saline 0.9% 500ml', 'Medicines'), ('Scalpel Blade', 'Surgical'),
+    ('Suture Kit', 'Surgical'), ('Glucose Test Strip', 'Diagnostics'), ('Urine Test Cup', 'Diagnostics'),
+    ('Elastic Bandage', 'Wound Care'), ('Sterile Gauze', 'Wound Care'), ('Adhesive Plaster', 'Wound Care'),
+]
+USERS = ['nurse_ana', 'nurse_mihai', 'dr_popescu', 'dr_ionescu', 'voice_user']
 
-def connect():
+
+def connect(mock: bool = False):
+    if mock:
+        import mongomock
+        return mongomock.MongoClient()[DB_NAME]
     client = MongoClient(MONGO_URI)
     db = client[DB_NAME]
     return db
@@ -17,6 +34,144 @@ def clear_collections(db):
     db.suppliers.delete_many({})
     db.inventory.delete_many({})
     db.purchase_orders.delete_many({})
+    db.usage_logs.delete_many({})
+    # Derived data: rollups, archived buckets and model picks would describe the old
+    # rows, and queued offline mutations would be replayed against the new ones.
+    db.usage_rollups.delete_many({})
+    db.usage_archive.delete_many({})
+    db.forecast_models.delete_many({})
+    db.sync_mutations.delete_many({})
+
+
+def insert_batched(collection, docs, batch_size: int = 5000) -> int:
+    """Insert an iterable of documents with unordered ``insert_many`` batches."""
+    total = 0
+    it = iter(docs)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            break
+        collection.insert_many(batch, ordered=False)
+        total += len(batch)
+    return total
+
+
+def generate_suppliers(count: int, rng: random.Random):
+    for i in range(count):
+        yield {
+            'id': f'sup-{i:05d}',
+            'name': f'Supplier {i:05d} SRL',
+            'email': f'orders{i}@supplier.example',
+            'phone': f'+40 21 {rng.randint(100, 999)} {rng.randint(1000, 9999)}',
+            'address': f'Strada Furnizor {i + 1}, Bucuresti, Romania',
+            'paymentTerms': rng.choice(['NET 15', 'NET 30', 'NET 60']),
+            'leadTimeDays': rng.randint(2, 21),
+            'minimumOrder': float(rng.choice([0, 100, 250, 500, 1000])),
+            'createdAt': datetime.utcnow(),
+        }
+
+
+def generate_inventory(count: int, supplier_ids: list, rng: random.Random):
+    for i in range(count):
+        product, category = PRODUCTS[i % len(PRODUCTS)]
+        min_stock = rng.randint(10, 300)
+        updated = datetime.utcnow()
+        yield {
+            'id': new_id(updated),
+            'name': f'{product} #{i}',
+            'currentStock': rng.randint(0, min_stock * 10),
+            'unit': 'units',
+            'minStock': min_stock,
+            'maxStock': min_stock * 20,
+            'description': None,
+            'category': category,
+            'location': f'Ward {rng.randint(1, 12)}',
+            'supplier': rng.choice(supplier_ids) if supplier_ids else None,
+            'lastUpdated': updated,
+            'price': round(rng.uniform(0.05, 80.0), 2),
+        }
+
+
+def generate_usage_logs(items: list, days: int, rng: random.Random):
+    """Yield daily usage events per item with a weekday pattern and a per-item demand rate."""
+    now = datetime.utcnow()
+    for item in items:
+        rate = rng.uniform(0.0, 3.0)
+        for d in range(days):
+            day = now - timedelta(days=d)
+            weekday_factor = 0.6 if day.weekday() >= 5 else 1.0
+            events = int(rng.expovariate(1.0 / max(0.01, rate * weekday_factor))) if rate > 0 else 0
+            for _ in range(min(events, 8)):
+                ts = day.replace(hour=rng.randint(6, 22), minute=rng.randint(0, 59))
+                yield {
+                    'id': new_id(ts),
+                    'itemId': item['id'],
+                    'quantity': rng.randint(1, 10),
+                    'user': rng.choice(USERS),
+                    'timestamp': ts,
+                    'notes': None,
+                }
+
+
+def generate_purchase_orders(suppliers: list, items: list, days: int, rng: random.Random):
+    by_supplier: dict = {}
+    for item in items:
+        by_supplier.setdefault(item['supplier'], []).append(item)
+    now = datetime.utcnow()
+    seq = 0
+    for sup in suppliers:
+        carried = by_supplier.get(sup['id']) or []
+        if not carried:
+            continue
+        for d in range(0, days, 7):
+            created = now - timedelta(days=d, hours=rng.randint(0, 23))
+            lines = []
+            for item in rng.sample(carried, min(len(carried), rng.randint(1, 10))):
+                qty = rng.randint(10, 500)
+                lines.append({
+                    'itemId': item['id'],
+                    'itemName': item['name'],
+                    'quantity': qty,
+                    'unitPrice': item['price'],
+                    'totalPrice': round(qty * item['price'], 2),
+                    'urgency': rng.choice(['low', 'medium', 'high']),
+                })
+            subtotal = round(sum(l['totalPrice'] for l in lines), 2)
+            tax = round(subtotal * 0.08, 2)
+            yield {
+                'id': new_id(created),
+                'orderNumber': f'PO-{created.year}-{seq:08d}',
+                'supplierId': sup['id'],
+                'supplierName': sup['name'],
+                'status': 'received' if d > 14 else rng.choice(['pending', 'approved', 'ordered']),
+                'items': lines,
+                'subtotal': subtotal,
+                'tax': tax,
+                'total': round(subtotal + tax, 2),
+                'createdBy': rng.choice(USERS),
+                'createdAt': created,
+                'expectedDelivery': created + timedelta(days=sup['leadTimeDays']),
+                'notes': None,
+                'approvedBy': None,
+                'approvedAt': None,
+            }
+            seq += 1
+
+
+def generate(db, items: int, suppliers: int, months: int, batch_size: int = 5000, seed: int = 42):
+    rng = random.Random(seed)
+    days = max(1, months * 30)
+    sup_docs = list(generate_suppliers(suppliers, rng))
+    insert_batched(db.suppliers, [dict(d) for d in sup_docs], batch_size)
+    item_docs = list(generate_inventory(items, [s['id'] for s in sup_docs], rng))
+    insert_batched(db.inventory, [dict(d) for d in item_docs], batch_size)
+    n_logs = insert_batched(db.usage_logs, generate_usage_logs(item_docs, days, rng), batch_size)
+    n_orders = insert_batched(db.purchase_orders, generate_purchase_orders(sup_docs, item_docs, days, rng), batch_size)
+    # Building indexes once after the bulk load is cheaper than maintaining them per insert.
+    from components.db import ensure_indexes, rebuild_rollups
+    ensure_indexes(db)
+    rebuild_rollups(db, batch_size)
+    return {'suppliers': len(sup_docs), 'items': len(item_docs), 'usage_logs': n_logs, 'purchase_orders': n_orders}
 
 
 def seed_suppliers(db):
@@ -109,5 +264,21 @@ if __name__ == '__main__':
     import argparse
     p = argparse.ArgumentParser()
     p.add_argument('--clear', action='store_true', help='Clear collections before seeding')
+    p.add_argument('--items', type=int, default=0, help='Generate N synthetic inventory items instead of the sample seed')
+    p.add_argument('--suppliers', type=int, default=20, help='Number of synthetic suppliers')
+    p.add_argument('--months', type=int, default=6, help='Months of usage logs and purchase orders')
+    p.add_argument('--batch-size', type=int, default=5000, help='Documents per insert_many call')
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--migrate-ids', action='store_true', help='Give documents with old timestamp or seed ids time-ordered ids, then exit')
     args = p.parse_args()
-    main(clear=args.clear)
+    if args.migrate_ids:
+        from components.db import migrate_legacy_ids
+        print('Migrated ids:', migrate_legacy_ids(connect(), args.batch_size))
+    elif args.items:
+        db = connect()
+        if args.clear:
+            clear_collections(db)
+        counts = generate(db, args.items, args.suppliers, args.months, args.batch_size, args.seed)
+        print('Synthetic data generated:', counts)
+    else:
+        main(clear=args.clear)